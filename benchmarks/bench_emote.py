@@ -0,0 +1,64 @@
+"""Accuracy and latency of the OpenAI assistant emotion classifiers against a labeled transcript fixture.
+
+Run from the repo root: `python -m benchmarks.bench_emote`
+Add `--api` to also benchmark the `emote_model` API classifier (requires `OPENAI_API_KEY`).
+"""
+import sys
+import json
+import timeit
+from pathlib import Path
+from collections import Counter
+from time import perf_counter
+
+from plugins.ai.openai_assistant.emote_lexicon import LexiconEmote
+
+FIXTURE_PATH = Path(__file__).parent / "fixtures/emote_transcripts.jsonl"
+LEXICON_PATH = Path(__file__).parents[1] / "plugins/ai/openai_assistant/assets/emote_lexicon.json"
+DEFAULT_EMOTION = "neutral" # Emote.DEFAULT_EMOTION
+
+def load_fixture(path: Path) -> list[tuple[str, str]]:
+    with open(path) as f:
+        return [(row["text"], row["emotion"]) for row in map(json.loads, f) if row]
+
+def report(label: str, predictions: list[str], samples: list[tuple[str, str]], latencies_us: list[float]):
+    correct = sum(p == e for p, (_, e) in zip(predictions, samples))
+    latencies_us = sorted(latencies_us)
+    p50 = latencies_us[len(latencies_us) // 2]
+    p99 = latencies_us[min(int(len(latencies_us) * .99), len(latencies_us) - 1)]
+    print(f"> {label}: accuracy {correct}/{len(samples)} ({correct / len(samples):.0%}), latency p50 {p50:.1f} us, p99 {p99:.1f} us")
+    misses = Counter((e, p) for p, (_, e) in zip(predictions, samples) if p != e)
+    for (expected, predicted), count in misses.most_common():
+        print(f">   {expected:>9} -> {predicted:<9} x{count}")
+
+def bench_lexicon(samples: list[tuple[str, str]]):
+    lexicon = LexiconEmote(LEXICON_PATH)
+    predictions, latencies_us = [], []
+    for text, _ in samples:
+        predictions.append(lexicon.classify(text) or DEFAULT_EMOTION)
+        latencies_us.append(min(timeit.repeat(lambda: lexicon.classify(text), number=100, repeat=5)) / 100 * 1_000_000)
+    report("lexicon", predictions, samples, latencies_us)
+
+def bench_api(samples: list[tuple[str, str]]):
+    from plugins.ai.openai_assistant.openai_assistant import Emote
+
+    class Config:
+        def get_item(self, key, fallback_value=None):
+            return {"emote_strategy": "api"}.get(key, fallback_value)
+
+    emote = Emote(Config())
+    predictions, latencies_us = [], []
+    for text, _ in samples:
+        start = perf_counter()
+        predictions.append(emote.parse_emotion(emote.send_request(text)))
+        latencies_us.append((perf_counter() - start) * 1_000_000)
+    report(f"api ({emote.model})", predictions, samples, latencies_us)
+
+def main():
+    samples = load_fixture(FIXTURE_PATH)
+    print(f"Emotion classification, {len(samples)} labeled transcripts:")
+    bench_lexicon(samples)
+    if "--api" in sys.argv:
+        bench_api(samples)
+
+if __name__ == "__main__":
+    main()
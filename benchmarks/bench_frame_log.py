@@ -0,0 +1,73 @@
+"""Write cost per frame of the frame log (`util/frame_log.py`) for typical screen content:
+a static screen, a snake adding one pixel per frame, sprites redrawn every frame, and full-screen noise.
+
+Reports time on the render thread (the tap), time in the writer thread (diff + zlib + write), bytes per frame
+and log growth per hour at 30 FPS, then checks the log decodes back to the same frames.
+
+Run from the repo root: `python -m benchmarks.bench_frame_log`
+"""
+import tempfile
+from pathlib import Path
+from time import perf_counter, sleep
+
+import numpy as np
+
+from util.frame_log import FrameLog, FrameLogReader
+from util.rgb_util import FUNKYFUTURE_8, MOONLIGHT_GB
+from util.sprite_util import Sprite
+
+FRAMES = 1_000
+FPS = 30
+
+def static_frames(rng):
+    frame = FUNKYFUTURE_8.render(rng.integers(0, len(FUNKYFUTURE_8), (64, 64)))
+    for _ in range(FRAMES):
+        yield frame
+
+def snake_frames(rng):
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    y, x = 32, 32
+    for i in range(FRAMES):
+        y, x = (y + rng.integers(-1, 2)) % 64, (x + rng.integers(-1, 2)) % 64
+        frame[y, x] = FUNKYFUTURE_8.color(i // 100)
+        yield frame
+
+def sprite_frames(rng):
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    heart = Sprite.from_mask(7, 6, [(0, 0), (3, 0), (6, 0), (0, 3), (6, 3), (0, 4), (1, 4), (5, 4), (6, 4)])
+    for _ in range(FRAMES):
+        frame.fill(0)
+        heart.blit(frame, rng.integers(0, 58, (3, 2)), FUNKYFUTURE_8.render(rng.integers(0, 8, 3)))
+        yield frame
+
+def noise_frames(rng):
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    for _ in range(FRAMES):
+        MOONLIGHT_GB.render(rng.integers(0, len(MOONLIGHT_GB), (64, 64)), out=frame)
+        yield frame
+
+def bench(label: str, frames, path: Path, compression_level: int):
+    rng = np.random.default_rng(0)
+    log = FrameLog(path, 64, 64, compression_level=compression_level).start()
+    expected = []
+    for frame in frames(rng):
+        while log.queue.full():
+            sleep(0) # measure write cost, not drops
+        log(frame, perf_counter())
+        expected.append(frame.copy())
+    stats = log.close()
+    decoded = [frame.copy() for _, frame in FrameLogReader(path).frames()]
+    matches = len(decoded) == len(expected) and all(np.array_equal(a, b) for a, b in zip(decoded, expected))
+    mb_per_hour = stats["bytes_per_frame"] * FPS * 3_600 / 1_000_000
+    print(f"> {label:<10} tap {stats['tap_us']:6.1f} us  write {stats['write_us']:7.1f} us (max {stats['max_write_us']:7.1f})  "
+          f"{stats['bytes_per_frame']:8.1f} B/frame  {mb_per_hour:8.1f} MB/hour @ {FPS} FPS  {'ok' if matches else 'MISMATCH'}")
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for level in (1, 6):
+            print(f"zlib level {level} ({FRAMES} frames, raw frame {64 * 64 * 3} B):")
+            for label, frames in [("static", static_frames), ("snake", snake_frames), ("sprites", sprite_frames), ("noise", noise_frames)]:
+                bench(label, frames, Path(tmp) / f"{label}_{level}.pxfl", level)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Latency from a game plugin drawing a frame to the first pixel of that frame on screen, for three handoffs:
+the previous `display_game` loop (queue of images, poll `empty()`, `sleep(.01)`, `get(timeout=3)`), an event-driven
+queue (`ResultQueue` + `WakeEvent`, see `util/sync_util.py`), and the latest-wins `FrameMailbox` (`util/message_bus.py`).
+
+Runs headless on the matrix emulator. A producer thread draws `FRAMES` game frames at `FPS`, then sets `ai_end_event`.
+Each handoff runs with a display that keeps up, and with one that takes `SLOW_DISPLAY_MS` per frame (slower than the game).
+Reports draw -> first pixel latency, frames shown/overwritten, render thread CPU time, and how long the loop took to exit after the end event.
+
+Run from the repo root: `python -m benchmarks.bench_handoff`
+"""
+from threading import Event, Thread
+from queue import Empty
+from time import sleep, perf_counter, thread_time
+
+import numpy as np
+from PIL import Image
+
+from plugins.rgb.display_image.display_image_plugins import DisplayImagePlugins
+from util.rgb_emulator import EmulatorMatrix
+from util.rgb_display import Display
+from util.sync_util import WakeEvent
+from util.message_bus import MessageBus, Channel, FrameMailbox
+
+FRAMES = 300
+FPS = 30
+SLOW_DISPLAY_MS = 50
+
+def queue_previous(plugin: DisplayImagePlugins, display_ms: float):
+    # previous display_game loop
+    while not plugin.ai_end_event.is_set():
+        if not plugin.ai_result_queue["frame"].empty():
+            image = plugin.ai_result_queue["frame"].get(block=True, timeout=3)
+            plugin.matrix.SetImage(image)
+            sleep(display_ms / 1_000)
+        sleep(.01)
+
+def queue_event(plugin: DisplayImagePlugins, display_ms: float):
+    while not plugin.ai_end_event.is_set():
+        try:
+            image = plugin.get_result("frame")
+        except Empty:
+            break
+        plugin.matrix.SetImage(image)
+        sleep(display_ms / 1_000)
+
+def mailbox(plugin: DisplayImagePlugins, display_ms: float):
+    # display_game loop
+    while not plugin.ai_end_event.is_set():
+        try:
+            frame = plugin.get_result("frame")
+        except Empty:
+            break
+        plugin.matrix.SetArray(frame)
+        sleep(display_ms / 1_000)
+
+def produce(channel: Channel | FrameMailbox, end_event: Event, ended: list[float], drawn: dict[int, float]):
+    rng = np.random.default_rng(0)
+    for i in range(FRAMES):
+        frame = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        frame[0, 0] = (i % 256, i // 256, 0) # frame number, to match presented frames to draws
+        drawn[i] = perf_counter()
+        if isinstance(channel, FrameMailbox):
+            channel.put(frame)
+        else:
+            channel.put(Image.fromarray(frame))
+        sleep(1 / FPS)
+    ended.append(perf_counter())
+    end_event.set()
+
+def bench(label: str, loop, display_ms: float):
+    display = Display(EmulatorMatrix())
+    bus = MessageBus()
+    if loop is not mailbox:
+        # unbounded queue of images, as before the mailbox
+        bus.channels["frame"] = Channel("frame", Image.Image)
+    end_event = WakeEvent()
+    plugin = DisplayImagePlugins(display, Event(), end_event, bus)
+    drawn, latency_ms, ended = {}, [], []
+    display.add_tap(lambda frame, timestamp: latency_ms.append((timestamp - drawn[int(frame[0, 0, 0]) + 256 * int(frame[0, 0, 1])]) * 1_000))
+    producer = Thread(target=produce, args=(bus["frame"], end_event, ended, drawn))
+    cpu_start = thread_time()
+    producer.start()
+    loop(plugin, display_ms)
+    exited = perf_counter()
+    cpu_ms = (thread_time() - cpu_start) * 1_000
+    producer.join()
+    shown = len(latency_ms)
+    latency = np.array(latency_ms or [0])
+    print(f"> {label:<15} draw -> pixel p50 {np.percentile(latency, 50):7.2f} ms  p95 {np.percentile(latency, 95):7.2f} ms  "
+          f"max {latency.max():7.2f} ms  {shown:3d} shown  {FRAMES - shown:3d} not shown  {cpu_ms:6.1f} ms CPU  "
+          f"exit after end {(exited - ended[0]) * 1_000:8.2f} ms")
+
+def main():
+    for display_ms in (0, SLOW_DISPLAY_MS):
+        print(f"{FRAMES} game frames at {FPS} FPS, display takes {display_ms} ms per frame:")
+        bench("queue previous", queue_previous, display_ms)
+        bench("queue event", queue_event, display_ms)
+        bench("mailbox", mailbox, display_ms)
+
+if __name__ == "__main__":
+    main()
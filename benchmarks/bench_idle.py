@@ -0,0 +1,67 @@
+"""Render thread CPU time while the screen is static: the previous `display_image` loading loop
+(redraw "Loading..." text, sleep 1 s, clear) and avatar loop (poll every 100 ms) vs. the idle versions
+(cached loading image, identical frames skipped by `Display`, `wait_for_result()`).
+
+Runs headless on the matrix emulator. Each loop waits for a result that is put in the queue after
+`SECONDS`, and reports how long the loop took to react to it.
+
+Run from the repo root: `python -m benchmarks.bench_idle`
+"""
+from threading import Event, Timer
+from time import sleep, perf_counter, thread_time
+
+from PIL import Image, ImageDraw
+
+from plugins.rgb.display_image.display_image_plugins import DisplayImagePlugins
+from util.rgb_emulator import EmulatorMatrix
+from util.rgb_display import Display
+from util.sync_util import WakeEvent
+from util.message_bus import MessageBus
+
+SECONDS = 5
+
+def loading_previous(plugin: DisplayImagePlugins):
+    # previous display_image loop body while waiting for an image
+    img = Image.new("RGB", (plugin.matrix.width, plugin.matrix.height))
+    draw = ImageDraw.Draw(img)
+    font = plugin.load_font(plugin.FONT_PATH, size=12)
+    draw.text((9, 24), "Loading...", font=font, fill=(255, 255, 255))
+    plugin.matrix.SetImage(img)
+    sleep(1)
+    plugin.matrix.Clear()
+
+def loading_idle(plugin: DisplayImagePlugins):
+    plugin.loading(1)
+
+def avatar_previous(plugin: DisplayImagePlugins):
+    # previous display_emotion_avatar loop body between blinks
+    sleep(.1)
+
+def avatar_idle(plugin: DisplayImagePlugins):
+    plugin.wait_for_result("image", SECONDS * 2) # next blink
+
+def bench(label: str, loop_body):
+    display = Display(EmulatorMatrix())
+    bus = MessageBus()
+    queue = bus["image"]
+    plugin = DisplayImagePlugins(display, Event(), WakeEvent(), bus)
+    put_time = []
+    timer = Timer(SECONDS, lambda: (put_time.append(perf_counter()), queue.put("result")))
+    timer.start()
+    cpu_start = thread_time()
+    with display.owner(label) as stats:
+        while queue.empty():
+            loop_body(plugin)
+        reacted = perf_counter()
+    cpu_ms = (thread_time() - cpu_start) * 1_000
+    print(f"> {label:<18} {cpu_ms:8.1f} ms CPU over {SECONDS} s  {stats.frames:4d} frames presented  "
+          f"{stats.pixels:8d} pixels pushed  reacted after {(reacted - put_time[0]) * 1_000:7.1f} ms")
+
+def main():
+    bench("loading previous", loading_previous)
+    bench("loading idle", loading_idle)
+    bench("avatar previous", avatar_previous)
+    bench("avatar idle", avatar_idle)
+
+if __name__ == "__main__":
+    main()
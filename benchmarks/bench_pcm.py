@@ -0,0 +1,56 @@
+"""Micro-benchmark of per-frame PCM conversion cost in the OpenAI assistant audio path.
+
+Run from the repo root: `python -m benchmarks.bench_pcm`
+"""
+import array
+import base64
+import struct
+import timeit
+
+import numpy as np
+
+from util.audio_util import pcm16_to_base64, bytes_to_pcm16
+
+FRAME_LENGTH = 1024 # Audio.FRAME_LENGTH
+SAMPLE_RATE = 24_000 # Audio.SAMPLE_RATE
+
+def mic_frame_struct_join(frame: list[int]) -> str:
+    # previous recording_thread path
+    pcm = b''.join(struct.pack('<h', x) for x in frame)
+    return base64.b64encode(pcm).decode('ascii')
+
+def mic_frame_vectorized(frame: np.ndarray) -> str:
+    return pcm16_to_base64(frame)
+
+def speaker_chunks_list(data: bytes) -> list:
+    # previous speaker_thread path
+    pcm = list(array.array('h', data))
+    return [pcm[i:i + SAMPLE_RATE] for i in range(0, len(pcm), SAMPLE_RATE)]
+
+def speaker_chunks_view(data: bytes) -> list:
+    pcm = bytes_to_pcm16(data)
+    return [pcm[i:i + SAMPLE_RATE] for i in range(0, len(pcm), SAMPLE_RATE)]
+
+def bench(label: str, func, arg, number: int) -> float:
+    seconds = min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number
+    print(f"> {label:<40} {seconds * 1_000_000:10.1f} us")
+    return seconds
+
+def main():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(-32768, 32767, FRAME_LENGTH, dtype=np.int16)
+    response = rng.integers(-32768, 32767, SAMPLE_RATE * 5, dtype=np.int16).tobytes() # 5s response
+
+    assert mic_frame_struct_join(frame.tolist()) == mic_frame_vectorized(frame)
+    print(f"Mic frame ({FRAME_LENGTH} samples) -> base64 pcm16, per frame:")
+    old = bench("struct.pack join (list[int])", mic_frame_struct_join, frame.tolist(), 200)
+    new = bench("pcm16_to_base64 (numpy int16)", mic_frame_vectorized, frame, 2_000)
+    print(f"> speedup: {old / new:.1f}x, {FRAME_LENGTH / SAMPLE_RATE * 1_000:.1f} ms of audio per frame\n")
+
+    print("Speaker response (5s) -> chunks, per response:")
+    old = bench("list(array.array('h', data))", speaker_chunks_list, response, 20)
+    new = bench("memoryview cast (zero-copy)", speaker_chunks_view, response, 2_000)
+    print(f"> speedup: {old / new:.1f}x")
+
+if __name__ == "__main__":
+    main()
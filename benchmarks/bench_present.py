@@ -0,0 +1,115 @@
+"""Frame rate and per-frame allocations of the PIL draw path vs. `RGBPlugin.framebuffer` + `present()`,
+for the `display_pixel_rand` and `display_scatter_fill` frame loops (minus their sleeps).
+
+Runs headless on the matrix emulator. The "staging" rows hide the emulator's `SetArray()` so
+`present()` takes the same path as on rgbmatrix hardware (copy into a persistent PIL image + `SetImage()`).
+Their allocations are the emulator's own image -> array conversion in `SetImage()`, which hardware doesn't do.
+The "Display" rows present through `util.rgb_display.Display`, which only pushes changed pixels to the canvas,
+and report the fraction of full frame pixels pushed.
+
+Run from the repo root: `python -m benchmarks.bench_present`
+"""
+import timeit
+import tracemalloc
+from random import randint
+from threading import Event
+from queue import Queue
+
+import numpy as np
+from PIL import Image
+
+from plugins.rgb_plugin import RGBPlugin
+from util.rgb_emulator import EmulatorMatrix, EmulatorCanvas
+from util.rgb_display import Display
+from util.rgb_util import get_color_from_funkyfuture_palette, get_color_from_moonlightgb_palette
+
+NUM_SPRITES = 3 # random_pixel plugin.toml default
+
+class ImageOnlyCanvas():
+    """Emulator canvas without `SetArray()`, same as an rgbmatrix canvas."""
+    def __init__(self, canvas: EmulatorCanvas):
+        self.canvas = canvas
+
+    def SetImage(self, image: Image.Image, offset_x: int = 0, offset_y: int = 0, unsafe: bool = True):
+        self.canvas.SetImage(image, offset_x, offset_y, unsafe)
+
+    def SetPixel(self, x: int, y: int, red: int, green: int, blue: int):
+        self.canvas.SetPixel(x, y, red, green, blue)
+
+class ImageOnlyMatrix(EmulatorMatrix):
+    def CreateFrameCanvas(self) -> ImageOnlyCanvas:
+        return ImageOnlyCanvas(super().CreateFrameCanvas())
+
+    def SwapOnVSync(self, canvas: ImageOnlyCanvas, framerate_fraction: int = 1) -> ImageOnlyCanvas:
+        previous = super().SwapOnVSync(canvas.canvas, framerate_fraction)
+        return ImageOnlyCanvas(previous)
+
+def pixel_rand_pil(matrix, canvas, colors):
+    # previous display_pixel_rand frame
+    img = Image.new("RGB", (matrix.width, matrix.height))
+    for i in range(NUM_SPRITES):
+        img.putpixel((randint(0, 63), randint(0, 63)), colors[i])
+    img.thumbnail((matrix.width, matrix.height), Image.Resampling.LANCZOS)
+    canvas.SetImage(img.convert("RGB"))
+    matrix.SwapOnVSync(canvas)
+
+def scatter_fill_pil(matrix, canvas):
+    # previous display_scatter_fill frame
+    img = [[get_color_from_moonlightgb_palette(randint(0, 3)) for _ in range(matrix.height)] for _ in range(matrix.width)]
+    temp = Image.fromarray(np.array(img, dtype=np.uint8))
+    temp.thumbnail((matrix.width, matrix.height), Image.Resampling.LANCZOS)
+    canvas.SetImage(temp.convert("RGB"))
+    matrix.SwapOnVSync(canvas)
+
+def pixel_rand_present(plugin: RGBPlugin, rng, colors):
+    plugin.framebuffer.fill(0)
+    plugin.framebuffer[rng.integers(0, plugin.matrix.height, NUM_SPRITES), rng.integers(0, plugin.matrix.width, NUM_SPRITES)] = colors
+    plugin.present()
+
+def scatter_fill_present(plugin: RGBPlugin, rng, palette):
+    np.take(palette, rng.integers(0, len(palette), plugin.framebuffer.shape[:2]), axis=0, out=plugin.framebuffer)
+    plugin.present()
+
+def bench(label: str, frame, number: int):
+    frame() # warm up
+    seconds = min(timeit.repeat(frame, number=number, repeat=5)) / number
+    tracemalloc.start()
+    frame()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    frame()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"> {label:<32} {1 / seconds:10.0f} fps {seconds * 1_000_000:10.1f} us/frame {(peak - before) / 1_000:8.1f} KB allocated/frame")
+
+def main():
+    rng = np.random.default_rng(0)
+    colors = [get_color_from_funkyfuture_palette(randint(0, 7)) for _ in range(NUM_SPRITES)]
+    color_array = np.array(colors, dtype=np.uint8)
+    palette = np.array([get_color_from_moonlightgb_palette(i) for i in range(4)], dtype=np.uint8)
+
+    matrix = EmulatorMatrix()
+    canvas = matrix.CreateFrameCanvas()
+    plugin = RGBPlugin(matrix, Event(), Event(), Queue())
+    staging_plugin = RGBPlugin(ImageOnlyMatrix(), Event(), Event(), Queue())
+    display = Display(ImageOnlyMatrix())
+    display_plugin = RGBPlugin(display, Event(), Event(), Queue())
+
+    print(f"display_pixel_rand ({NUM_SPRITES} sprites):")
+    bench("PIL + thumbnail + SetImage", lambda: pixel_rand_pil(matrix, canvas, colors), 2_000)
+    bench("framebuffer + present()", lambda: pixel_rand_present(plugin, rng, color_array), 2_000)
+    bench("framebuffer + present() staging", lambda: pixel_rand_present(staging_plugin, rng, color_array), 2_000)
+    with display.owner("display_pixel_rand") as stats:
+        bench("present() Display staging", lambda: pixel_rand_present(display_plugin, rng, color_array), 2_000)
+    print(f"> {'pixels pushed vs full frames':<32} {stats.as_dict()['full_frame_fraction']:10.3f}")
+
+    print("\ndisplay_scatter_fill:")
+    bench("PIL + thumbnail + SetImage", lambda: scatter_fill_pil(matrix, canvas), 100)
+    bench("framebuffer + present()", lambda: scatter_fill_present(plugin, rng, palette), 2_000)
+    bench("framebuffer + present() staging", lambda: scatter_fill_present(staging_plugin, rng, palette), 2_000)
+    with display.owner("display_scatter_fill") as stats:
+        bench("present() Display staging", lambda: scatter_fill_present(display_plugin, rng, palette), 2_000)
+    print(f"> {'pixels pushed vs full frames':<32} {stats.as_dict()['full_frame_fraction']:10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Per-frame cost of drawing `display_heart_rand` hearts with the previous per-pixel `putpixel` loop
+vs. a compiled `Sprite` batch blit, for increasing `num_sprites`.
+
+Run from the repo root: `python -m benchmarks.bench_sprites`
+"""
+import timeit
+from random import randint
+
+import numpy as np
+from PIL import Image
+
+from util.sprite_util import Sprite
+from util.rgb_util import get_color_from_funkyfuture_palette
+
+SHAPE = (7, 6)
+UNFILL_PIXELS = [
+    (0, 0), (3, 0), (6, 0),
+    (0, 3), (6, 3),
+    (0, 4), (1, 4), (5, 4), (6, 4),
+    (0, 5), (1, 5), (2, 5), (4, 5), (5, 5), (6, 5)
+]
+
+def hearts_putpixel(num_sprites: int):
+    # previous display_heart_rand frame
+    img = Image.new("RGB", (64, 64))
+    for _ in range(num_sprites):
+        color = get_color_from_funkyfuture_palette(randint(0, 7))
+        top_left_pixel = (randint(0, 64 - SHAPE[0]), randint(0, 64 - SHAPE[1]))
+        for x in range(SHAPE[0]):
+            for y in range(SHAPE[1]):
+                if (x, y) in UNFILL_PIXELS:
+                    continue
+                img.putpixel((top_left_pixel[0] + x, top_left_pixel[1] + y), color)
+
+def hearts_blit(num_sprites: int, heart: Sprite, framebuffer: np.ndarray, palette: np.ndarray, rng):
+    framebuffer.fill(0)
+    positions = rng.integers(0, (64 - SHAPE[0] + 1, 64 - SHAPE[1] + 1), (num_sprites, 2))
+    heart.blit(framebuffer, positions, palette[rng.integers(0, len(palette), num_sprites)])
+
+def bench(label: str, frame, number: int) -> float:
+    seconds = min(timeit.repeat(frame, number=number, repeat=3)) / number
+    print(f">   {label:<10} {seconds * 1_000_000:10.1f} us/frame {1 / seconds:10.0f} fps")
+    return seconds
+
+def main():
+    rng = np.random.default_rng(0)
+    heart = Sprite.from_mask(*SHAPE, transparent_pixels=UNFILL_PIXELS)
+    framebuffer = np.zeros((64, 64, 3), dtype=np.uint8)
+    palette = np.array([get_color_from_funkyfuture_palette(i) for i in range(8)], dtype=np.uint8)
+    for num_sprites in (3, 100, 1_000, 5_000):
+        print(f"> {num_sprites} hearts:")
+        old = bench("putpixel", lambda: hearts_putpixel(num_sprites), max(1, 2_000 // num_sprites))
+        new = bench("blit", lambda: hearts_blit(num_sprites, heart, framebuffer, palette, rng), 200)
+        print(f">   speedup: {old / new:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -24,9 +24,12 @@ def get_env(key: str) -> str:
         raise Exception(err)
 
 class PluginConfig(object):
-    """Helper class for root and plugin config files."""    
-    def __init__(self, path: Path):
+    """Helper class for root and plugin config files.
+    Reads the `[plugin]`/`[plugins]` table by default, or another table if `section` is set.
+    """    
+    def __init__(self, path: Path, section: str = None):
         self.path = path
+        self.section = section
         self.items = self._load_config()
 
     def _load_config(self) -> dict:
@@ -38,6 +41,8 @@ class PluginConfig(object):
         with self.path.open(mode="rb") as f:
             conf = tomllib.load(f)
             print(f"> Loaded config: {conf}")
+            if self.section:
+                return conf.get(self.section, {})
             return conf.get("plugin") or conf.get("plugins")
         
     def get_item(self, key: str, fallback_value: any = None) -> any:
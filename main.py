@@ -1,11 +1,19 @@
+import signal
+import argparse
+from pathlib import Path
 from threading import Thread, Event
-from queue import Queue
-
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 
+from config.config import PluginConfig
 from plugin_manager.plugin_manager import Plugin_Manager
+from util.profiler import profiler, FirstFrameProbe, thread_cpu_times
+from util.rgb_display import Display, ReplayBuffer
+from util.frame_log import FrameLog
+from util.sync_util import WakeEvent
+from util.message_bus import MessageBus
+
+ROOT_PATH = Path(__file__).parent
 
-def pipeline_task_plugins(funcs: list[tuple[str, object]], ai_result_queue: Queue, terminate_thread: Event):    
+def pipeline_task_plugins(funcs: list[tuple[str, object]], ai_result_queue: MessageBus, terminate_thread: Event):    
     try:
         while True:
             result = None
@@ -20,24 +28,33 @@ def pipeline_task_plugins(funcs: list[tuple[str, object]], ai_result_queue: Queu
     except Exception as e:
         print(f"> pipeline_task_plugins() interrupted: error: {e}")
 
-def pipeline_rgb_plugins(funcs: list[tuple[str, object]], ai_result_queue: Queue, terminate_thread: Event):    
+def pipeline_rgb_plugins(funcs: list[tuple[str, object]], matrix: Display, ai_result_queue: MessageBus, terminate_thread: Event):    
     try:
         while True:
             for i, (name, impl) in enumerate(funcs):
-                # run rgb plugins
-                impl()
+                # run rgb plugins, counting the pixels each one pushes to the matrix
+                with matrix.owner(name):
+                    impl()
             print("> pipeline_rgb_plugins() done.")
     except Exception as e:
         print(f"> pipeline_rgb_plugins() interrupted: error: {e}")
         raise e
 
-def main():
-    # setup
-    rgb_start_event = Event()
-    ai_end_event = Event()
-    terminate_thread = Event()
-    ai_result_queue = Queue()
+def init_matrix(emulator: bool = False) -> Display:
+    """Initialize the LED matrix singleton.
+
+    Args:
+        emulator (bool, optional): Use the headless in-memory emulator instead of the RGB bonnet. Defaults to False.
+
+    Returns:
+        Display: LED matrix (RGBMatrix or EmulatorMatrix) wrapped to track what is on screen
+    """
+    if emulator:
+        from util.rgb_emulator import EmulatorMatrix
+        print("> Using RGB matrix emulator")
+        return Display(EmulatorMatrix(64, 64))
 
+    from rgbmatrix import RGBMatrix, RGBMatrixOptions
     options = RGBMatrixOptions()
     options.show_refresh_rate = False
     options.brightness = 80 # TODO: make configurable # Note: lower brightness reduces RGB current draw (good for hardware w/ lower current ratings)
@@ -46,14 +63,68 @@ def main():
     options.gpio_slowdown = 4
     options.hardware_mapping = 'adafruit-hat-pwm'
     options.drop_privileges = False # TODO: allow pixel art to run as non-root user 
-    matrix = RGBMatrix(options=options) # Note: must be singleton or else display bugs out (guessing all instances try to write from single call)
+    return Display(RGBMatrix(options=options)) # Note: must be singleton or else display bugs out (guessing all instances try to write from single call)
+
+def init_replay(matrix: Display) -> ReplayBuffer | None:
+    """Keep an instant replay of the last `replay_seconds` on screen (`[rgb]` in config.toml).
+    Send `SIGUSR1` to the process to save it as a GIF (e.g., `pkill -USR1 -f main.py`).
+
+    Args:
+        matrix (Display): LED matrix
+
+    Returns:
+        ReplayBuffer | None: Replay buffer, or None if disabled
+    """
+    rgb_config = PluginConfig(ROOT_PATH / "config.toml", section="rgb")
+    seconds = rgb_config.get_item("replay_seconds", 10)
+    if not seconds:
+        return None
+    replay = ReplayBuffer(matrix.width, matrix.height, seconds, rgb_config.get_item("replay_fps", 30))
+    matrix.add_tap(replay)
+    print(f"> Instant replay: last {seconds} s ({replay.size_bytes / 1_000_000:.1f} MB)")
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: replay.save_to(ROOT_PATH / "assets"))
+    return replay
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pixel Art")
+    parser.add_argument("--emulator", action="store_true", help="render to a headless in-memory matrix instead of the RGB bonnet")
+    parser.add_argument("--profile-startup", metavar="PATH", help="write a Chrome trace of startup phases (up to the first frame) to PATH")
+    parser.add_argument("--frame-log", metavar="PATH", help="append every frame shown on screen to a compressed frame log at PATH (see util/frame_log.py)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.profile_startup:
+        profiler.enable()
+
+    # setup
+    rgb_start_event = Event()
+    ai_end_event = WakeEvent() # wakes RGB plugins waiting on an ai_result_queue channel
+    terminate_thread = Event()
+
+    with profiler.phase("matrix_init"):
+        matrix = init_matrix(args.emulator)
+    ai_result_queue = MessageBus.from_config(ROOT_PATH / "config.toml", (matrix.width, matrix.height)) # channels between AI/game plugins and RGB plugins
+    matrix.add_tap(ai_result_queue.on_frame) # put() -> first pixel latency
+    init_replay(matrix)
+    if args.profile_startup:
+        def on_first_frame():
+            profiler.instant("first_frame")
+            profiler.save(args.profile_startup)
+        matrix.add_tap(FirstFrameProbe(matrix, on_first_frame))
+    frame_log = None
+    if args.frame_log:
+        frame_log = FrameLog(args.frame_log, matrix.width, matrix.height).start()
+        matrix.add_tap(frame_log)
 
     # load and register plugins
     pm = Plugin_Manager()
     pm.load_plugins()
-    pm.register_rgb_plugins(matrix, rgb_start_event, ai_end_event, ai_result_queue)
-    pm.register_ai_plugins(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
-    pm.register_game_plugins(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)    
+    with profiler.phase("register_plugins"):
+        pm.register_rgb_plugins(matrix, rgb_start_event, ai_end_event, ai_result_queue)
+        pm.register_ai_plugins(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
+        pm.register_game_plugins(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)    
     rgb_funcs, task_funcs = pm.get_plugin_funcs()
 
     # start child thread for ai
@@ -61,7 +132,7 @@ def main():
     t_wake.start()
 
     try:
-        pipeline_rgb_plugins(rgb_funcs, ai_result_queue, terminate_thread)
+        pipeline_rgb_plugins(rgb_funcs, matrix, ai_result_queue, terminate_thread)
         terminate_thread.set()
         t_wake.join()
     except KeyboardInterrupt:
@@ -71,6 +142,14 @@ def main():
         return
     except Exception as e:
         print(f"Error from main(): {e}")
+    finally:
+        if args.emulator:
+            print(f"> Emulator frame stats: {matrix.get_frame_stats()}")
+        print(f"> Display push stats: {matrix.get_push_stats()}")
+        print(f"> Message bus stats: {ai_result_queue.stats()}")
+        if frame_log:
+            frame_log.close()
+        print(f"> Thread CPU time (s): {thread_cpu_times()}")
     print("> main() exited.")
 
 if __name__ == "__main__":
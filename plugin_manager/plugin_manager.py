@@ -1,25 +1,41 @@
 import sys
 import inspect
 import re
+import json
+import hashlib
 import subprocess
+import importlib
 import importlib.util
+import importlib.metadata
 from pathlib import Path
+from threading import Thread
 
 import pluggy
-import semver
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.specifiers import SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import Version, InvalidVersion
 
 from config.config import PluginConfig
 from plugin_manager.hook_spec import MySpec
-from plugins.ai_pico_plugin import AIPicoPlugin
-from plugins.rgb_plugin import RGBPlugin
-from plugins.game_plugin import GamePlugin
+from util.profiler import profiler
 
 class Plugin_Manager():
+    DEPS_LOCK_PATH = Path(__file__).parents[1] / ".plugin_deps.lock"
+    # plugin category (plugins/<category>/...) -> parent plugin class
+    # parent modules are only imported for categories with included plugins, so unused stacks (e.g., pygame, openai) stay unloaded
+    PLUGIN_PARENT_CLASSES = {
+        "rgb": ("plugins.rgb_plugin", "RGBPlugin"),
+        "ai": ("plugins.ai_pico_plugin", "AIPicoPlugin"),
+        "game": ("plugins.game_plugin", "GamePlugin"),
+    }
+
     def __init__(self):
         # create manager and add hookspecs
         self.plugin_manager = pluggy.PluginManager("pixel_art")
         self.plugin_manager.add_hookspecs(MySpec)
-        self.root_config = PluginConfig(Path(__file__).parents[1] / "config.toml")
+        with profiler.phase("config_parse"):
+            self.root_config = PluginConfig(Path(__file__).parents[1] / "config.toml")
         self.ai_include_list: list[str] = self.root_config.items["ai"]
         self.rgb_include_list: list[str] = self.root_config.items["rgb"]
         self.rgb_plugin_classes: list[type] = []
@@ -44,44 +60,147 @@ class Plugin_Manager():
                 collected_paths.append(path)
         return collected_paths
     
-    def _pip_install_package(self, packages: set[str]):
+    def _pip_install_package(self, packages: set[str]) -> bool:
         try:
             subprocess.check_call([sys.executable, "-m", "pip", "install", *packages])
             print(f"> Successfully installed package: {packages}")
+            return True
         except subprocess.CalledProcessError as e:
             print(f"Error installing package: {packages}: {e}")
-    
-    def _install_plugin_deps(self, paths: list[Path]):
-        # collect requirements paths
+            return False
+
+    def _get_plugin_category(self, path: Path) -> str:
+        i = path.parts.index("plugins")
+        return path.parts[i + 1]
+
+    def _get_plugin_requirements_paths(self, paths: list[Path]) -> list[Path]:
         collected_paths = []
         for path in paths:
             i = path.parts.index("plugins")
-            if path.parts[i + 1] in ["ai", "game", "rgb"]:
+            if self._get_plugin_category(path) in self.PLUGIN_PARENT_CLASSES:
                 requirements = Path().joinpath(*path.parts[:i + 3], "requirements.txt")
-                if requirements.exists():
+                if requirements.exists() and requirements not in collected_paths:
                     collected_paths.append(requirements)
-        # collect packages
-        packages = []
-        for requirements in collected_paths:
+        return collected_paths
+
+    def _hash_requirements(self, paths: list[Path]) -> str:
+        """Hash the contents of plugin requirements files. Used as the dependency lockfile key."""
+        digest = hashlib.sha256()
+        for path in sorted(paths):
+            digest.update(path.as_posix().encode())
+            digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def _parse_requirement(self, requirement: str) -> Requirement | None:
+        """Parse a requirement line (PEP 508).
+
+        Args:
+            requirement (str): Requirement (e.g., "numpy==2.2.6")
+
+        Returns:
+            Requirement | None: Parsed requirement, or None if it isn't a plain package requirement (e.g., a URL)
+        """
+        try:
+            return Requirement(requirement)
+        except InvalidRequirement:
+            return None
+
+    def _version_key(self, specifier: SpecifierSet) -> Version:
+        """Greatest version named in a requirement's specifiers, used to pick between plugins pinning the same package.
+
+        Args:
+            specifier (SpecifierSet): Requirement specifiers
+
+        Returns:
+            Version: Greatest version, or 0 if there are none
+        """
+        versions = [Version("0")]
+        for s in specifier:
+            try:
+                versions.append(Version(s.version.removesuffix(".*")))
+            except InvalidVersion:
+                continue
+        return max(versions)
+
+    def _resolve_requirements(self, paths: list[Path]) -> list[str]:
+        """Merge plugin requirements files into one requirement per package.
+        If plugins pin the same package, the greatest pinned version wins.
+
+        Args:
+            paths (list[Path]): Plugin requirements files
+
+        Returns:
+            list[str]: Resolved requirements
+        """
+        resolved: dict[str, str] = {}
+        for requirements in paths:
             with open(requirements, "r") as f:
-                packages.extend([pkg.strip() for pkg in f.readlines()])
-        packages.sort()
+                for line in f.readlines():
+                    pkg = line.split("#")[0].strip()
+                    if not pkg or pkg.startswith("-"):
+                        continue
+                    requirement = self._parse_requirement(pkg)
+                    if requirement is None:
+                        # not a plain package, left to pip as is
+                        resolved[pkg] = pkg
+                        continue
+                    name = canonicalize_name(requirement.name)
+                    if name not in resolved:
+                        resolved[name] = pkg
+                        continue
+                    current = self._parse_requirement(resolved[name])
+                    if self._version_key(requirement.specifier) > self._version_key(current.specifier):
+                        resolved[name] = pkg
+        return sorted(resolved.values())
+
+    def _is_requirement_satisfied(self, requirement: str, installed: set[str]) -> bool:
+        parsed = self._parse_requirement(requirement)
+        if parsed is None:
+            # not a plain package (e.g., URL/VCS line), satisfied once pip installed that exact line
+            return requirement in installed
+        if parsed.marker and not parsed.marker.evaluate():
+            return True # not needed on this platform
+        try:
+            installed = importlib.metadata.version(parsed.name)
+        except importlib.metadata.PackageNotFoundError:
+            return False
+        # installed pre-releases count, or a pinned pre-release would be reinstalled on every boot
+        return parsed.specifier.contains(installed, prereleases=True)
+
+    def _load_deps_lock(self) -> dict:
+        try:
+            with self.DEPS_LOCK_PATH.open("r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_deps_lock(self, requirements_hash: str, requirements: list[str], installed: list[str]):
+        try:
+            with self.DEPS_LOCK_PATH.open("w") as f:
+                json.dump({"hash": requirements_hash, "requirements": requirements, "installed": installed}, f, indent=4)
+        except OSError as e:
+            print(f"> Failed to write plugin dependency lockfile: {e}")
+
+    def _install_plugin_deps(self, paths: list[Path]):
         # TODO: refactor plugins as child processes w/ own sys.path instead?
-        reduced_packages = set()
-        for i, pkg in enumerate(packages[:-1]):
-            pkg_next = packages[i + 1]
-            v1 = re.split(r"[<>=~]+", pkg)[-1]
-            v2 = re.split(r"[<>=~]+", pkg_next)[-1]
-            result = semver.compare(v1, v2)
-            if result:
-                # pkg greater
-                reduced_packages.add(pkg)
-            else:
-                # pkg_next greater or equal
-                reduced_packages.add(pkg_next)
-        reduced_packages.add(packages[-1]) # add last pkg since not iterated over
-        # install packages
-        self._pip_install_package(reduced_packages)
+        collected_paths = self._get_plugin_requirements_paths(paths)
+        requirements_hash = self._hash_requirements(collected_paths)
+        # reuse resolved requirements if no plugin requirements changed since last boot
+        lock = self._load_deps_lock()
+        requirements = lock.get("requirements") if lock.get("hash") == requirements_hash else None
+        if requirements is None:
+            print("> Plugin requirements changed. Resolving dependencies...")
+            requirements = self._resolve_requirements(collected_paths)
+        # requirements pip can't be asked about by version (e.g., URL/VCS lines), recorded once installed
+        installed = set(lock.get("installed", [])) & set(requirements)
+        # only run pip for packages that aren't already installed
+        missing = {r for r in requirements if not self._is_requirement_satisfied(r, installed)}
+        if missing and not self._pip_install_package(missing):
+            return
+        print(f"> Plugin dependencies satisfied: {len(requirements)} packages, {len(missing)} installed")
+        installed |= {r for r in missing if self._parse_requirement(r) is None}
+        if lock.get("hash") != requirements_hash or sorted(installed) != lock.get("installed"):
+            self._save_deps_lock(requirements_hash, requirements, sorted(installed))
 
     def _import_plugin_modules(self, paths: list[Path]) -> list:
         modules = []
@@ -90,50 +209,65 @@ class Plugin_Manager():
             spec = importlib.util.spec_from_file_location(path.stem, path)
             print(spec)
             # import plugin module
-            module = importlib.util.module_from_spec(spec)
-            sys.modules[path.stem] = module
-            spec.loader.exec_module(module)
+            with profiler.phase(f"import {path.stem}", category="import"):
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[path.stem] = module
+                spec.loader.exec_module(module)
             modules.append(module)
         return modules
 
     def load_plugins(self):
         # collect plugin modules & classes
-        plugin_paths = self._get_absolute_module_paths("plugins")
-        filtered_plugin_paths = self._filter_absolute_module_paths(plugin_paths)
-        self._install_plugin_deps(filtered_plugin_paths)
-        plugin_modules = self._import_plugin_modules(filtered_plugin_paths)
-        for p in plugin_modules:
+        with profiler.phase("plugin_discovery"):
+            plugin_paths = self._get_absolute_module_paths("plugins")
+            filtered_plugin_paths = self._filter_absolute_module_paths(plugin_paths)
+        with profiler.phase("dependency_install"):
+            self._install_plugin_deps(filtered_plugin_paths)
+        with profiler.phase("module_import"):
+            plugin_modules = self._import_plugin_modules(filtered_plugin_paths)
+        plugin_classes = {
+            "rgb": self.rgb_plugin_classes,
+            "ai": self.ai_plugin_classes,
+            "game": self.game_plugin_classes,
+        }
+        for path, p in zip(filtered_plugin_paths, plugin_modules):
+            category = self._get_plugin_category(path)
+            if category not in self.PLUGIN_PARENT_CLASSES:
+                continue
+            # parent module already imported by the plugin module itself
+            parent_module, parent_name = self.PLUGIN_PARENT_CLASSES[category]
+            parent = getattr(importlib.import_module(parent_module), parent_name)
             # append plugin class
-            for m in inspect.getmembers(p):
-                if inspect.isclass(m[1]):
-                    if issubclass(m[1], (RGBPlugin)) and m[0] not in ["RGBPlugin"]:
-                        self.rgb_plugin_classes.append(m[1])
-                    elif issubclass(m[1], (AIPicoPlugin)) and m[0] not in ["AIPicoPlugin", "GamePlugin"]:
-                        if issubclass(m[1], (GamePlugin)):
-                            self.game_plugin_classes.append(m[1])
-                        else:
-                            self.ai_plugin_classes.append(m[1])
+            for name, member in inspect.getmembers(p, inspect.isclass):
+                if issubclass(member, parent) and member.__module__ == p.__name__:
+                    plugin_classes[category].append(member)
 
     def register_rgb_plugins(self, matrix, rgb_start_event, ai_end_event, ai_result_queue):
+        plugins = []
         for C in self.rgb_plugin_classes:
-            self.plugin_manager.register(
-                plugin=C(matrix, rgb_start_event, ai_end_event, ai_result_queue),
-                name=C.__name__
-            )
+            with profiler.phase(f"construct {C.__name__}", category="plugin"):
+                plugin = C(matrix, rgb_start_event, ai_end_event, ai_result_queue)
+            self.plugin_manager.register(plugin=plugin, name=C.__name__)
+            plugins.append(plugin)
+        # load declared plugin assets in the background so startup isn't blocked on disk
+        Thread(name="warm_rgb_assets", target=self._warm_rgb_assets, args=(plugins,), daemon=True).start()
+
+    def _warm_rgb_assets(self, plugins: list):
+        for plugin in plugins:
+            with profiler.phase(f"warm_assets {plugin.__class__.__name__}", category="plugin"):
+                plugin.warm_assets()
     
     def register_ai_plugins(self, rgb_start_event, ai_end_event, ai_result_queue, terminate_thread):
         for C in self.ai_plugin_classes:
-            self.plugin_manager.register(
-                plugin=C(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread),
-                name=C.__name__
-            )
+            with profiler.phase(f"construct {C.__name__}", category="plugin"):
+                plugin = C(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
+            self.plugin_manager.register(plugin=plugin, name=C.__name__)
 
     def register_game_plugins(self, rgb_start_event, ai_end_event, ai_result_queue, terminate_thread):
         for C in self.game_plugin_classes:
-            self.plugin_manager.register(
-                plugin=C(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread),
-                name=C.__name__
-            )
+            with profiler.phase(f"construct {C.__name__}", category="plugin"):
+                plugin = C(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
+            self.plugin_manager.register(plugin=plugin, name=C.__name__)
 
     def _filter_plugin_funcs(self, plugin_funcs: list[tuple[str, object]], include_list: list[str]) -> list[tuple[str, object]]:
         ordered_filtered_plugin_funcs = []
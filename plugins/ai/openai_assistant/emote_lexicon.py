@@ -0,0 +1,78 @@
+import re
+import json
+from pathlib import Path
+
+class LexiconEmote:
+    """Local, CPU-only emotion classifier for AI responses. Scores a response against a weighted
+    word/phrase lexicon per emotion and picks the highest scoring emotion.\n
+    Example use: `LexiconEmote(path).classify("Wow, I didn't expect that!")`
+    """
+    NEGATIONS = {"not", "no", "never", "don't", "doesn't", "didn't", "isn't", "wasn't", "aren't", "won't", "nothing", "without"}
+    NEGATION_WINDOW = 2 # words after a negation that are ignored
+    PUNCTUATION_WEIGHTS = {"?": ("confusion", .5), "!": ("surprise", .5)}
+    TOKEN_PATTERN = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+
+    def __init__(self, lexicon_path: Path, min_score: float = 1.0):
+        """
+        Args:
+            lexicon_path (Path): JSON lexicon of `{emotion: {word or phrase: weight}}`
+            min_score (float, optional): Score an emotion needs to be chosen over no emotion. Defaults to 1.0.
+        """
+        with open(lexicon_path) as f:
+            lexicon: dict[str, dict[str, float]] = json.load(f)
+        self.emotions = list(lexicon)
+        self.min_score = min_score
+        # single words are looked up per token, phrases are matched against the normalized response
+        self.words: dict[str, list[tuple[int, float]]] = {}
+        self.phrases: list[tuple[str, int, float]] = []
+        for i, (emotion, entries) in enumerate(lexicon.items()):
+            for term, weight in entries.items():
+                tokens = self.TOKEN_PATTERN.findall(term.lower())
+                if len(tokens) == 1:
+                    self.words.setdefault(tokens[0], []).append((i, weight))
+                elif tokens:
+                    self.phrases.append((f" {' '.join(tokens)} ", i, weight))
+
+    def scores(self, text: str) -> dict[str, float]:
+        """Score a response for every emotion in the lexicon.
+
+        Args:
+            text (str): AI response
+
+        Returns:
+            dict[str, float]: Emotion scores
+        """
+        scores = [0.0] * len(self.emotions)
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        negated = 0
+        for token in tokens:
+            if token in self.NEGATIONS:
+                negated = self.NEGATION_WINDOW
+                continue
+            if negated:
+                negated -= 1
+                continue
+            for i, weight in self.words.get(token, ()):
+                scores[i] += weight
+        padded = f" {' '.join(tokens)} "
+        for phrase, i, weight in self.phrases:
+            if phrase in padded:
+                scores[i] += weight
+        result = dict(zip(self.emotions, scores))
+        for mark, (emotion, weight) in self.PUNCTUATION_WEIGHTS.items():
+            if emotion in result:
+                result[emotion] += weight * min(text.count(mark), 3)
+        return result
+
+    def classify(self, text: str) -> str | None:
+        """Infer emotion from AI response.
+
+        Args:
+            text (str): AI response
+
+        Returns:
+            str | None: Emotion, or None if no emotion scores at least `min_score`
+        """
+        scores = self.scores(text)
+        emotion = max(scores, key=scores.get)
+        return emotion if scores[emotion] >= self.min_score else None
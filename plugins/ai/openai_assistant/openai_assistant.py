@@ -1,14 +1,16 @@
 import os
+import re
 import base64
 import json
-import array
-import struct
 import wave
 from datetime import datetime
-from time import sleep, perf_counter
+from time import sleep, perf_counter, monotonic
 from pathlib import Path
-from threading import Thread, Event
-from queue import Queue
+from threading import Thread, Event, Timer, Lock
+from queue import Queue, Empty
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable
 
 import pluggy
 from openai import OpenAI
@@ -17,22 +19,39 @@ from websocket import WebSocketApp, WebSocketConnectionClosedException, STATUS_N
 
 from config.config import PluginConfig, get_env
 from plugins.ai_pico_plugin import AIPicoPlugin, PicoEvents
-from util.audio_util import init_recorder, init_speaker
+from plugins.ai.openai_assistant.emote_lexicon import LexiconEmote
+from util.audio_util import get_mic_capture, init_speaker, pcm16_to_bytes, pcm16_to_base64, bytes_to_pcm16
+from util.message_bus import MessageBus
 
 # Plugin function decorator
 hookimpl = pluggy.HookimplMarker("pixel_art")
 
 class Emote:
-    """Helper class that uses an OpenAI model to classify the emotion of an AI response."""
+    """Helper class that classifies the emotion of an AI response, using a local lexicon, an OpenAI model, or both."""
     DEFAULT_EMOTION = "neutral"
     EMOTIONS = [DEFAULT_EMOTION, "joy", "anger", "confusion", "fear", "sadness", "surprise"]
+    STRATEGIES = {"lexicon", "api", "hybrid"} # hybrid: lexicon, falling back to the API when no emotion is found
+    LEXICON_PATH = Path(__file__).parent / "assets/emote_lexicon.json"
 
     def __init__(self, config: PluginConfig):
         self.config = config
+        self.strategy = self.config.get_item("emote_strategy", "hybrid")
+        if self.strategy not in self.STRATEGIES:
+            raise ValueError(f"emote_strategy must be one of {self.STRATEGIES}: {self.strategy}")
+        self.lexicon = LexiconEmote(self.LEXICON_PATH) if self.strategy != "api" else None
         self.model = self.config.get_item("emote_model", "gpt-4.1-nano-2025-04-14")
-        self.client = OpenAI()
+        self.deadline = self.config.get_item("emote_deadline", 1.5) # seconds after the transcript before DEFAULT_EMOTION is used
+        self.cache_size = self.config.get_item("emote_cache_size", 128)
         self.background_response = None
-        self.send_request("donuts") # pre-warm model w/ discarded request
+        self.cache: OrderedDict[str, str] = OrderedDict() # normalized transcript -> emotion (LRU)
+        self.pending: dict[str, tuple[Future, float]] = {} # turn id -> (classification, deadline)
+        self.lock = Lock()
+        self.client = None
+        self.executor = None
+        if self.strategy != "lexicon":
+            self.client = OpenAI() # one client for the plugin's lifetime so requests reuse the pooled connection
+            self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="emote")
+            self.executor.submit(self.send_request, "donuts") # pre-warm model w/ discarded request, without blocking plugin construction
 
     def send_request(self, text: str, background: bool = False, timeout: int = 3) -> Response:
         """Sends an OpenAI API request to classify AI response on default set of EMOTIONS.
@@ -65,6 +84,7 @@ class Emote:
         Returns:
             str: Emotion
         """
+        emotion = None
         if res.status == "completed":
             if res.output_text in self.EMOTIONS:
                 print(f"Emotion inferred: {res.output_text}")
@@ -75,6 +95,120 @@ class Emote:
             print(f"Error: Emote response status: {res.status}")
         return emotion or self.DEFAULT_EMOTION
 
+    def normalize(self, text: str) -> str:
+        """Normalize an AI response for use as a cache key.
+
+        Args:
+            text (str): AI response
+
+        Returns:
+            str: Lowercase response with punctuation and repeated whitespace removed
+        """
+        return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+    def classify_local(self, text: str) -> str | None:
+        """Infer emotion from AI response without an API request, using the cache then the lexicon. Returns in well under a millisecond.
+
+        Args:
+            text (str): AI response
+
+        Returns:
+            str | None: Emotion, or None if neither the cache nor the lexicon found one
+        """
+        key = self.normalize(text)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                print(f"Emotion cache hit: {self.cache[key]}")
+                return self.cache[key]
+        if self.lexicon:
+            emotion = self.lexicon.classify(text)
+            if emotion:
+                print(f"Emotion inferred (lexicon): {emotion}")
+            return emotion
+        return None
+
+    def classify(self, text: str) -> str:
+        """Infer emotion from AI response. Uses the cache and lexicon first, then the API model unless `emote_strategy` is "lexicon".
+
+        Args:
+            text (str): AI response
+
+        Returns:
+            str: Emotion
+        """
+        emotion = self.classify_local(text)
+        if emotion or self.strategy == "lexicon":
+            return emotion or self.DEFAULT_EMOTION
+        start = perf_counter()
+        emotion = self.parse_emotion(self.send_request(text))
+        print(f"Emotion response time: {perf_counter()-start:.3f} seconds")
+        with self.lock:
+            key = self.normalize(text)
+            self.cache[key] = emotion
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return emotion
+
+    def submit(self, turn_id: str, text: str) -> Future:
+        """Start inferring emotion for a conversation turn. Local results are ready immediately,
+        API requests run in the background. Never blocks.
+
+        Args:
+            turn_id (str): Correlation id for the turn (e.g., Realtime API response id)
+            text (str): AI response
+
+        Returns:
+            Future: Emotion result
+        """
+        emotion = self.classify_local(text)
+        if emotion or self.strategy == "lexicon":
+            future = Future()
+            future.set_result(emotion or self.DEFAULT_EMOTION)
+        else:
+            future = self.executor.submit(self.classify, text)
+        with self.lock:
+            self.pending[turn_id] = (future, monotonic() + self.deadline)
+        return future
+
+    def resolve(self, turn_id: str, on_emotion: Callable[[str], None]):
+        """Deliver the emotion for a conversation turn once it's inferred or its deadline passes,
+        whichever comes first. `on_emotion` is called exactly once, with `DEFAULT_EMOTION` if the
+        classification failed, timed out, or was never submitted for this turn. Never blocks.
+
+        Args:
+            turn_id (str): Correlation id for the turn
+            on_emotion (Callable[[str], None]): Called with the turn's emotion
+        """
+        with self.lock:
+            future, deadline = self.pending.pop(turn_id, (None, 0))
+        if future is None:
+            print(f"Error: no emotion request for turn {turn_id}")
+            on_emotion(self.DEFAULT_EMOTION)
+            return
+        delivered = Event()
+        def deliver(emotion: str):
+            with self.lock:
+                if delivered.is_set():
+                    return
+                delivered.set()
+            timer.cancel()
+            on_emotion(emotion)
+        def on_done(f: Future):
+            try:
+                deliver(f.result())
+            except Exception as e:
+                print(f"Error: Emote fail: {e}")
+                deliver(self.DEFAULT_EMOTION)
+        def on_deadline():
+            print(f"Emotion deadline passed for turn {turn_id}, using {self.DEFAULT_EMOTION}")
+            deliver(self.DEFAULT_EMOTION)
+        timer = Timer(max(deadline - monotonic(), 0), on_deadline)
+        timer.daemon = True
+        timer.start()
+        future.add_done_callback(on_done)
+
     def begin_emotion_background_task(self, text: str) -> str:
         """Infer emotion from AI response as a background task. Must poll task to get emotion response.
         Note: Background task is slightly slower per request than thread.
@@ -114,7 +248,7 @@ class Emote:
             request_queue (Queue): AI response queue
             response_queue (Queue): Parsed emotion queue
         """
-        # TODO: resolve scenario: getting emotion times out, so next turn gets previous turn's emotion.
+        # Note: replies aren't correlated to turns, so a timed out request gives the next turn this turn's emotion. Use submit()/resolve() instead.
         while not end_event.is_set():
             if not request_queue.empty():
                 text = request_queue.get(block=True, timeout=3)
@@ -131,11 +265,17 @@ class Audio:
     BITS_PER_SAMPLE = SAMPLE_WIDTH * 8
     SAMPLE_RATE = 24_000
     FRAME_LENGTH = 1024
+    END_OF_RESPONSE = None # speaker/wave queue item that marks the end of a response
 
     def __init__(self):
-        self.audio_buffer = b""
+        self.audio_chunks: list[bytes] = []
+        self.response_bytes = 0
         self.conversation_turn_count = 0
-        self.recorder = init_recorder(frame_length=self.FRAME_LENGTH)
+        self.turn_start: float = None # perf_counter() when the assistant's turn began
+        self.time_to_first_audio_ms: list[float] = []
+        self.playback_start: float = None # perf_counter() when the current response started playing
+        # shared mic capture resamples the 16kHz device audio to the 24kHz the Realtime API expects
+        self.recorder = get_mic_capture().reader(frame_length=self.FRAME_LENGTH, sample_rate=self.SAMPLE_RATE)
         self.speaker = init_speaker(sample_rate=self.SAMPLE_RATE, bits_per_sample=self.BITS_PER_SAMPLE)
 
     def c_int16_to_16bit_pcm(self, int_array: list[int]) -> bytes:
@@ -147,17 +287,16 @@ class Audio:
         Returns:
             bytes: 16bit pcm audio buffer
         """
-        # pcm16 = b''.join(x.to_bytes(2, 'little') for x in int_array) # doesn't handle negative values
-        return b''.join(struct.pack('<h', x) for x in int_array)
+        return pcm16_to_bytes(int_array)
 
-    def chunk_audio(self, input_list: list[int]) -> list[list[int]]:
-        """Chunk audio by sample rate 24kHz.
+    def chunk_audio(self, input_list: memoryview) -> list[memoryview]:
+        """Chunk audio by sample rate 24kHz. Chunks of a memoryview are zero-copy.
 
         Args:
-            input_list (list[int]): Pcm audio
+            input_list (memoryview): Pcm audio
 
         Returns:
-            list[list[int]]: Chunked audio
+            list[memoryview]: Chunked audio
         """
         return [input_list[i:i + self.SAMPLE_RATE] for i in range(0, len(input_list), self.SAMPLE_RATE)]
 
@@ -174,25 +313,30 @@ class Audio:
             frames = f.readframes(f.getnframes())
             return base64.b64encode(frames).decode('ascii')
 
-    def write_wave_file(self, audio: bytes, path: Path) -> float:
-        """Write audio to .wav file.
+    def pcm_duration_ms(self, num_bytes: int) -> float:
+        """Duration of 16bit pcm audio.
 
         Args:
-            audio (bytes): Audio buffer
-            path (Path): Output path
+            num_bytes (int): Audio buffer length in bytes
 
         Returns:
             float: Audio duration in milliseconds
         """
-        with wave.open(path.as_posix(), 'wb') as f:
-            f.setnchannels(self.NUM_CHANNELS)
-            f.setsampwidth(self.SAMPLE_WIDTH)
-            f.setframerate(self.SAMPLE_RATE)
-            f.writeframes(audio)
-            recording_length_ms = f.getnframes() / f.getframerate() * 1_000
-            print(f"Recording length: {recording_length_ms} ms")
-        return recording_length_ms
-    
+        return num_bytes / (self.SAMPLE_WIDTH * self.NUM_CHANNELS) / self.SAMPLE_RATE * 1_000
+
+    def remaining_playback_ms(self, duration_ms: float) -> float:
+        """Time left until the current response finishes playing. With streaming, playback starts before the full response arrives.
+
+        Args:
+            duration_ms (float): Response audio duration in milliseconds
+
+        Returns:
+            float: Remaining playback time in milliseconds
+        """
+        if self.playback_start is None:
+            return duration_ms
+        return max(duration_ms - (perf_counter() - self.playback_start) * 1_000, 0)
+
     def recording_thread(self, recording_end_event: Event, ws: WebSocketApp):
         """Records audio from microphone and sends to OpenAI Realtime API. Meant to be run in a child thread.
 
@@ -205,8 +349,7 @@ class Audio:
             while not recording_end_event.is_set():
                 if self.recorder.is_recording:
                     try:
-                        pcm = self.c_int16_to_16bit_pcm(self.recorder.read())
-                        base64_pcm = base64.b64encode(pcm).decode('ascii')
+                        base64_pcm = pcm16_to_base64(self.recorder.read_array())
                         event = {
                             "type": "input_audio_buffer.append",
                             "audio":  base64_pcm
@@ -227,35 +370,93 @@ class Audio:
             print("recording_thread KeyboardInterrupt...")
         print("recording_thread exit.")
 
+    def write_to_speaker(self, data: bytes):
+        """Write all of the audio to the speaker, waiting while the speaker's buffer is full.
+
+        Args:
+            data (bytes): 16bit pcm audio buffer
+        """
+        for pcm_sublist in self.chunk_audio(bytes_to_pcm16(data)):
+            sublist_length = len(pcm_sublist)
+            total_written_length = 0
+            while total_written_length < sublist_length:
+                written_length = self.speaker.write(pcm_sublist[total_written_length:])
+                total_written_length += written_length
+                if total_written_length < sublist_length:
+                    sleep(.01) # speaker buffer full, allow other threads compute time (e.g., emotion gifs RGB in main thread)
+
     def speaker_thread(self, speaker_end_event: Event, speaker_audio_queue: Queue):
-        """Writes audio to speaker. Meant to be run in a child thread.
+        """Writes audio to speaker as it arrives. Meant to be run in a child thread.
+        Audio chunks are played immediately, and `END_OF_RESPONSE` waits for playback to finish then re-enables the recorder.
+
         Args:
             speaker_end_event (Event): Event that closes thread
             speaker_audio_queue (Queue): Audio input queue
         """
         # Note: ws close error: "websocket closing... 1011 - keepalive ping timeout"
         #       launching speaker in child thread so playing response audio doesn't block ws keepalive ping response
+        playing = False
         while not speaker_end_event.is_set():
-            if not speaker_audio_queue.empty():
-                data = speaker_audio_queue.get(block=True, timeout=3)
-                pcm = list(array.array('h', data))
-                pcm_list = self.chunk_audio(pcm)
-                print("Playing audio...")
-                for pcm_sublist in pcm_list:
-                    sublist_length = len(pcm_sublist)
-                    total_written_length = 0
-                    while total_written_length < sublist_length:
-                        written_length = self.speaker.write(pcm_sublist[total_written_length:])
-                        total_written_length += written_length
-                        sleep(.5) # allow other threads compute time (e.g., emotion gifs RGB in main thread)
+            try:
+                data = speaker_audio_queue.get(block=True, timeout=.5)
+            except Empty:
+                continue
+            if data is self.END_OF_RESPONSE:
                 print("Waiting for audio to finish...")
                 self.speaker.flush()
+                playing = False
+                self.turn_start = None
+                self.playback_start = None
                 sleep(.5)
                 print("enabling recorder")
                 self.recorder.start()
+                continue
+            if not playing:
+                playing = True
+                self.playback_start = perf_counter()
+                if self.turn_start:
+                    ttfa_ms = (perf_counter() - self.turn_start) * 1_000
+                    self.time_to_first_audio_ms.append(ttfa_ms)
+                    print(f"Playing audio... time to first audio: {ttfa_ms:.0f} ms")
+                else:
+                    print("Playing audio...")
+            self.write_to_speaker(data)
         self.speaker.stop()
+        if self.time_to_first_audio_ms:
+            print(f"Time to first audio: avg {sum(self.time_to_first_audio_ms) / len(self.time_to_first_audio_ms):.0f} ms over {len(self.time_to_first_audio_ms)} turns")
         print("speaker_thread exit.")
 
+    def wave_writer_thread(self, wave_end_event: Event, wave_queue: Queue):
+        """Writes response audio to .wav files as it arrives, so saving audio never blocks the websocket or speaker.
+        Meant to be run in a child thread. A `Path` item opens a new file, audio chunks are appended,
+        and `END_OF_RESPONSE` closes the file.
+
+        Args:
+            wave_end_event (Event): Event that closes thread
+            wave_queue (Queue): Output path and audio input queue
+        """
+        f = None
+        while not wave_end_event.is_set() or not wave_queue.empty():
+            try:
+                item = wave_queue.get(block=True, timeout=.5)
+            except Empty:
+                continue
+            if isinstance(item, Path):
+                f = wave.open(item.as_posix(), "wb")
+                f.setnchannels(self.NUM_CHANNELS)
+                f.setsampwidth(self.SAMPLE_WIDTH)
+                f.setframerate(self.SAMPLE_RATE)
+            elif item is self.END_OF_RESPONSE:
+                if f:
+                    print(f"Recording length: {f.getnframes() / f.getframerate() * 1_000} ms")
+                    f.close()
+                    f = None
+            elif f:
+                f.writeframes(item)
+        if f:
+            f.close()
+        print("wave_writer_thread exit.")
+
 class OpenAIAssistantPlugins(AIPicoPlugin):
     """OpenAI Assistant plugin class. Contains multiple plugins including running the assistant.
     Also manages websocket connection to OpenAI Realtime API."""
@@ -263,11 +464,12 @@ class OpenAIAssistantPlugins(AIPicoPlugin):
     PLUGIN_CONFIG_PATH = PLUGIN_BASE_PATH / "plugin.toml"
     PLUGIN_ASSETS_PATH = PLUGIN_BASE_PATH / "assets"
 
-    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue, terminate_thread: Event):
+    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus, terminate_thread: Event):
         super().__init__(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
         self.config = PluginConfig(self.PLUGIN_CONFIG_PATH)
         self.model = self.config.get_item("chat_model", "gpt-4o-realtime-preview-2025-06-03")
         self.voice = self.config.get_item("voice", "sage")
+        self.stream_audio = self.config.get_item("stream_audio", True)
         self.OPENAI_API_KEY = get_env('OPENAI_API_KEY')
         self.ws = WebSocketApp(
             url=f"wss://api.openai.com/v1/realtime?model={self.model}",
@@ -298,6 +500,16 @@ class OpenAIAssistantPlugins(AIPicoPlugin):
         os.makedirs(path, exist_ok=True)
         return path
     
+    def queue_playback(self, item: bytes | None):
+        """Hand audio (or `END_OF_RESPONSE`) to the speaker thread without ever blocking the websocket thread.
+        The speaker queue is unbounded: a response's audio is already bounded, and nothing is dropped, so playback has no gaps
+        and the speaker thread always sees the end of the response (and re-enables the recorder once playback finishes).
+
+        Args:
+            item (bytes | None): 16bit pcm audio buffer, or `Audio.END_OF_RESPONSE`
+        """
+        self.speaker_audio_queue.put_nowait(item)
+
     def check_for_termination_response(self, transcript: str):
         """Checks if AI response is saying bye. If so, it closes the websocket connnection.
 
@@ -363,7 +575,9 @@ class OpenAIAssistantPlugins(AIPicoPlugin):
         ws.send(json.dumps(event))
         # self.t_emote.start()
         self.audio.speaker.start()
+        self.audio.turn_start = perf_counter()
         self.t_speaker.start()
+        self.t_wave_writer.start()
         self.t_recorder.start() # recorder starts after first speaker outputs
         # write initial "Hello" message so agent responds as if it's greeting user first
         event = {
@@ -405,55 +619,70 @@ class OpenAIAssistantPlugins(AIPicoPlugin):
             self.timeout_counter = 0
         elif server_event["type"] == "input_audio_buffer.speech_stopped":
             print("Speech stopped")
+            self.audio.turn_start = perf_counter()
             # send think msg to rgb
-            self.ai_result_queue.put(("think", 1))
+            self.ai_result_queue["emotion"].put(("think", 1))
         elif server_event["type"] == "response.created":
             # Note: disabling recorder here so covers both speech and text events
             # disabling recorder so AI doesn't interpret its own response through the speaker as new user speech
             print("disabling recorder")
             self.audio.recorder.stop()
         elif server_event["type"] == "response.audio.delta":
-            self.audio.audio_buffer += base64.b64decode(server_event["delta"])
+            chunk = base64.b64decode(server_event["delta"])
+            if not self.audio.response_bytes:
+                # first audio of the response, start saving it (need audio time so doing here instead of speaker.write_to_file in speaker thread)
+                self.wave_queue.put(self.response_path / f"out-{self.audio.conversation_turn_count + 1}.wav")
+            self.audio.response_bytes += len(chunk)
+            self.wave_queue.put(chunk)
+            if self.stream_audio:
+                # play audio as it arrives
+                self.queue_playback(chunk)
+            else:
+                self.audio.audio_chunks.append(chunk)
         elif server_event["type"] == "response.audio_transcript.done":
             print(f"Transcript: {server_event['transcript']}")
-            start = perf_counter()
-            self.emote.background_response = self.emote.send_request(server_event["transcript"]) # emote strategy: synchronous/blocking
+            self.emote.submit(server_event["response_id"], server_event["transcript"]) # emote strategy: executor (non-blocking)
+            # self.emote.background_response = self.emote.send_request(server_event["transcript"]) # emote strategy: synchronous/blocking
             # status = emote.begin_emotion_background_task(server_event['transcript']) # emote strategy: background
             # emote_request_queue.put(server_event['transcript']) # emote strategy: thread
-            end = perf_counter()
-            print(f"Emotion response time: {end-start:.3f} seconds")
-        elif server_event["type"] == "response.done" and server_event['response']['status'] == 'completed':
-            self.audio.conversation_turn_count += 1
-            if server_event['response']['usage']['output_token_details']['audio_tokens']:
-                # save audio file (need audio time so doing here instead of speaker.write_to_file in speaker thread)
-                duration_ms = self.audio.write_wave_file(self.audio.audio_buffer, self.response_path / f"out-{self.audio.conversation_turn_count}.wav")
-                # send emotion to rgb
-                try:
-                    emotion = self.emote.parse_emotion(self.emote.background_response) # emote strategy: synchronous/blocking
-                    # emotion = emote.poll_emotion_background_task() # emote strategy: background
-                    # emotion = emote_response_queue.get(block=True, timeout=10) # emote strategy: thread
+        elif server_event["type"] == "response.done":
+            status = server_event['response']['status']
+            # close the response's .wav file whatever its status (completed, cancelled, incomplete), so the next response gets its own file
+            self.wave_queue.put(Audio.END_OF_RESPONSE)
+            if status == 'completed':
+                self.audio.conversation_turn_count += 1
+            if status == 'completed' and server_event['response']['usage']['output_token_details']['audio_tokens']:
+                duration_ms = self.audio.pcm_duration_ms(self.audio.response_bytes)
+                # send emotion to rgb once inferred, or DEFAULT_EMOTION if it misses the deadline
+                # rgb shows the emotion for the rest of the response's playback, so the avatar stops when the audio does
+                def send_emotion(emotion: str, duration_ms: float = duration_ms):
                     print(f"Emote success: {emotion}")
-                    # send inferred emotion to rgb queue
-                    self.ai_result_queue.put((emotion, duration_ms))
-                except Exception as e:
-                    print(f"Error: Emote fail: {e}")
-                    # send neutral emotion to rgb queue as default
-                    self.ai_result_queue.put((self.emote.DEFAULT_EMOTION, duration_ms))
-                # send full audio response to speaker
-                self.speaker_audio_queue.put(self.audio.audio_buffer)
+                    self.ai_result_queue["emotion"].put((emotion, self.audio.remaining_playback_ms(duration_ms)))
+                self.emote.resolve(server_event["response"]["id"], send_emotion) # emote strategy: executor (non-blocking)
+                # emotion = emote.poll_emotion_background_task() # emote strategy: background
+                # emotion = emote_response_queue.get(block=True, timeout=10) # emote strategy: thread
+                if not self.stream_audio:
+                    # send full audio response to speaker
+                    self.queue_playback(b"".join(self.audio.audio_chunks))
+                self.queue_playback(Audio.END_OF_RESPONSE)
                 # check for termination word
                 transcript = server_event['response']['output'][0]['content'][0]["transcript"].lower()
                 self.check_for_termination_response(transcript)
-                # clear audio buffer
-                self.audio.audio_buffer = b""
                 # sleep(1)
+            elif self.stream_audio and self.audio.response_bytes:
+                # cancelled/incomplete response already partly played, speaker re-enables the recorder once it finishes
+                print(f"Response {status}")
+                self.queue_playback(Audio.END_OF_RESPONSE)
             else:
                 # TODO: what to do w/ text-only responses?
                 # TODO: web search agent for anything after knowledge cutoff so doesn't hallucinate (e.g., top movies in 2025) or text response (e.g., weather tomorrow)
-                print("No response audio")
+                print(f"No response audio (status: {status})")
                 print("Received event:", json.dumps(server_event, indent=2))
                 print("Enabling recorder")
                 self.audio.recorder.start()
+            # clear audio buffer for the next response
+            self.audio.audio_chunks.clear()
+            self.audio.response_bytes = 0
 
     def on_error(self, ws: WebSocketApp, error):
         print(f"on_error: {error}")
@@ -473,6 +702,8 @@ class OpenAIAssistantPlugins(AIPicoPlugin):
         self.t_speaker.join()
         self.recording_end_event.set()
         self.t_recorder.join()
+        self.wave_end_event.set()
+        self.t_wave_writer.join()
         # self.emote_end_event.set()
         # self.t_emote.join()
 
@@ -511,12 +742,15 @@ class OpenAIAssistantPlugins(AIPicoPlugin):
         # initialize child threads here so resources cleaned up after each execution of run()
         self.recording_end_event = Event()
         self.speaker_end_event = Event()
+        self.wave_end_event = Event()
         # self.emote_end_event = Event() # emote strategy: thread
-        self.speaker_audio_queue = Queue()
+        self.speaker_audio_queue = Queue() # unbounded so the websocket thread never waits on the speaker
+        self.wave_queue = Queue()
         # self.emote_request_queue = Queue() # emote strategy: thread
         # self.emote_response_queue = Queue() # emote strategy: thread
         self.t_recorder = Thread(name="recorder_thread", target=self.audio.recording_thread, args=(self.recording_end_event, self.ws))
         self.t_speaker = Thread(name="speaker_thread", target=self.audio.speaker_thread, args=(self.speaker_end_event, self.speaker_audio_queue))
+        self.t_wave_writer = Thread(name="wave_writer_thread", target=self.audio.wave_writer_thread, args=(self.wave_end_event, self.wave_queue))
         # self.t_emote = Thread(name="emote_thread", target=self.emote.emotion_thread_task, args=(self.emote_end_event, self.emote_request_queue, self.emote_response_queue)) # emote strategy: thread
         
         self.ws.run_forever()
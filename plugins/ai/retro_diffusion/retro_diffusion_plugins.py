@@ -4,13 +4,15 @@ import re
 from time import time, sleep
 from pathlib import Path
 from threading import Event
-from queue import Queue
 
 import requests
 import pluggy
+from PIL import Image
 
 from config.config import PluginConfig, get_env
 from plugins.ai_pico_plugin import AIPicoPlugin, PicoAI, PicoEvents
+from util.rgb_util import get_palette
+from util.message_bus import MessageBus
 
 hookimpl = pluggy.HookimplMarker("pixel_art")
 
@@ -20,12 +22,13 @@ class RetroDiffusionPlugins(AIPicoPlugin):
     PLUGIN_CONFIG_PATH = PLUGIN_BASE_PATH / "plugin.toml"
     PLUGIN_ASSETS_PATH = PLUGIN_BASE_PATH / "assets"
     
-    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue, terminate_thread: Event):
+    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus, terminate_thread: Event):
         super().__init__(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
         self.config = PluginConfig(self.PLUGIN_CONFIG_PATH)
         self.model = self.config.get_item("model", "RD_FLUX")
         self.style = self.config.get_item("style", "detailed")
         self.record_time = self.config.get_item("record_time", 10)
+        self.palette = self.config.get_item("palette", "")
         self.RETRO_DIFFUSION_TOKEN = get_env('RETRO_DIFFUSION_TOKEN')
 
     def generate_image(self, prompt: str) -> str:
@@ -67,6 +70,11 @@ class RetroDiffusionPlugins(AIPicoPlugin):
                 img_data = base64_images[0]
                 with open(out_path, "wb") as f:
                     f.write(base64.b64decode(img_data))
+                if self.palette:
+                    # limit colors to an LED-friendly palette
+                    with Image.open(out_path) as img:
+                        quantized = get_palette(self.palette).quantize(img)
+                    quantized.save(out_path)
                 print(f"> Image generated and saved to {out_path}")
                 return out_path
             else:
@@ -91,7 +99,7 @@ class RetroDiffusionPlugins(AIPicoPlugin):
         """
         print(f"> test_return_img_path_to_main_thread() start.")
         sleep(3)
-        self.ai_result_queue.put(f"{self.PLUGIN_ASSETS_PATH}/examples/chimpanzee_swimming_detailed.png")
+        self.ai_result_queue["image"].put(f"{self.PLUGIN_ASSETS_PATH}/examples/chimpanzee_swimming_detailed.png")
         print(f"> test_return_img_path_to_main_thread() done.")
     
     @hookimpl(specname="ai_hook")
@@ -130,11 +138,15 @@ class RetroDiffusionPlugins(AIPicoPlugin):
             text (str): Description of image
 
         Returns:
-            str: Image path
+            str: Image path, None if generation failed
         """
         self.text_to_speech("Creating pixel art now")
         img_path = self.generate_image(text)
+        if not img_path:
+            # nothing to show, the RGB plugin exits once this plugin ends
+            self.text_to_speech("Sorry, I couldn't create that image")
+            return img_path
 
-        self.ai_result_queue.put(img_path)
+        self.ai_result_queue["image"].put(img_path)
         sleep(5) # allow time for RGB plugin to display image
         return img_path
@@ -1,19 +1,220 @@
-from time import time, perf_counter
+from time import time, sleep, perf_counter, monotonic
 from datetime import datetime
+from pathlib import Path
 import functools
-from threading import Event
-from queue import Queue
-
-import pvcobra
-import pvporcupine
-import pvleopard
-import pvrhino
-import pvorca
-from pvrecorder import PvRecorder
+from threading import Event, Thread, Lock
+from typing import TYPE_CHECKING
+
 from pvspeaker import PvSpeaker
 
-from config.config import get_env
-from util.audio_util import init_recorder, init_speaker
+from config.config import PluginConfig, get_env
+from util.audio_util import MicReader, get_mic_capture, init_speaker
+from util.message_bus import MessageBus
+
+if TYPE_CHECKING:
+    # engines are imported on first use in PicoModels so unused engines are never loaded
+    import pvcobra
+    import pvporcupine
+    import pvleopard
+    import pvrhino
+    import pvorca
+
+##############
+# MODEL POOL #
+##############
+
+class PooledModel:
+    """A Picovoice engine held by `PicoModelPool`."""
+    def __init__(self, name: str, engine: object):
+        self.name = name
+        self.engine = engine
+        self.in_use = False
+        self.last_used = monotonic()
+
+class PicoModelPool:
+    """Process-wide pool that keeps Picovoice engines resident between plugin calls.\n
+    Engines are handed out exclusively (Picovoice engines are stateful and not thread-safe) and
+    reference-counted per model: a second concurrent user gets a second engine.
+    Idle engines are deleted after `idle_timeout` seconds or when idle engines exceed `memory_budget_mb`.\n
+    Example use: `porcupine = model_pool.acquire("porcupine", access_key)`
+    """
+    # approximate resident memory per engine, only used to enforce the memory budget
+    MODEL_SIZES_MB = {"cobra": 1, "leopard": 40, "orca": 10, "porcupine": 2, "rhino": 2}
+    SUPPORTED_MODELS = tuple(MODEL_SIZES_MB)
+
+    def __init__(self, idle_timeout: float = 300, memory_budget_mb: float = 0):
+        self.idle_timeout = idle_timeout
+        self.memory_budget_mb = memory_budget_mb
+        self.configured = False
+        self._models: dict[str, list[PooledModel]] = {name: [] for name in self.SUPPORTED_MODELS}
+        self._loading: dict[str, Event] = {}
+        self._lock = Lock()
+        self._evict_thread: Thread = None
+
+    def configure(self, idle_timeout: float, memory_budget_mb: float):
+        """Set eviction policy and start the idle eviction thread.
+
+        Args:
+            idle_timeout (float): Seconds an unused engine stays loaded. 0 disables idle eviction.
+            memory_budget_mb (float): Approx. memory limit for idle engines in MB. 0 disables the limit.
+        """
+        self.idle_timeout = idle_timeout
+        self.memory_budget_mb = memory_budget_mb
+        self.configured = True
+        if self.idle_timeout and not self._evict_thread:
+            self._evict_thread = Thread(name="pico_model_evict", target=self._evict_loop, daemon=True)
+            self._evict_thread.start()
+
+    def _create(self, name: str, access_key: str) -> object:
+        """Create a Picovoice engine."""
+        if name == "orca":
+            import pvorca
+            return pvorca.create(access_key=access_key)
+        if name == "cobra":
+            import pvcobra
+            return pvcobra.create(access_key=access_key)
+        if name == "porcupine":
+            import pvporcupine
+            return pvporcupine.create(
+                access_key=access_key,
+                keyword_paths=["models/pico/wake/wake-word_v3_0_0.ppn"]
+            )
+        if name == "leopard":
+            import pvleopard
+            print("> Loading ASR model...")
+            leopard = pvleopard.create(
+                access_key=access_key,
+                model_path="models/pico/asr/speech-to-text_v2.0.0_04-12-25.pv"
+            )
+            print("> ASR model loaded.")
+            return leopard
+        if name == "rhino":
+            import pvrhino
+            return pvrhino.create(
+                access_key=access_key,
+                context_path="models/pico/intent/speech-to-intent_v3_0_0.rhn"
+            )
+        raise Exception(f"Unsupported Picovoice model: {name}")
+
+    def acquire(self, name: str, access_key: str) -> object:
+        """Get an idle engine from the pool, creating one if none are idle.
+
+        Args:
+            name (str): Model name (cobra, leopard, orca, porcupine, rhino)
+            access_key (str): Picovoice access key
+
+        Returns:
+            object: Picovoice engine. Must be returned with `release()`.
+        """
+        while True:
+            with self._lock:
+                idle = [m for m in self._models[name] if not m.in_use]
+                if idle:
+                    model = max(idle, key=lambda m: m.last_used)
+                    model.in_use = True
+                    return model.engine
+                loading = self._loading.get(name)
+                if not loading:
+                    loading = self._loading[name] = Event()
+                    break
+            # engine is being preloaded, wait for it instead of loading a second copy
+            loading.wait()
+        try:
+            start = perf_counter()
+            model = PooledModel(name, self._create(name, access_key))
+            print(f"> Created Picovoice model {name} in {(perf_counter() - start):.3f}s")
+            model.in_use = True
+            with self._lock:
+                self._models[name].append(model)
+            return model.engine
+        finally:
+            with self._lock:
+                self._loading.pop(name).set()
+
+    def release(self, name: str, engine: object):
+        """Return an engine to the pool. It stays loaded until evicted.
+
+        Args:
+            name (str): Model name
+            engine (object): Engine returned by `acquire()`
+        """
+        with self._lock:
+            for model in self._models[name]:
+                if model.engine is engine:
+                    model.in_use = False
+                    model.last_used = monotonic()
+        self._enforce_memory_budget()
+
+    def _preload(self, models: list[str], access_key: str):
+        for name in models:
+            try:
+                self.release(name, self.acquire(name, access_key))
+            except Exception as e:
+                print(f"> Failed to preload Picovoice model {name}: {e}")
+
+    def preload(self, models: list[str], access_key: str) -> Thread:
+        """Create engines in a background thread so the first plugin call doesn't pay for model loading.
+
+        Args:
+            models (list[str]): Model names
+            access_key (str): Picovoice access key
+
+        Returns:
+            Thread: Preload thread
+        """
+        with self._lock:
+            models = [name for name in models if name in self.SUPPORTED_MODELS and not self._models[name]]
+        t = Thread(name="pico_model_preload", target=self._preload, args=(models, access_key), daemon=True)
+        t.start()
+        return t
+
+    def _delete(self, models: list[PooledModel]):
+        for model in models:
+            print(f"> Evicting idle Picovoice model {model.name}")
+            model.engine.delete()
+
+    def _enforce_memory_budget(self):
+        if not self.memory_budget_mb:
+            return
+        evicted = []
+        with self._lock:
+            idle = sorted([m for models in self._models.values() for m in models if not m.in_use], key=lambda m: m.last_used)
+            idle_mb = sum(self.MODEL_SIZES_MB[m.name] for m in idle)
+            while idle and idle_mb > self.memory_budget_mb:
+                model = idle.pop(0) # least recently used
+                self._models[model.name].remove(model)
+                idle_mb -= self.MODEL_SIZES_MB[model.name]
+                evicted.append(model)
+        self._delete(evicted)
+
+    def evict_idle(self):
+        """Delete engines that have been idle longer than `idle_timeout`."""
+        now = monotonic()
+        evicted = []
+        with self._lock:
+            for models in self._models.values():
+                for model in list(models):
+                    if not model.in_use and now - model.last_used > self.idle_timeout:
+                        models.remove(model)
+                        evicted.append(model)
+        self._delete(evicted)
+
+    def _evict_loop(self):
+        while self.idle_timeout:
+            sleep(min(self.idle_timeout / 2, 30))
+            self.evict_idle()
+
+    def stats(self) -> dict:
+        """Loaded engines per model.
+
+        Returns:
+            dict: Model name -> {"loaded": int, "in_use": int}
+        """
+        with self._lock:
+            return {name: {"loaded": len(models), "in_use": sum(m.in_use for m in models)} for name, models in self._models.items() if models}
+
+# process-wide model pool shared by all AI and game plugins
+model_pool = PicoModelPool()
 
 #####################
 # PLUGIN DECORATORS #
@@ -21,7 +222,8 @@ from util.audio_util import init_recorder, init_speaker
 
 class PicoRecord:
     """Decorator to automatically start recording audio.\n
-    Decorated function can read audio with `self.recorder.read()`.\n
+    Decorated function can read audio with `self.recorder.read()`.
+    All plugins read from one shared microphone capture (see `util.audio_util.MicCapture`).\n
     Example use: `@PicoRecord()`
     """
     def __init__(self, debug: bool = False):
@@ -32,7 +234,7 @@ class PicoRecord:
             print(f"Before {self.__class__.__name__}")
             obj = args[0]
             if not obj.recorder:
-                obj.recorder = init_recorder()
+                obj.recorder = get_mic_capture().reader()
             obj.recorder.start()
             # call decorated func
             result = func(*args, **kwargs)
@@ -132,8 +334,9 @@ class PicoEvents:
         return wrapper
     
 class PicoModels:
-    """Decorator for initializing different Picovoice AI models.
-    Once initialized, use models as plugin member variables: `self.leopard.version`.\n
+    """Decorator for using different Picovoice AI models.
+    Models are borrowed from the process-wide `model_pool` and stay resident between calls.
+    During the call, use models as plugin member variables: `self.leopard.version`.\n
     Supported models: cobra, leopard, orca, porcupine, rhino.\n
     Example use: `@PicoModels(models = ["leopard"])`
     """
@@ -144,51 +347,31 @@ class PicoModels:
         def wrapper(*args, **kwargs):
             print(f"Before {self.__class__.__name__}")
             obj = args[0]
-            self.standup_models(obj, self.models)#args[1])
-            # call decorated func
-            result = func(*args, **kwargs)
-            self.cleanup_models(obj, self.models)#args[1])
+            try:
+                # acquired inside try, so engines are returned even if a later model fails to load
+                self.standup_models(obj, self.models)#args[1])
+                # call decorated func
+                result = func(*args, **kwargs)
+            finally:
+                self.cleanup_models(obj, self.models)#args[1])
             print(f"After {self.__class__.__name__}")
             return result
         functools.update_wrapper(wrapper, func)
         return wrapper
     
     def standup_models(self, decorated_self: object, models: list[str]):
-        """Initialize specified Picovoice models."""
-        if "orca" in models:
-            decorated_self.orca = pvorca.create(access_key=decorated_self.PICOVOICE_TOKEN)
-        if "cobra" in models:
-            decorated_self.cobra = pvcobra.create(access_key=decorated_self.PICOVOICE_TOKEN)
-        if "porcupine" in models:
-            decorated_self.porcupine = pvporcupine.create(
-                access_key=decorated_self.PICOVOICE_TOKEN,
-                keyword_paths=["models/pico/wake/wake-word_v3_0_0.ppn"]
-            )
-        if "leopard" in models:
-            print("> Loading ASR model...")
-            decorated_self.leopard = pvleopard.create(
-                access_key=decorated_self.PICOVOICE_TOKEN,
-                model_path="models/pico/asr/speech-to-text_v2.0.0_04-12-25.pv"
-            )
-            print("> ASR model loaded.")
-        if "rhino" in models:
-            decorated_self.rhino = pvrhino.create(
-                access_key=decorated_self.PICOVOICE_TOKEN,
-                context_path="models/pico/intent/speech-to-intent_v3_0_0.rhn"
-            )
+        """Acquire specified Picovoice models from the model pool."""
+        for name in models:
+            setattr(decorated_self, name, model_pool.acquire(name, decorated_self.PICOVOICE_TOKEN))
 
     def cleanup_models(self, decorated_self: object, models: list[str]):
-        """Delete initialized Picovoice models."""
-        if "orca" in models:
-            decorated_self.orca.delete()
-        if "cobra" in models:
-            decorated_self.cobra.delete()
-        if "porcupine" in models:
-            decorated_self.porcupine.delete()
-        if "leopard" in models:
-            decorated_self.leopard.delete()
-        if "rhino" in models:
-            decorated_self.rhino.delete()
+        """Return specified Picovoice models to the model pool. Models that weren't acquired are skipped."""
+        for name in models:
+            engine = getattr(decorated_self, name, None)
+            if engine is None:
+                continue
+            model_pool.release(name, engine)
+            setattr(decorated_self, name, None)
 
 class PicoAI:
     """Decorator that wraps `PicoEvents`, `PicoModels`, `PicoRecord`, and `PicoSpeaker`.
@@ -218,8 +401,18 @@ class PicoAI:
 
 class AIPicoPlugin():
     """AI parent plugin class. Should be extended by plugins that want to use Picovoice models."""
-    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue, terminate_thread: Event):
+    ROOT_CONFIG_PATH = Path(__file__).parents[1] / "config.toml"
+
+    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus, terminate_thread: Event):
         self.PICOVOICE_TOKEN = get_env("PICOVOICE_TOKEN")
+        if not model_pool.configured:
+            # first AI plugin sets up the shared model pool
+            pico_config = PluginConfig(self.ROOT_CONFIG_PATH, section="pico")
+            model_pool.configure(
+                idle_timeout=pico_config.get_item("model_idle_timeout", 300),
+                memory_budget_mb=pico_config.get_item("model_memory_budget_mb", 0)
+            )
+            model_pool.preload(pico_config.get_item("preload_models", []), self.PICOVOICE_TOKEN)
         self.rgb_start_event = rgb_start_event
         self.ai_end_event = ai_end_event
         self.ai_result_queue = ai_result_queue
@@ -229,7 +422,7 @@ class AIPicoPlugin():
         self.porcupine: pvporcupine.Porcupine = None
         self.leopard: pvleopard.Leopard = None
         self.rhino: pvrhino.Rhino = None
-        self.recorder: PvRecorder = None
+        self.recorder: MicReader = None
         self.speaker: PvSpeaker = None
 
     @PicoModels(models = ["cobra"])
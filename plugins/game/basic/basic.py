@@ -1,11 +1,11 @@
 from pathlib import Path
 from threading import Event
-from queue import Queue
 
 import pluggy
 
 from config.config import PluginConfig
-from plugins.game_plugin import pygame, GamePlugin, AIGame
+from plugins.game_plugin import GamePlugin, AIGame
+from util.message_bus import MessageBus
 
 hookimpl = pluggy.HookimplMarker("pixel_art")
 
@@ -14,7 +14,7 @@ class BasicGame(GamePlugin):
     PLUGIN_BASE_PATH = Path(__file__).parent
     PLUGIN_CONFIG_PATH = PLUGIN_BASE_PATH / "plugin.toml"
 
-    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue, terminate_thread: Event):
+    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus, terminate_thread: Event):
         super().__init__(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
         self.config = PluginConfig(self.PLUGIN_CONFIG_PATH)
         self.runtime = self.config.get_item("runtime", 15)
@@ -34,7 +34,7 @@ class BasicGame(GamePlugin):
             color = "red"
 
             # poll for events
-            for event in pygame.event.get():
+            for event in self.get_events():
                 if event.type == self.UP_VOICE_EVENT.type:
                     print("---> cmd: up")
                     y -= 2
@@ -4,7 +4,6 @@ import random
 from time import sleep, time
 from pathlib import Path
 from threading import Event
-from queue import Queue
 
 import numpy as np
 import pluggy
@@ -12,6 +11,7 @@ from pygame.joystick import JoystickType
 
 from config.config import PluginConfig
 from plugins.game_plugin import pygame, GamePlugin, AIGame
+from util.message_bus import MessageBus
 
 hookimpl = pluggy.HookimplMarker("pixel_art")
 
@@ -266,7 +266,7 @@ class PixelZombieGame(GamePlugin):
     PLUGIN_CONFIG_PATH = PLUGIN_BASE_PATH / "plugin.toml"
     PLUGIN_ASSETS_PATH = PLUGIN_BASE_PATH / "assets"
 
-    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue, terminate_thread: Event):
+    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus, terminate_thread: Event):
         super().__init__(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
         self.config = PluginConfig(self.PLUGIN_CONFIG_PATH)
         self.zombie_color = self.config.get_item("zombie_color", "green")
@@ -388,7 +388,7 @@ class PixelZombieGame(GamePlugin):
         while running:
             self.clock.tick(FPS)
             # poll for events
-            for event in pygame.event.get():
+            for event in self.get_events():
                 self.handle_controller_hotplugging(event, zombie_sprites, zombie_spawn_pos)
                 # handle start/quit selection
                 if event.type == pygame.JOYAXISMOTION:
@@ -438,7 +438,7 @@ class PixelZombieGame(GamePlugin):
         while running:
             self.clock.tick(FPS)
             # poll for events
-            for event in pygame.event.get():
+            for event in self.get_events():
                 # dynamically load/unload any controllers
                 self.handle_controller_hotplugging(event, zombie_sprites, zombie_spawn_pos)
                 if event.type == pygame.JOYBUTTONDOWN:
@@ -1,18 +1,15 @@
 import os
 import wave
 import io
-import struct
 import functools
 from time import time, sleep, perf_counter
 from threading import Event, Thread
-from queue import Queue
 
-import numpy as np
-from PIL import Image
 import pygame
-from openai import OpenAI
 
 from plugins.ai_pico_plugin import AIPicoPlugin, PicoModels, PicoRecord, PicoEvents
+from util.audio_util import pcm16_to_bytes
+from util.message_bus import MessageBus
 
 #####################
 # PLUGIN DECORATORS #
@@ -104,7 +101,7 @@ class GamePlugin(AIPicoPlugin):
     Args:
         AIPicoPlugin (_type_): AI parent plugin class for Picovoice AI.
     """
-    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue, terminate_thread: Event):
+    def __init__(self, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus, terminate_thread: Event):
         super().__init__(rgb_start_event, ai_end_event, ai_result_queue, terminate_thread)
         self.screen: pygame.Surface = None
         self.clock: pygame.time.Clock = None
@@ -125,21 +122,42 @@ class GamePlugin(AIPicoPlugin):
         self.TRADE_VOICE_EVENT = pygame.event.Event(pygame.event.custom_type())
         self.GRAB_VOICE_EVENT = pygame.event.Event(pygame.event.custom_type())
         self.DISCARD_VOICE_EVENT = pygame.event.Event(pygame.event.custom_type())
+        # player input, timestamped by get_events() for input-to-photon latency
+        self.input_event_types = {
+            pygame.JOYAXISMOTION, pygame.JOYHATMOTION, pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.KEYDOWN, pygame.KEYUP,
+            *(event.type for name, event in vars(self).items() if name.endswith("_VOICE_EVENT"))
+        }
+        self.input_time: float = None # first player input not drawn yet
+
+    def get_events(self) -> list[pygame.event.Event]:
+        """Pixel Art replacement of `pygame.event.get()`.
+        Timestamps player input, so the latency from input to the next drawn frame on the LED array screen is measured.
+
+        Returns:
+            list[pygame.event.Event]: Events from the queue
+        """
+        events = pygame.event.get()
+        if self.input_time is None and any(event.type in self.input_event_types for event in events):
+            self.input_time = perf_counter()
+        return events
 
     def draw(self):
         """Pixel Art replacement of  `pygame.display.flip()`.
         Sends gameplay frames to rgb thread for rendering on LED array screen.
+        The newest frame replaces any frame the rgb thread hasn't shown yet, so the screen never lags behind the game.
         """
         # RENDER YOUR GAME HERE
         # flip() the display to put your work on screen
         # pygame.display.flip()
+        mailbox = self.ai_result_queue["frame"]
         surf = pygame.display.get_surface()
-        arr = pygame.surfarray.array3d(surf)
-        arr = np.rot90(np.fliplr(arr)) # fix screen orientation
-        # print(arr)
-        img = Image.fromarray(arr)
-        img.convert('RGB')
-        self.ai_result_queue.put(img)
+        if surf.get_size() != (mailbox.width, mailbox.height):
+            surf = pygame.transform.smoothscale(surf, (mailbox.width, mailbox.height))
+        # surfarray is indexed [x, y]. Transposing gives screen rows (same as np.rot90(np.fliplr(arr))) without copying
+        pixels = pygame.surfarray.pixels3d(surf)
+        mailbox.put(pixels.transpose(1, 0, 2), self.input_time)
+        del pixels # unlock surface
+        self.input_time = None
 
     def dispatch_game_event(self, voice_cmd: str):
         """Dispatch custom GamePlugin pygame events.
@@ -237,6 +255,8 @@ class GamePlugin(AIPicoPlugin):
             end (Event): Event that ends loop
         """
         # TODO: WIP, refactor and test.
+        from openai import OpenAI # deferred so games without this controller don't import openai
+
         print("> Init whisper_voice_controller")
         client = OpenAI()
         while not end.is_set():
@@ -259,7 +279,7 @@ class GamePlugin(AIPicoPlugin):
                     wf.setnchannels(1)
                     wf.setsampwidth(2) # 2 bytes
                     wf.setframerate(self.recorder.sample_rate)
-                    wf.writeframes(struct.pack("h" * len(frames), *frames))
+                    wf.writeframes(pcm16_to_bytes(frames))
                 # send audio to openai
                 t1 = perf_counter()
                 voice_cmd = client.audio.transcriptions.create(
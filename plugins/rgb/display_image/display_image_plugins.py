@@ -2,14 +2,14 @@ from time import sleep, time
 from random import randint
 from pathlib import Path
 from threading import Event
-from queue import Queue
+from queue import Empty
 
 import pluggy
-from PIL import Image, ImageSequence, ImageDraw, ImageFont
-from rgbmatrix import graphics
+from PIL import Image, ImageDraw
 
 from config.config import PluginConfig
-from plugins.rgb_plugin import RGBPlugin, RGBEvents
+from plugins.rgb_plugin import RGBPlugin, RGBEvents, FramePacer, frame_cache
+from util.message_bus import MessageBus
 
 hookimpl = pluggy.HookimplMarker("pixel_art")
 
@@ -18,29 +18,47 @@ class DisplayImagePlugins(RGBPlugin):
     PLUGIN_BASE_PATH = Path(__file__).parent
     PLUGIN_CONFIG_PATH = PLUGIN_BASE_PATH / "plugin.toml"
     PLUGIN_ASSETS_PATH = PLUGIN_BASE_PATH / "assets"
-
-    def __init__(self, matrix, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue):
+    AVATAR_PATH = PLUGIN_ASSETS_PATH / "avatar"
+    FONT_PATH = PLUGIN_ASSETS_PATH / "font/Tiny5-Regular.ttf"
+    DEFAULT_EMOTION = "neutral"
+    EMOTION_GIFS = {
+        DEFAULT_EMOTION: AVATAR_PATH / "surprise.gif",
+        "joy": AVATAR_PATH / "joy.gif",
+        "anger": AVATAR_PATH / "anger.gif",
+        "confusion": AVATAR_PATH / "confusion.gif",
+        "fear": AVATAR_PATH / "fear.gif",
+        "sadness": AVATAR_PATH / "sadness.gif",
+        "surprise": AVATAR_PATH / "surprise.gif"
+    }
+
+    def __init__(self, matrix, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus):
         super().__init__(matrix, rgb_start_event, ai_end_event, ai_result_queue)
         self.config = PluginConfig(self.PLUGIN_CONFIG_PATH)
         self.save_gameplay = self.config.get_item("save_gameplay", False)
         self.image_display_time = self.config.get_item("image_display_time", 5)
+        self.result_timeout = self.config.get_item("result_timeout", 120)
+        self.loading_images: dict[tuple[int], Image.Image] = {}
 
-    def loading(self, delay: int, color: tuple[int] = (255, 255, 255)):
-        """Display "Loading" text on LED array screen.
+    def loading(self, delay: int = 0, color: tuple[int] = (255, 255, 255)):
+        """Display "Loading" text on LED array screen, then idle until an image arrives or `delay` passes.
 
         Args:
-            delay (int): Delay in seconds before method exit
+            delay (int, optional): Max delay in seconds before method exit. Defaults to 0 (exit once drawn).
             color (tuple[int]): Text color. Defaults to (255, 255, 255).
         """
-        # draw text
-        img = Image.new("RGB", (self.matrix.width, self.matrix.height))
-        draw = ImageDraw.Draw(img)
-        font = ImageFont.truetype(f"{self.PLUGIN_ASSETS_PATH}/font/Tiny5-Regular.ttf", size=12)
-        draw.text((9, 24), "Loading...", font=font, fill=color)
-
-        # send image to screen
-        self.matrix.SetImage(img)
-        sleep(delay)
+        # draw text once per color
+        color = tuple(color)
+        if color not in self.loading_images:
+            img = Image.new("RGB", (self.matrix.width, self.matrix.height))
+            draw = ImageDraw.Draw(img)
+            font = self.load_font(self.FONT_PATH, size=12)
+            draw.text((9, 24), "Loading...", font=font, fill=color)
+            self.loading_images[color] = img
+
+        # send image to screen (skipped by the display if it's already showing)
+        self.matrix.SetImage(self.loading_images[color])
+        if delay:
+            self.wait_for_result("image", delay)
     
     def img_viewer(self, path: str, duration: int = 5):
         """View an image on LED array screen.\n
@@ -51,46 +69,41 @@ class DisplayImagePlugins(RGBPlugin):
             duration (int): Display time in seconds. Defaults to 5.
         """
         print(f"> Displaying image: {path}")
-        with Image.open(path) as img:
-            # send image to screen
-            img.thumbnail((self.matrix.width, self.matrix.height), Image.Resampling.LANCZOS)
-            self.matrix.SetImage(img.convert('RGB'))
-            sleep(duration)
+        img, _ = self.load_frames(path)[0]
+        # send image to screen
+        self.matrix.SetImage(img)
+        sleep(duration)
 
-    def gif_viewer(self, path: str, default_duration_ms: float = 100, override_peak_duration_ms: float = 0):
-        """View a GIF on LED array screen.
+    def gif_viewer(self, path: str, default_duration_ms: float = 100, total_duration_ms: float = 0):
+        """View a GIF on LED array screen. Frames are paced against absolute deadlines and dropped if behind schedule.
 
         Args:
             path (str): GIF path
             default_duration_ms (float, optional): Default pause between GIF frames in milliseconds. Defaults to 100.
-            override_peak_duration_ms (float, optional): Override value for peak (median) frame in GIF. Defaults to 0.
+            total_duration_ms (float, optional): Total play time in milliseconds (e.g., length of the AI's spoken response).
+                The peak (median) frame is held so the GIF ends exactly then. Defaults to 0 (GIF frame durations).
         """
-        # preprocess the gifs frames into canvases to improve playback performance
-        canvases = [] # (canvas, duration_ms)
-        with Image.open(path) as gif:
-            print("> Preprocessing gif")
-            for frame in ImageSequence.Iterator(gif):
-                # must copy the frame out of the gif, since thumbnail() modifies the image in-place
-                temp = frame.copy()
-                temp.thumbnail((self.matrix.width, self.matrix.height), Image.Resampling.LANCZOS)
-                canvas = self.matrix.CreateFrameCanvas()
-                canvas.SetImage(temp.convert("RGB"))
-                canvases.append((canvas, frame.info.get("duration", default_duration_ms)))
+        # gif frames are decoded once and kept in the shared frame cache to improve playback performance
+        frames = self.load_frames(path, default_duration_ms) # (image, duration_ms)
 
         # set peak (median) animation frame
-        if override_peak_duration_ms:
-            i_peak = len(canvases) // 2
-            canvases[i_peak] = (canvases[i_peak][0], override_peak_duration_ms - 200)
+        if total_duration_ms:
+            i_peak = len(frames) // 2
+            other_frames_ms = sum(duration for i, (_, duration) in enumerate(frames) if i != i_peak)
+            frames[i_peak] = (frames[i_peak][0], max(total_duration_ms - other_frames_ms, 0))
 
         # loop through gif
-        for i, frame in enumerate(canvases):
+        pacer = FramePacer()
+        for i, frame in enumerate(frames):
+            if not pacer.begin_frame(frame[1]):
+                print(f"> Dropped frame {i}, behind schedule")
+                continue
             # send frame to screen
             print(f"> Playing frame {i} for {frame[1]} ms")
-            self.matrix.SwapOnVSync(frame[0], framerate_fraction=1)
-            # sleep between gif frames
-            sleep_seconds = frame[1] / 1_000
-            sleep(sleep_seconds)
-        print("> Done playing gif")
+            self.show_frame(frame[0])
+            # wait until next frame's deadline
+            pacer.end_frame()
+        print(f"> Done playing gif: {pacer.stats()}")
 
     @hookimpl(specname="rgb_hook")
     @RGBEvents()
@@ -100,16 +113,16 @@ class DisplayImagePlugins(RGBPlugin):
         """
         print("> Init display_image")
         while not self.ai_end_event.is_set():
-            if not self.ai_result_queue.empty():
-                # display image
+            # display loading screen until an image arrives (or the AI plugin ends)
+            self.loading()
+            try:
                 # path = "/opt/pixel-software/plugins/rgb/display_image/assets/examples/tree.png" # for testing
-                path = self.ai_result_queue.get(block=True, timeout=3)
-                self.img_viewer(path, self.image_display_time)
-                self.matrix.Clear()
-            else:
-                # display loading screen
-                self.loading(1)
-                self.matrix.Clear()
+                path = self.get_result("image", self.result_timeout)
+            except Empty:
+                break
+            # display image
+            self.img_viewer(path, self.image_display_time)
+        self.matrix.Clear()
         print("> Exit display_image")
 
     @hookimpl(specname="rgb_hook")
@@ -119,92 +132,84 @@ class DisplayImagePlugins(RGBPlugin):
         """
         print("> Init display_gif")
         while not self.ai_end_event.is_set():
-            if not self.ai_result_queue.empty():
-                # display GIF
+            # display loading screen until a GIF arrives (or the AI plugin ends)
+            self.loading()
+            try:
                 # path = "/opt/pixel-software/plugins/rgb/display_image/assets/examples/eyes.gif" # for testing
-                path = self.ai_result_queue.get(block=True, timeout=3)
-                self.gif_viewer(path)
-                self.matrix.Clear()
-            else:
-                # display loading screen
-                self.loading(1)
-                self.matrix.Clear()
+                path = self.get_result("image", self.result_timeout)
+            except Empty:
+                break
+            # display GIF
+            self.gif_viewer(path)
+        self.matrix.Clear()
         print("> Exit display_gif")
 
     @hookimpl(specname="rgb_hook")
     @RGBEvents()
     def display_game(self):
         """Display Image RGB plugin for displaying games frames (images) on the LED array screen.\n
-        This plugin consumes any frames sent in the `ai_result_queue` (e.g., frames from a game plugin).\n
+        This plugin shows the newest frame in the `frame` mailbox of the `ai_result_queue` (e.g., frames from a game plugin).\n
         Save gameplay example as gif by setting `save_gameplay = true` in plugin config.
         """
         print("> Init display_game")
         FPS = 30
-        gif = []
+        recorder = self.start_recording(self.PLUGIN_ASSETS_PATH, "gameplay", 1000 // FPS, max_frames=5 * FPS) if self.save_gameplay else None
 
-        # stream gameplay images to screen
+        # stream gameplay frames to screen
         while not self.ai_end_event.is_set():
-            if not self.ai_result_queue.empty():
-                image = self.ai_result_queue.get(block=True, timeout=3)
-                # print(f"> Displaying game image: {image.size}")
-                image.thumbnail((self.matrix.width, self.matrix.height), Image.Resampling.LANCZOS)
-                self.matrix.SetImage(image.convert('RGB'))
-                # collect and save the first 5 seconds of gameplay
-                if self.save_gameplay and len(gif) < 5 * FPS:
-                    gif.append(image)
-            sleep(.01)
-
-        if self.save_gameplay:
-            self.save_to_gif(gif, self.PLUGIN_ASSETS_PATH, "gameplay", 1000 // FPS)
+            # sleep until the game draws a frame (or the AI plugin ends). Frames drawn while the screen is busy are skipped
+            try:
+                frame = self.get_result("frame")
+            except Empty:
+                break
+            self.matrix.SetArray(frame)
+            # record the first 5 seconds of gameplay
+            if recorder:
+                recorder.add_frame(frame)
+
+        if recorder:
+            recorder.close()
 
         self.matrix.Clear()
+        print(f"> Game frames: {self.ai_result_queue['frame'].stats()}")
         print("> Exit display_game")
 
     @hookimpl(specname="rgb_hook")
     @RGBEvents()
     def display_emotion_avatar(self):
         """Display Image RGB plugin for displaying an avatar's emotional expressions on the LED array screen.\n
-        This plugin consumes any emotions sent in the `ai_result_queue` (e.g., "joy").
+        This plugin consumes emotions sent on the `emotion` channel of the `ai_result_queue` (e.g., ("joy", 2000)).
         """
         print("> Init display_emotion_avatar")
-        AVATAR_ROOT = f"{self.PLUGIN_ASSETS_PATH}/avatar"
-        DEFAULT_EMOTION = "neutral"
-        emotions = {
-            DEFAULT_EMOTION: f"{AVATAR_ROOT}/surprise.gif",
-            "joy": f"{AVATAR_ROOT}/joy.gif",
-            "anger": f"{AVATAR_ROOT}/anger.gif",
-            "confusion": f"{AVATAR_ROOT}/confusion.gif",
-            "fear": f"{AVATAR_ROOT}/fear.gif",
-            "sadness": f"{AVATAR_ROOT}/sadness.gif",
-            "surprise": f"{AVATAR_ROOT}/surprise.gif"
-        }
-
         blink = lambda min_seconds, max_seconds: (time(), randint(min_seconds, max_seconds))
         blink_timer, blink_gap = blink(3, 10)
         sleep(1) # allow some time for AI plugin start
 
         # display base image
-        self.img_viewer(f"{AVATAR_ROOT}/base.png", .1)
+        self.img_viewer(self.AVATAR_PATH / "base.png", .1)
 
         while not self.ai_end_event.is_set():
-            if not self.ai_result_queue.empty():
-                # wait for emotion
-                choice, duration_ms = self.ai_result_queue.get(block=True, timeout=3)
+            # screen is static until the next emotion, blink or AI plugin end
+            try:
+                choice, duration_ms = self.get_result("emotion", max(blink_timer + blink_gap - time(), 0))
+            except Empty:
+                choice = None
+            if choice:
                 print(f"> display_emotion_avatar gets emotion: {choice}")
                 if choice == "think":
                     # display think image
-                    self.img_viewer(f"{AVATAR_ROOT}/think.png", 1)
+                    self.img_viewer(self.AVATAR_PATH / "think.png", 1)
                     blink_timer, blink_gap = blink(15, 15)
                 else:
                     # display emotion
-                    self.gif_viewer(emotions.get(choice, DEFAULT_EMOTION), 50, duration_ms)
+                    self.gif_viewer(self.EMOTION_GIFS.get(choice, self.EMOTION_GIFS[self.DEFAULT_EMOTION]), 50, duration_ms)
                     blink_timer, blink_gap = blink(3, 10)
-            elif time() > blink_timer + blink_gap:
+            elif time() >= blink_timer + blink_gap:
                 # blink every random n seconds
                 print("> Blinking...")
-                self.gif_viewer(f"{AVATAR_ROOT}/blink.gif")
+                self.gif_viewer(self.AVATAR_PATH / "blink.gif")
                 blink_timer, blink_gap = blink(3, 10)
-            sleep(.1)
         
         self.matrix.Clear()
+        print(f"> Frame cache: {frame_cache.stats()}")
         print("> Exit display_emotion_avatar")
@@ -1,17 +1,16 @@
 from random import randint
 from time import sleep
-from datetime import datetime
 from pathlib import Path
 from threading import Event
-from queue import Queue
 
 import pluggy
 import numpy as np
 from PIL import Image
 
 from config.config import PluginConfig
-from plugins.rgb_plugin import RGBPlugin, RGBEvents
-from util.rgb_util import get_color_from_moonlightgb_palette, get_color_from_sodacap_palette
+from plugins.rgb_plugin import RGBPlugin, RGBEvents, FramePacer
+from util.rgb_util import MOONLIGHT_GB, get_color_from_sodacap_palette
+from util.message_bus import MessageBus
 
 hookimpl = pluggy.HookimplMarker("pixel_art")
 
@@ -21,7 +20,7 @@ class FillScreenPlugins(RGBPlugin):
     PLUGIN_CONFIG_PATH = PLUGIN_BASE_PATH / "plugin.toml"
     PLUGIN_ASSETS_PATH = PLUGIN_BASE_PATH / "assets"
 
-    def __init__(self, matrix, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue):
+    def __init__(self, matrix, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus):
         super().__init__(matrix, rgb_start_event, ai_end_event, ai_result_queue)
         self.config = PluginConfig(self.PLUGIN_CONFIG_PATH)
         self.save_gif = self.config.get_item("save_gif", False)
@@ -36,7 +35,7 @@ class FillScreenPlugins(RGBPlugin):
         """
         # TODO: improve fade effect
         print("> Init display_strobe_fill")
-        gif = []
+        recorder = self.start_recording(self.PLUGIN_ASSETS_PATH, max_frames=18) if self.save_gif else None
         direction = False
         frames = 100
         offscreen_canvas = self.matrix.CreateFrameCanvas()
@@ -44,24 +43,29 @@ class FillScreenPlugins(RGBPlugin):
         is_color_set = isinstance(self.strobe_color, list) and len(self.strobe_color) == 3
         color = self.strobe_color if is_color_set else get_color_from_sodacap_palette(randint(0, 3))
         
+        pacer = FramePacer()
         while not self.ai_end_event.is_set():
             direction_range = (1, frames) if direction else (frames - 1, 0, -1)
             for i in range(*direction_range):
+                # timestep for fade-in/fade-out effect, skip step if behind schedule
+                s = .1 / i if i > frames / 2 else .1 / (frames - i)
+                if not pacer.begin_frame(s * 1_000):
+                    continue
                 # generate image rgb values
                 mod_color = tuple([i * c // frames for c in color])
                 offscreen_canvas.Fill(*mod_color)
-                # send image to screen
-                self.matrix.SwapOnVSync(offscreen_canvas)
-                # collect first set of evenly spaced 18 images (9 each direction) for saving gif
-                if len(gif) < 18 and i % (frames // 10) == 0:
-                    gif.append(Image.new("RGB", (self.matrix.width, self.matrix.height), mod_color))
-                # sleep timestep for fade-in/fade-out effect
-                s = .1 / i if i > frames / 2 else .1 / (frames - i)
-                sleep(s)
+                # send image to screen, previous screen canvas is reused as the next offscreen canvas
+                offscreen_canvas = self.matrix.SwapOnVSync(offscreen_canvas)
+                # record first set of evenly spaced 18 frames (9 each direction) for saving gif
+                if recorder and i % (frames // 10) == 0:
+                    recorder.add_frame(Image.new("RGB", (self.matrix.width, self.matrix.height), mod_color))
+                # wait until next step's deadline
+                pacer.end_frame()
             direction = not direction
+        print(f"> Strobe timing: {pacer.stats()}")
 
-        if self.save_gif:
-            self.save_to_gif(gif, self.PLUGIN_ASSETS_PATH)
+        if recorder:
+            recorder.close()
         
         self.matrix.Clear()
         print("> Exit display_strobe_fill")
@@ -73,24 +77,21 @@ class FillScreenPlugins(RGBPlugin):
         Save gif example by setting `save_gif = true` in plugin config.
         """
         print("> Init display_scatter_fill")
-        gif = []
-        offscreen_canvas = self.matrix.CreateFrameCanvas()
+        recorder = self.start_recording(self.PLUGIN_ASSETS_PATH, max_frames=5) if self.save_gif else None
+        rng = np.random.default_rng()
 
         while not self.ai_end_event.is_set():
             # generate image rgb values
-            img = [[get_color_from_moonlightgb_palette(randint(0, 3)) for _ in range(self.matrix.height)] for _ in range(self.matrix.width)]
+            MOONLIGHT_GB.render(rng.integers(0, len(MOONLIGHT_GB), self.framebuffer.shape[:2]), out=self.framebuffer)
             # send image to screen
-            temp = Image.fromarray(np.array(img, dtype=np.uint8))
-            temp.thumbnail((self.matrix.width, self.matrix.height), Image.Resampling.LANCZOS)
-            offscreen_canvas.SetImage(temp.convert("RGB"))
-            self.matrix.SwapOnVSync(offscreen_canvas)
-            # collect first 5 images for saving gif
-            if self.save_gif and len(gif) < 5:
-                gif.append(temp)
+            self.present()
+            # record first 5 frames for saving gif
+            if recorder:
+                recorder.add_frame(self.framebuffer)
             sleep(1)
 
-        if self.save_gif:
-            self.save_to_gif(gif, self.PLUGIN_ASSETS_PATH)
+        if recorder:
+            recorder.close()
         
         self.matrix.Clear()
         print("> Exit display_scatter_fill")
@@ -1,29 +1,115 @@
-from random import randint, choice
+from random import choice, randint
+from collections import deque
 from time import sleep
 from pathlib import Path
 from threading import Event
-from queue import Queue
 
 import pluggy
-from PIL import Image
+import numpy as np
 
 from config.config import PluginConfig
 from plugins.rgb_plugin import RGBPlugin, RGBEvents
-from util.rgb_util import get_color_from_funkyfuture_palette, get_color_from_sodacap_palette
+from util.rgb_util import FUNKYFUTURE_8, SODA_CAP
+from util.sprite_util import Sprite
+from util.message_bus import MessageBus
 
 hookimpl = pluggy.HookimplMarker("pixel_art")
 
+class Snake:
+    """Pixel snake for `display_snake_rand`. Collisions are checked against a shared occupancy grid
+    and each step only draws the new head pixel (and erases the old tail pixel) of a persistent framebuffer.\n
+    Rules:
+        1. forward five times
+        2. if five times, change direction
+        3. not out of bounds or back onto itself
+        4. color only changes for non-parallel collision
+        5. reset after 500 moves, or drop the tail once longer than `max_length`
+    """
+    NAV_OPTS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+    STEPS_PER_DIRECTION = 5
+    MAX_MOVES = 500
+
+    def __init__(self, head: tuple[int, int], color_index: int = 0, max_length: int = 0):
+        self.head = head
+        self.color_index = color_index % len(SODA_CAP)
+        self.color = SODA_CAP.color(self.color_index)
+        self.max_length = max_length
+        self.color_change_flag = True
+        self.direction = (0, 0)
+        self.steps_left = 0
+        self.cells: deque[tuple[int, int]] = deque()
+
+    def _add(self, cell: tuple[int, int], occupancy: np.ndarray, framebuffer: np.ndarray):
+        self.cells.append(cell)
+        occupancy[cell[1], cell[0]] += 1
+        framebuffer[cell[1], cell[0]] = self.color
+
+    def _remove_tail(self, occupancy: np.ndarray, framebuffer: np.ndarray):
+        x, y = self.cells.popleft()
+        occupancy[y, x] -= 1
+        if not occupancy[y, x]:
+            framebuffer[y, x] = 0
+
+    def start(self, occupancy: np.ndarray, framebuffer: np.ndarray):
+        """Draw the snake's first pixel.
+
+        Args:
+            occupancy (np.ndarray): `(H, W)` snake segments per pixel
+            framebuffer (np.ndarray): `(H, W, 3) uint8` frame to draw on
+        """
+        self._add(self.head, occupancy, framebuffer)
+
+    def step(self, occupancy: np.ndarray, framebuffer: np.ndarray):
+        """Move the snake one pixel.
+
+        Args:
+            occupancy (np.ndarray): `(H, W)` snake segments per pixel
+            framebuffer (np.ndarray): `(H, W, 3) uint8` frame to draw on
+        """
+        height, width = occupancy.shape
+        if not self.max_length and len(self.cells) > self.MAX_MOVES:
+            # reset, keeping the head
+            while len(self.cells) > 1:
+                self._remove_tail(occupancy, framebuffer)
+        previous = self.cells[-2] if len(self.cells) > 1 else None
+        while True:
+            if not self.steps_left:
+                self.direction = choice(self.NAV_OPTS)
+                self.steps_left = self.STEPS_PER_DIRECTION
+            new_px = (self.head[0] + self.direction[0], self.head[1] + self.direction[1])
+            # if new direction breaks rules, get new direction
+            is_reverse_path = new_px == previous
+            is_out_of_bounds = new_px[0] < 0 or new_px[1] < 0 or new_px[0] >= width or new_px[1] >= height
+            if not (is_reverse_path or is_out_of_bounds):
+                break
+            self.steps_left = 0
+        self.steps_left -= 1
+        # change color during non-parallel collisions
+        collision_detected = occupancy[new_px[1], new_px[0]] > 0
+        if collision_detected and self.color_change_flag:
+            self.color_index = (self.color_index + 1) % len(SODA_CAP)
+            self.color = SODA_CAP.color(self.color_index)
+        self.color_change_flag = not collision_detected
+        # add pixel to snake
+        self.head = new_px
+        self._add(new_px, occupancy, framebuffer)
+        if self.max_length and len(self.cells) > self.max_length:
+            self._remove_tail(occupancy, framebuffer)
+
 class RandomPixelPlugins(RGBPlugin):
     """RGB plugin class. Contains plugins that draw pixel patterns randomly on the screen programatically."""
     PLUGIN_BASE_PATH = Path(__file__).parent
     PLUGIN_CONFIG_PATH = PLUGIN_BASE_PATH / "plugin.toml"
     PLUGIN_ASSETS_PATH = PLUGIN_BASE_PATH / "assets"
 
-    def __init__(self, matrix, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue):
+    def __init__(self, matrix, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus):
         super().__init__(matrix, rgb_start_event, ai_end_event, ai_result_queue)
         self.config = PluginConfig(self.PLUGIN_CONFIG_PATH)
         self.save_gif = self.config.get_item("save_gif", False)
         self.num_sprites = self.config.get_item("num_sprites", 3)
+        self.num_snakes = self.config.get_item("num_snakes", 1)
+        self.snake_length = self.config.get_item("snake_length", 0)
+        self.snake_step_time = self.config.get_item("snake_step_time", .1)
    
     @hookimpl(specname="rgb_hook")
     @RGBEvents()
@@ -33,26 +119,23 @@ class RandomPixelPlugins(RGBPlugin):
         Save gif example by setting `save_gif = true` in plugin config.
         """
         print("> Init display_pixel_rand")
-        gif = []
-        offscreen_canvas = self.matrix.CreateFrameCanvas()
-        colors = [get_color_from_funkyfuture_palette(randint(0, 7)) for _ in range(self.num_sprites)]
+        recorder = self.start_recording(self.PLUGIN_ASSETS_PATH, max_frames=5) if self.save_gif else None
+        rng = np.random.default_rng()
+        colors = FUNKYFUTURE_8.render(rng.integers(0, len(FUNKYFUTURE_8), self.num_sprites))
 
         while not self.ai_end_event.is_set():
             # generate image rgb values
-            img = Image.new("RGB", (self.matrix.width, self.matrix.height))
-            for i in range(self.num_sprites):
-                img.putpixel((randint(0, 63), randint(0, 63)), colors[i])
+            self.framebuffer.fill(0)
+            self.framebuffer[rng.integers(0, self.matrix.height, self.num_sprites), rng.integers(0, self.matrix.width, self.num_sprites)] = colors
             # send image to screen
-            img.thumbnail((self.matrix.width, self.matrix.height), Image.Resampling.LANCZOS)
-            offscreen_canvas.SetImage(img.convert("RGB"))
-            self.matrix.SwapOnVSync(offscreen_canvas)
-            # collect first 5 images for saving gif
-            if self.save_gif and len(gif) < 5:
-                gif.append(img)
+            self.present()
+            # record first 5 frames for saving gif
+            if recorder:
+                recorder.add_frame(self.framebuffer)
             sleep(1)
 
-        if self.save_gif:
-            self.save_to_gif(gif, self.PLUGIN_ASSETS_PATH)
+        if recorder:
+            recorder.close()
 
         self.matrix.Clear()
         print("> Exit display_pixel_rand")
@@ -65,38 +148,31 @@ class RandomPixelPlugins(RGBPlugin):
         Save gif example by setting `save_gif = true` in plugin config.
         """
         print("> Init display_heart_rand")
-        gif = []
+        recorder = self.start_recording(self.PLUGIN_ASSETS_PATH, max_frames=5) if self.save_gif else None
         shape = (7, 6)
-        offscreen_canvas = self.matrix.CreateFrameCanvas()
-        unfill_pixels = [
+        rng = np.random.default_rng()
+        heart = Sprite.from_mask(*shape, transparent_pixels=[
             (0, 0), (3, 0), (6, 0),
             (0, 3), (6, 3),
             (0, 4), (1, 4), (5, 4), (6, 4),
             (0, 5), (1, 5), (2, 5), (4, 5), (5, 5), (6, 5)
-        ]
+        ])
+        max_position = (self.matrix.width - shape[0] + 1, self.matrix.height - shape[1] + 1)
 
         while not self.ai_end_event.is_set():
             # generate image rgb values
-            img = Image.new("RGB", (self.matrix.width, self.matrix.height))
-            for _ in range(self.num_sprites):
-                color = get_color_from_funkyfuture_palette(randint(0, 7))
-                top_left_pixel = (randint(0, 64 - shape[0]), randint(0, 64 - shape[1]))
-                for x in range(shape[0]):
-                    for y in range(shape[1]):
-                        if (x, y) in unfill_pixels:
-                            continue
-                        img.putpixel((top_left_pixel[0] + x, top_left_pixel[1] + y), color)
+            self.framebuffer.fill(0)
+            positions = rng.integers(0, max_position, (self.num_sprites, 2))
+            heart.blit(self.framebuffer, positions, FUNKYFUTURE_8.render(rng.integers(0, len(FUNKYFUTURE_8), self.num_sprites)))
             # send image to screen
-            img.thumbnail((self.matrix.width, self.matrix.height), Image.Resampling.LANCZOS)
-            offscreen_canvas.SetImage(img.convert("RGB"))
-            self.matrix.SwapOnVSync(offscreen_canvas)
-            # collect first 5 images for saving gif
-            if self.save_gif and len(gif) < 5:
-                gif.append(img)
+            self.present()
+            # record first 5 frames for saving gif
+            if recorder:
+                recorder.add_frame(self.framebuffer)
             sleep(1)
 
-        if self.save_gif:
-            self.save_to_gif(gif, self.PLUGIN_ASSETS_PATH)
+        if recorder:
+            recorder.close()
 
         self.matrix.Clear()
         print("> Exit display_heart_rand")
@@ -108,44 +184,30 @@ class RandomPixelPlugins(RGBPlugin):
         Save gif example by setting `save_gif = true` in plugin config.
         """
         print("> Init display_smiley_rand")
-        gif = []
+        recorder = self.start_recording(self.PLUGIN_ASSETS_PATH, max_frames=5) if self.save_gif else None
         shape = (9, 9)
-        offscreen_canvas = self.matrix.CreateFrameCanvas()
-        pixels = {
-            "none": (None, [(0,0), (1,0), (7,0), (8,0), (0,1), (8,1), (0,7), (8,7), (0,8), (1,8), (7,8), (8,8)]), # transparent
-            "eye": ((255, 255, 255), [(2,2), (5,2), (2,3), (3,3), (5,3), (6,3)]), # white
-            "iris": ((0, 0, 139), [(3,2), (6,2)]), # dark blue
-            "mouth": ((210, 4, 45), [(2,5), (3,5), (4,5), (5,5), (6,5), (3,6), (4,6), (5,6)]), # cherry
-            "face": ((255, 215, 0), []) # yellow
-        }
+        rng = np.random.default_rng()
+        smiley = Sprite.from_features(*shape, features=[
+            (None, [(0,0), (1,0), (7,0), (8,0), (0,1), (8,1), (0,7), (8,7), (0,8), (1,8), (7,8), (8,8)]), # transparent
+            ((255, 255, 255), [(2,2), (5,2), (2,3), (3,3), (5,3), (6,3)]), # eye: white
+            ((0, 0, 139), [(3,2), (6,2)]), # iris: dark blue
+            ((210, 4, 45), [(2,5), (3,5), (4,5), (5,5), (6,5), (3,6), (4,6), (5,6)]), # mouth: cherry
+        ], fill_color=(255, 215, 0)) # face: yellow
+        max_position = (self.matrix.width - shape[0] + 1, self.matrix.height - shape[1] + 1)
 
         while not self.ai_end_event.is_set():
             # generate image rgb values
-            img = Image.new("RGB", (self.matrix.width, self.matrix.height))
-            top_left_pixel = (randint(0, 64 - shape[0]), randint(0, 64 - shape[1]))
-            for x in range(shape[0]):
-                for y in range(shape[1]):
-                    found_feature_px = False
-                    for color, px in pixels.values():
-                        if (x, y) in px:
-                            found_feature_px = True
-                            if color == None:
-                                continue
-                            img.putpixel((top_left_pixel[0] + x, top_left_pixel[1] + y), color)
-                            break
-                    if not found_feature_px:
-                        img.putpixel((top_left_pixel[0] + x, top_left_pixel[1] + y), pixels["face"][0])
+            self.framebuffer.fill(0)
+            smiley.blit(self.framebuffer, rng.integers(0, max_position, (1, 2)))
             # send image to screen
-            img.thumbnail((self.matrix.width, self.matrix.height), Image.Resampling.LANCZOS)
-            offscreen_canvas.SetImage(img.convert("RGB"))
-            self.matrix.SwapOnVSync(offscreen_canvas)
-            # collect first 5 images for saving gif
-            if self.save_gif and len(gif) < 5:
-                gif.append(img)
+            self.present()
+            # record first 5 frames for saving gif
+            if recorder:
+                recorder.add_frame(self.framebuffer)
             sleep(1)
         
-        if self.save_gif:
-            self.save_to_gif(gif, self.PLUGIN_ASSETS_PATH)
+        if recorder:
+            recorder.close()
 
         self.matrix.Clear()
         print("> Exit display_smiley_rand")
@@ -153,68 +215,33 @@ class RandomPixelPlugins(RGBPlugin):
     @hookimpl(specname="rgb_hook")
     @RGBEvents()
     def display_snake_rand(self):        
-        """Random Pixel RGB plugin for displaying a pixel snake on the screen.\n
+        """Random Pixel RGB plugin for displaying pixel snakes on the screen.\n
+        Choose number of snakes by setting `num_snakes`, snake length by setting `snake_length`
+        (0 grows until reset), and time between moves by setting `snake_step_time` in plugin config.\n
         Save gif example by setting `save_gif = true` in plugin config.
         """
-        # TODO: minor refactor for readability
         print("> Init display_snake_rand")
-        gif = []
-        color_change_flag = True
-        color_index = 0
-        color = get_color_from_sodacap_palette(color_index)
-
-        collision_detected = False
-        nav_opts = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        new_px = (32, 32)
-        snake_px = [(color, new_px)]
-
-        offscreen_canvas = self.matrix.CreateFrameCanvas()
+        recorder = self.start_recording(self.PLUGIN_ASSETS_PATH, duration=10, max_frames=50) if self.save_gif else None
+        self.framebuffer.fill(0)
+        # number of snake segments on each pixel, shared by all snakes for collisions
+        occupancy = np.zeros((self.matrix.height, self.matrix.width), dtype=np.uint16)
+        snakes = [Snake((32, 32) if i == 0 else (randint(0, self.matrix.width - 1), randint(0, self.matrix.height - 1)), i, self.snake_length) for i in range(self.num_snakes)]
+        for snake in snakes:
+            snake.start(occupancy, self.framebuffer)
 
         while not self.ai_end_event.is_set():
-            """Rules:
-                1. forward five times
-                2. if five times, change direction
-                3. not out of bounds
-                4. color only changes for non-parallel collision
-                5. reset after 500 moves
-            """
-            if len(snake_px) > 500:
-                snake_px.clear()
-                snake_px.append((color, new_px))
-            direction = choice(nav_opts)
-            for i in range(5):
-                img = Image.new("RGB", (self.matrix.width, self.matrix.height))
-                new_px = (snake_px[-1][1][0] + direction[0], snake_px[-1][1][1] + direction[1])
-                # if new direction breaks rules, break loop to get new direction
-                is_reverse_path = new_px == snake_px[-2][1] if len(snake_px) > 1 else False
-                is_out_of_bounds = new_px[0] < 0 or new_px[1] < 0 or new_px[0] >= 64 or new_px[1] >= 64
-                if is_reverse_path or is_out_of_bounds:
-                    break
-                # change color during non-parallel collisions
-                for i, p in enumerate([p for _, p in snake_px]):
-                    collision_detected = new_px == p
-                    if collision_detected:
-                        if color_change_flag:
-                            color_index = color_index + 1 if color_index < 3 else 0
-                            color = get_color_from_sodacap_palette(color_index)
-                            snake_px.pop(i)
-                        break
-                color_change_flag = not collision_detected
-                # add pixel to snake
-                snake_px.append((color, new_px))
-                for c, px in snake_px:
-                    img.putpixel(px, c)
-                # send image to screen
-                img.thumbnail((self.matrix.width, self.matrix.height), Image.Resampling.LANCZOS)
-                offscreen_canvas.SetImage(img.convert("RGB"))
-                self.matrix.SwapOnVSync(offscreen_canvas)
-                # collect first 50 images for saving gif
-                if self.save_gif and len(gif) < 50:
-                    gif.append(img)
-                sleep(.1)
+            # only the new head (and old tail) pixels change each step
+            for snake in snakes:
+                snake.step(occupancy, self.framebuffer)
+            # send image to screen
+            self.present()
+            # record first 50 frames for saving gif
+            if recorder:
+                recorder.add_frame(self.framebuffer)
+            sleep(self.snake_step_time)
         
-        if self.save_gif:
-            self.save_to_gif(gif, self.PLUGIN_ASSETS_PATH, duration=10)
+        if recorder:
+            recorder.close()
 
         self.matrix.Clear()
         print("> Exit display_snake_rand")
@@ -2,12 +2,16 @@ import os
 import functools
 from datetime import datetime
 from pathlib import Path
-from threading import Event
-from queue import Queue
+from threading import Event, Lock
+from collections import OrderedDict
+from time import perf_counter, monotonic, sleep
 
-import cv2
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageSequence, ImageFont
+
+from config.config import PluginConfig
+from util.frame_recorder import FrameRecorder
+from util.message_bus import MessageBus
 
 #####################
 # PLUGIN DECORATORS #
@@ -73,6 +77,181 @@ class RGBEvents:
         functools.update_wrapper(wrapper, func)
         return wrapper
 
+###############
+# FRAME CACHE #
+###############
+
+class FrameCache:
+    """Process-wide LRU cache of decoded, resized, RGB-converted image and GIF frames, so replaying
+    an asset (e.g., an avatar blink) skips the file read and decode.\n
+    Entries are keyed by path and modification time, so editing an asset on disk invalidates it.
+    Least recently used entries are evicted once cached frames exceed `max_bytes`.\n
+    Example use: `frames = frame_cache.load(path, (64, 64))`
+    """
+    def __init__(self, max_bytes: int = 16_000_000):
+        self.max_bytes = max_bytes
+        self.configured = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        self._entries: OrderedDict[tuple, tuple[list[tuple[Image.Image, float | None]], int]] = OrderedDict()
+        self._lock = Lock()
+
+    def configure(self, max_mb: float):
+        """Set the cache memory budget.
+
+        Args:
+            max_mb (float): Memory limit for cached frames in MB. 0 disables caching.
+        """
+        self.max_bytes = int(max_mb * 1_000_000)
+        self.configured = True
+        with self._lock:
+            self._evict()
+
+    def _decode(self, path: Path, size: tuple[int, int]) -> list[tuple[Image.Image, float | None]]:
+        """Read every frame of an image or GIF, resized to fit `size` and converted to RGB."""
+        frames = []
+        with Image.open(path) as img:
+            for frame in ImageSequence.Iterator(img):
+                # must copy the frame out of the gif, since thumbnail() modifies the image in-place
+                temp = frame.copy()
+                temp.thumbnail(size, Image.Resampling.LANCZOS)
+                frames.append((temp.convert("RGB"), frame.info.get("duration")))
+        return frames
+
+    def _evict(self):
+        """Drop least recently used entries until under budget. Lock must be held."""
+        while self._entries and self.size_bytes > self.max_bytes:
+            _, (_, size_bytes) = self._entries.popitem(last=False)
+            self.size_bytes -= size_bytes
+            self.evictions += 1
+
+    def load(self, path: str | Path, size: tuple[int, int], default_duration_ms: float = 100) -> list[tuple[Image.Image, float]]:
+        """Get the frames of an image or GIF, decoding it on a cache miss.
+        Returned images are shared with the cache and must not be modified.
+
+        Args:
+            path (str | Path): Image or GIF path
+            size (tuple[int, int]): Max frame (width, height)
+            default_duration_ms (float, optional): Frame duration for frames without one in milliseconds. Defaults to 100.
+
+        Returns:
+            list[tuple[Image.Image, float]]: (RGB frame, duration in milliseconds)
+        """
+        path = Path(path)
+        key = (path.as_posix(), os.stat(path).st_mtime_ns, size)
+        frames = None
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                frames = self._entries[key][0]
+            else:
+                self.misses += 1
+        if frames is None:
+            frames = self._decode(path, size)
+            self._add(key, frames)
+        return [(frame, default_duration_ms if duration is None else duration) for frame, duration in frames]
+
+    def _add(self, key: tuple, frames: list[tuple[Image.Image, float | None]]):
+        """Cache decoded frames, replacing older versions of the same file."""
+        size_bytes = sum(len(frame.getbands()) * frame.width * frame.height for frame, _ in frames)
+        with self._lock:
+            # drop entries for older versions of the same file
+            for stale in [k for k in self._entries if k[0] == key[0] and k[1] != key[1]]:
+                self.size_bytes -= self._entries.pop(stale)[1]
+            if key not in self._entries and size_bytes <= self.max_bytes:
+                self._entries[key] = (frames, size_bytes)
+                self.size_bytes += size_bytes
+                self._evict()
+
+    def stats(self) -> dict:
+        """Cache usage.
+
+        Returns:
+            dict: Hits, misses, evictions, cached entry count and size in bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+# process-wide frame cache shared by all RGB plugins
+frame_cache = FrameCache()
+
+################
+# FRAME PACING #
+################
+
+class FramePacer:
+    """Schedules animation frames against absolute monotonic deadlines, so time spent drawing and
+    swapping doesn't accumulate as drift. Frames whose time slot has already passed are dropped.\n
+    Example use:
+    ```
+    pacer = FramePacer()
+    for frame, duration_ms in frames:
+        if not pacer.begin_frame(duration_ms):
+            continue # behind schedule
+        self.show_frame(frame)
+        pacer.end_frame()
+    ```
+    """
+    def __init__(self):
+        self.origin = monotonic()
+        self.deadline = self.origin # scheduled start of the current frame
+        self.duration = 0.0
+        self.frames = 0
+        self.dropped = 0
+        self.drift_total = 0.0
+        self.drift_max = 0.0
+
+    def begin_frame(self, duration_ms: float) -> bool:
+        """Schedule the next frame. Call before drawing it.
+
+        Args:
+            duration_ms (float): Time the frame stays on screen in milliseconds
+
+        Returns:
+            bool: False if the frame's whole time slot has already passed and it should be skipped
+        """
+        self.duration = duration_ms / 1_000
+        if monotonic() >= self.deadline + self.duration:
+            self.deadline += self.duration
+            self.dropped += 1
+            return False
+        return True
+
+    def end_frame(self):
+        """Record how late the frame was presented, then sleep until the next frame's deadline. Call after presenting the frame."""
+        now = monotonic()
+        drift = max(now - self.deadline, 0.0)
+        self.frames += 1
+        self.drift_total += drift
+        self.drift_max = max(self.drift_max, drift)
+        self.deadline += self.duration
+        if self.deadline > now:
+            sleep(self.deadline - now)
+
+    def stats(self) -> dict:
+        """Playback timing.
+
+        Returns:
+            dict: Presented and dropped frame counts, mean/max presentation drift and total elapsed time in milliseconds
+        """
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "mean_drift_ms": self.drift_total / self.frames * 1_000 if self.frames else 0.0,
+            "max_drift_ms": self.drift_max * 1_000,
+            "elapsed_ms": (monotonic() - self.origin) * 1_000
+        }
+
 #######################
 # PLUGIN PARENT CLASS #
 #######################
@@ -80,14 +259,177 @@ class RGBEvents:
 class RGBPlugin():
     """RGB parent plugin class. Should be extended by RGB plugins that want to integrate draw to LED array screen.
     """
-    def __init__(self, matrix, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: Queue):
+    ROOT_CONFIG_PATH = Path(__file__).parents[1] / "config.toml"
+    record_queue_frames = 32 # set from root config by the first RGB plugin
+
+    def __init__(self, matrix, rgb_start_event: Event, ai_end_event: Event, ai_result_queue: MessageBus):
+        if not frame_cache.configured:
+            # first RGB plugin sets up the shared frame cache
+            rgb_config = PluginConfig(self.ROOT_CONFIG_PATH, section="rgb")
+            frame_cache.configure(rgb_config.get_item("frame_cache_mb", 16))
+            RGBPlugin.record_queue_frames = rgb_config.get_item("record_queue_frames", 32)
         self.matrix = matrix
         self.rgb_start_event = rgb_start_event
         self.ai_end_event = ai_end_event
         self.ai_result_queue = ai_result_queue
+        self.offscreen_canvas = None
+        # persistent frame plugins draw into, pushed to the screen with present()
+        self.framebuffer = np.zeros((matrix.height, matrix.width, 3), dtype=np.uint8)
+        self._staging_image = Image.new("RGB", (matrix.width, matrix.height))
+        self.fonts: dict[tuple[str, int], ImageFont.FreeTypeFont] = {}
+
+    def wait_for_result(self, channel: str, timeout: float = None) -> bool:
+        """Idle until something is put on an `ai_result_queue` channel, the AI plugin ends, or `timeout` passes.
+        Use instead of a sleep/poll loop while the screen is static, so the render thread stays asleep.
+
+        Args:
+            channel (str): Message bus channel (e.g., "image")
+            timeout (float, optional): Max wait in seconds. Defaults to None (no limit).
+
+        Returns:
+            bool: True if a result is waiting on the channel
+        """
+        return self.ai_result_queue[channel].wait_until(self.ai_end_event, timeout)
+
+    def get_result(self, channel: str, timeout: float = None):
+        """Take the next result from an `ai_result_queue` channel, sleeping until one is put, the AI plugin ends, or `timeout` passes.
+
+        Args:
+            channel (str): Message bus channel (e.g., "image")
+            timeout (float, optional): Max wait in seconds. Defaults to None (no limit).
+
+        Raises:
+            Empty: No result before the AI plugin ended or `timeout` passed
+
+        Returns:
+            any: Result (e.g., image path)
+        """
+        return self.ai_result_queue[channel].get_until(self.ai_end_event, timeout)
+
+    def load_frames(self, path: str | Path, default_duration_ms: float = 100) -> list[tuple[Image.Image, float]]:
+        """Get the frames of an image or GIF sized for the screen, from the shared frame cache.
+        Returned images are shared and must not be modified.
+
+        Args:
+            path (str | Path): Image or GIF path
+            default_duration_ms (float, optional): Frame duration for frames without one in milliseconds. Defaults to 100.
+
+        Returns:
+            list[tuple[Image.Image, float]]: (RGB frame, duration in milliseconds)
+        """
+        return frame_cache.load(path, (self.matrix.width, self.matrix.height), default_duration_ms)
+
+    def load_font(self, path: str | Path, size: int) -> ImageFont.FreeTypeFont:
+        """Get a TrueType font, loading it on first use.
+
+        Args:
+            path (str | Path): Font path
+            size (int): Font size
+
+        Returns:
+            ImageFont.FreeTypeFont: Font
+        """
+        key = (Path(path).as_posix(), size)
+        if key not in self.fonts:
+            self.fonts[key] = ImageFont.truetype(key[0], size=size)
+        return self.fonts[key]
+
+    def warm_assets(self) -> dict:
+        """Load the assets declared in the plugin's `[plugin.assets]` config table, so the first frame
+        of any plugin doesn't wait on disk. Meant to be run in a background thread at plugin registration.\n
+        Asset paths are relative to the plugin's `PLUGIN_ASSETS_PATH` and may be glob patterns:
+        ```
+        [plugin.assets]
+        images = ["avatar/*.gif", "avatar/base.png"]
+        fonts = [{ path = "font/Tiny5-Regular.ttf", size = 12 }]
+        ```
+
+        Returns:
+            dict: Count of warmed assets, warmup time in milliseconds and approx. resident size in bytes
+        """
+        config_path = getattr(self, "PLUGIN_CONFIG_PATH", None)
+        assets_path = getattr(self, "PLUGIN_ASSETS_PATH", None)
+        if not config_path or not assets_path:
+            return {"assets": 0, "warmup_ms": 0.0, "size_bytes": 0}
+        manifest = PluginConfig(config_path).get_item("assets", {})
+        start = perf_counter()
+        count, size_bytes = 0, 0
+        for pattern in manifest.get("images", []):
+            for path in sorted(assets_path.glob(pattern)):
+                try:
+                    frames = self.load_frames(path)
+                    count += 1
+                    size_bytes += sum(len(frame.getbands()) * frame.width * frame.height for frame, _ in frames)
+                except Exception as e:
+                    print(f"> Failed to warm image {path}: {e}")
+        for font in manifest.get("fonts", []):
+            path = assets_path / font["path"]
+            try:
+                self.load_font(path, font["size"])
+                count += 1
+                size_bytes += os.path.getsize(path) # freetype keeps the font file in memory
+            except Exception as e:
+                print(f"> Failed to warm font {path}: {e}")
+        stats = {"assets": count, "warmup_ms": (perf_counter() - start) * 1_000, "size_bytes": size_bytes}
+        print(f"> Warmed {stats['assets']} assets for {self.__class__.__name__} in {stats['warmup_ms']:.1f} ms ({stats['size_bytes'] / 1_000:.1f} KB resident)")
+        return stats
+
+    def present(self):
+        """Push `framebuffer` to the offscreen canvas then swap it onto the screen, with no intermediate PIL images.
+        The previous on-screen canvas is reused as the next offscreen canvas.
+        """
+        if self.offscreen_canvas is None:
+            self.offscreen_canvas = self.matrix.CreateFrameCanvas()
+        if hasattr(self.offscreen_canvas, "SetArray"):
+            self.offscreen_canvas.SetArray(self.framebuffer)
+        else:
+            # rgbmatrix canvases only take PIL images, so copy into one persistent staging image
+            self._staging_image.frombytes(self.framebuffer.data)
+            self.offscreen_canvas.SetImage(self._staging_image)
+        self.offscreen_canvas = self.matrix.SwapOnVSync(self.offscreen_canvas)
+
+    def framebuffer_image(self) -> Image.Image:
+        """Copy of `framebuffer` as an image (e.g., for saving a GIF).
+
+        Returns:
+            Image.Image: RGB image
+        """
+        return Image.fromarray(self.framebuffer.copy())
+
+    def show_frame(self, image: Image.Image):
+        """Draw an RGB image on the offscreen canvas then swap it onto the screen.
+        The previous on-screen canvas is reused as the next offscreen canvas.
+
+        Args:
+            image (Image.Image): RGB image
+        """
+        if self.offscreen_canvas is None:
+            self.offscreen_canvas = self.matrix.CreateFrameCanvas()
+        if image.size != (self.matrix.width, self.matrix.height):
+            # reused canvas still holds a frame from two swaps ago outside the image
+            self.offscreen_canvas.Clear()
+        self.offscreen_canvas.SetImage(image)
+        self.offscreen_canvas = self.matrix.SwapOnVSync(self.offscreen_canvas)
+
+    def start_recording(self, base_path: Path, filename: str = "out", duration: float = 1000, max_frames: int = 0, suffix: str = ".gif") -> FrameRecorder:
+        """Start recording frames to a new GIF or MP4 file. Frames are encoded in the background as they're added with `add_frame()`.
+
+        Args:
+            base_path (Path): Recording output base path
+            filename (str, optional): Recording output filename. Defaults to "out".
+            duration (float, optional): Delay between frames in milliseconds. Defaults to 1000.
+            max_frames (int, optional): Frames to record before ignoring new frames. 0 records until closed. Defaults to 0.
+            suffix (str, optional): Recording format, ".gif" or ".mp4". Defaults to ".gif".
+
+        Returns:
+            FrameRecorder: Started recorder. Call `close()` to finish the file.
+        """
+        d = datetime.now()
+        out_path = base_path / f"response/{d.strftime('%Y-%m-%d')}/{filename}_{d.strftime('%I-%M-%S%p')}{suffix}"
+        return FrameRecorder(out_path, duration, max_frames, self.record_queue_frames).start()
 
     def save_to_gif(self, images: list[Image.Image], base_path: Path, filename: str = "out", duration: int = 1000):
-        """Save images as a new GIF file.
+        """Save images as a new GIF file. Prefer `start_recording()` to avoid holding every frame in memory.
 
         Args:
             images (list[Image.Image]): Images included in GIF
@@ -95,40 +437,21 @@ class RGBPlugin():
             filename (str, optional): GIF output filename. Defaults to "out".
             duration (int, optional): GIF delay between frames in milliseconds. Defaults to 1000.
         """
-        d = datetime.now()
-        out_path = base_path / f"response/{d.strftime('%Y-%m-%d')}"
-        os.makedirs(out_path, exist_ok=True)
-
-        # save gif
-        images[0].save(
-            out_path / f"{filename}_{d.strftime('%I-%M-%S%p')}.gif",
-            save_all = True,
-            append_images = images[1:],
-            duration = duration,  # ms
-            loop = 0  # infinite loop
-        )
+        self._save_images(images, base_path, filename, duration, ".gif")
 
     def save_to_mp4(self, images: list[Image.Image], base_path: Path, filename: str = "out"):
-        """Save images as a new MP4 file.
+        """Save images as a new 30 FPS MP4 file. Prefer `start_recording()` to avoid holding every frame in memory.
 
         Args:
             images (list[Image.Image]): Images included in MP4
             base_path (Path): MP4 output base path
             filename (str, optional): MP4 output filename. Defaults to "out".
         """
-        d = datetime.now()
-        out_path = base_path / f"response/{d.strftime('%Y-%m-%d')}"
-        os.makedirs(out_path, exist_ok=True)
-
-        out_path = out_path / f"{filename}_{d.strftime('%I-%M-%S%p')}.mp4"
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v') # mp4 codec
-        video = cv2.VideoWriter(out_path, fourcc, 30, (64, 64))
-
-        # save mp4
-        for img in images:
-            img_arr = np.array(img, dtype=np.uint8)
-            frame = cv2.cvtColor(img_arr, cv2.COLOR_RGB2BGR)
-            video.write(frame)
+        self._save_images(images, base_path, filename, 1000 / 30, ".mp4")
 
-        video.release()
-        cv2.destroyAllWindows()
+    def _save_images(self, images: list[Image.Image], base_path: Path, filename: str, duration: float, suffix: str):
+        recorder = self.start_recording(base_path, filename, duration, suffix=suffix)
+        for image in images:
+            # all frames are already in memory, so wait for queue space instead of dropping frames
+            recorder.add_frame(image, block=True)
+        recorder.close()
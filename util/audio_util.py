@@ -1,12 +1,22 @@
-from pvrecorder import PvRecorder
-from pvspeaker import PvSpeaker
+import base64
+from threading import Thread, Condition, Lock
+from typing import TYPE_CHECKING
 
-def init_recorder(frame_length: int = 512) -> PvRecorder:
+import numpy as np
+
+if TYPE_CHECKING:
+    # audio device libraries are imported on first use so the PCM helpers work without them
+    from pvrecorder import PvRecorder
+    from pvspeaker import PvSpeaker
+
+def init_recorder(frame_length: int = 512) -> "PvRecorder":
+    from pvrecorder import PvRecorder
     audio_devices = PvRecorder.get_available_devices()
     mic_index = [i for i, mic in enumerate(audio_devices) if "UAC 1.0 Microphone & HID-Mediak" in mic][0]
     return PvRecorder(frame_length=frame_length, device_index=mic_index)
 
-def init_speaker(sample_rate: int = 22050, bits_per_sample: int = 16) -> PvSpeaker:
+def init_speaker(sample_rate: int = 22050, bits_per_sample: int = 16) -> "PvSpeaker":
+    from pvspeaker import PvSpeaker
     speaker_index = [i for i, s in enumerate(PvSpeaker.get_available_devices()) if "UACDemoV1.0" in s][0]
     # speaker = PvSpeaker(sample_rate=self.orca.sample_rate, bits_per_sample=16, device_index=speaker_index)
     speaker = PvSpeaker(sample_rate=sample_rate, bits_per_sample=bits_per_sample, device_index=speaker_index)
@@ -23,4 +33,209 @@ def audio_frame_extractor(audio: list[int], chunk_size: int = 512):
             Successive chunks of the list.
         """
         for i in range(0, len(audio), chunk_size):
-            yield audio[i:i + chunk_size]
\ No newline at end of file
+            yield audio[i:i + chunk_size]
+
+def pcm16_to_bytes(pcm) -> bytes:
+    """Converts int16 pcm samples (list, array, or numpy) to little-endian 16bit pcm bytes in a single vectorized copy.
+
+    Args:
+        pcm: int16 pcm samples
+
+    Returns:
+        bytes: 16bit pcm audio buffer
+    """
+    return np.asarray(pcm, dtype="<i2").tobytes()
+
+def pcm16_to_base64(pcm) -> str:
+    """Converts int16 pcm samples to base64-encoded 16bit pcm. numpy int16 input is encoded without an intermediate bytes copy.
+
+    Args:
+        pcm: int16 pcm samples
+
+    Returns:
+        str: ascii-decoded base64 audio
+    """
+    return base64.b64encode(memoryview(np.ascontiguousarray(pcm, dtype="<i2"))).decode("ascii")
+
+def bytes_to_pcm16(data: bytes) -> memoryview:
+    """Zero-copy view of 16bit pcm bytes as int16 samples. Slices of the view are also zero-copy
+    and can be written directly to `PvSpeaker.write()`.
+
+    Args:
+        data (bytes): 16bit pcm audio buffer (native little-endian)
+
+    Returns:
+        memoryview: int16 samples
+    """
+    return memoryview(data).cast("h")
+
+class MicCapture:
+    """Owns the microphone. A single capture thread reads int16 frames from one `PvRecorder` into a ring buffer,
+    and any number of `MicReader` consumers read from it with independent cursors.
+    The device stays open, so consumers starting/stopping don't pay for opening the device.\n
+    Example use: `recorder = get_mic_capture().reader(frame_length=512)`
+    """
+    def __init__(self, frame_length: int = 512, buffer_seconds: int = 10):
+        self.recorder = init_recorder(frame_length=frame_length)
+        self.sample_rate = self.recorder.sample_rate
+        self.capacity = buffer_seconds * self.sample_rate
+        self.write_pos = 0 # total samples captured
+        self._buffer = np.zeros(self.capacity, dtype=np.int16)
+        self._new_audio = Condition()
+        self._thread: Thread = None
+        self._running = False
+
+    def start(self):
+        """Start the capture thread if not already running."""
+        with self._new_audio:
+            if self._running:
+                return
+            self._running = True
+        self._thread = Thread(name="mic_capture", target=self._capture_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the capture thread and release the device."""
+        with self._new_audio:
+            self._running = False
+            self._new_audio.notify_all()
+        if self._thread:
+            self._thread.join()
+        self.recorder.delete()
+
+    def _capture_loop(self):
+        self.recorder.start()
+        try:
+            while self._running:
+                frame = np.asarray(self.recorder.read(), dtype=np.int16)
+                # single writer: copy into the ring first, then publish the new write position
+                i = self.write_pos % self.capacity
+                n = min(len(frame), self.capacity - i)
+                self._buffer[i:i + n] = frame[:n]
+                self._buffer[:len(frame) - n] = frame[n:]
+                with self._new_audio:
+                    self.write_pos += len(frame)
+                    self._new_audio.notify_all()
+        except Exception as e:
+            print(f"> mic_capture interrupted: error: {e}")
+        finally:
+            self.recorder.stop()
+            with self._new_audio:
+                self._running = False
+                self._new_audio.notify_all()
+
+    def wait_for(self, pos: int):
+        """Block until samples up to absolute position `pos` (exclusive) have been captured.
+
+        Raises:
+            ValueError: Capture stopped
+        """
+        with self._new_audio:
+            while self.write_pos < pos:
+                if not self._running:
+                    raise ValueError("mic capture is not running")
+                self._new_audio.wait(timeout=1)
+
+    def read_range(self, start: int, end: int) -> np.ndarray:
+        """Copy captured samples between absolute positions `start` and `end`.
+
+        Returns:
+            np.ndarray: int16 samples, or None if the range was already overwritten
+        """
+        i, j = start % self.capacity, end % self.capacity
+        if i < j or start == end:
+            samples = self._buffer[i:j].copy()
+        else:
+            samples = np.concatenate((self._buffer[i:], self._buffer[:j]))
+        # writer may have lapped the reader (or started overwriting it with the next frame) while copying
+        if self.write_pos + self.recorder.frame_length - start > self.capacity:
+            return None
+        return samples
+
+    def reader(self, frame_length: int = 512, sample_rate: int = None) -> "MicReader":
+        """Create a consumer with its own read cursor.
+
+        Args:
+            frame_length (int, optional): Samples returned per `read()`. Defaults to 512.
+            sample_rate (int, optional): Output sample rate. Resampled if it differs from the device rate. Defaults to device rate.
+
+        Returns:
+            MicReader: Microphone consumer
+        """
+        return MicReader(self, frame_length, sample_rate or self.sample_rate)
+
+class MicReader:
+    """Microphone consumer of a shared `MicCapture`. Drop-in for `PvRecorder`: `start()`, `stop()`, `read()`,
+    `is_recording`, `frame_length`, `sample_rate`. Frames are linearly resampled if `sample_rate` differs from the device.
+    A reader that falls more than the ring buffer behind skips ahead to the newest audio (counted in `overruns`).
+    """
+    def __init__(self, capture: MicCapture, frame_length: int, sample_rate: int):
+        self.capture = capture
+        self.frame_length = frame_length
+        self.sample_rate = sample_rate
+        self.is_recording = False
+        self.overruns = 0
+        self._step = capture.sample_rate / sample_rate # source samples per output sample
+        self._pos = 0.0 # absolute source position of the next output sample
+
+    def start(self):
+        """Start reading from the newest captured audio."""
+        self.capture.start()
+        self._pos = float(self.capture.write_pos)
+        self.is_recording = True
+
+    def stop(self):
+        self.is_recording = False
+
+    def read_array(self) -> np.ndarray:
+        """Read the next frame, blocking until it has been captured.
+
+        Raises:
+            ValueError: Reader not started or capture stopped
+
+        Returns:
+            np.ndarray: int16 frame of `frame_length` samples
+        """
+        if not self.is_recording:
+            raise ValueError("recorder is not recording")
+        while True:
+            start = int(self._pos)
+            if self._step == 1:
+                end = start + self.frame_length
+            else:
+                positions = self._pos + self._step * np.arange(self.frame_length)
+                end = int(positions[-1]) + 2
+            self.capture.wait_for(end)
+            samples = self.capture.read_range(start, end)
+            if samples is not None:
+                break
+            # fell too far behind, skip to the newest audio
+            self.overruns += 1
+            self._pos = float(self.capture.write_pos)
+        self._pos += self._step * self.frame_length
+        if self._step == 1:
+            return samples
+        return np.interp(positions - start, np.arange(len(samples)), samples).astype(np.int16)
+
+    def read(self) -> list[int]:
+        """Read the next frame. Same format as `PvRecorder.read()`.
+
+        Returns:
+            list[int]: int16 frame of `frame_length` samples
+        """
+        return self.read_array().tolist()
+
+_mic_capture: MicCapture = None
+_mic_capture_lock = Lock()
+
+def get_mic_capture() -> MicCapture:
+    """Get the process-wide microphone capture, opening the device on first use.
+
+    Returns:
+        MicCapture: Shared microphone capture
+    """
+    global _mic_capture
+    with _mic_capture_lock:
+        if not _mic_capture:
+            _mic_capture = MicCapture()
+        return _mic_capture
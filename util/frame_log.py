@@ -0,0 +1,360 @@
+"""Append-only log of every frame presented on the display, for diagnosing display glitches in the field.
+
+Log file (`.pxfl`): a header, then one record per frame. Each record is a keyframe (the zlib compressed frame),
+a delta (the zlib compressed XOR with the previous frame) or a repeat (no payload). Every `keyframe_interval`
+frames is a keyframe, so reading can start at any keyframe. Index file (`.pxfl.idx`): (timestamp, file offset)
+of every keyframe, for seeking by time. A missing or stale index is rebuilt by scanning the log.
+
+Run from the repo root:
+```
+python -m util.frame_log info display.pxfl
+python -m util.frame_log export display.pxfl replay.gif --start 120 --end 130
+python -m util.frame_log replay display.pxfl --start 120 --speed 2
+```
+"""
+import zlib
+import struct
+import argparse
+from bisect import bisect_right
+from pathlib import Path
+from threading import Thread, Lock
+from queue import Queue, Full
+from time import perf_counter, time, sleep
+from typing import Iterator
+
+import numpy as np
+
+from util.frame_recorder import FrameRecorder
+
+MAGIC = b"PXFL"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHHd") # magic, version, width, height, keyframe interval, wall clock time the log was created
+RECORD = struct.Struct("<BdI") # kind, wall clock timestamp, payload length
+INDEX_ENTRY = struct.Struct("<dQ") # keyframe timestamp, record offset
+KEYFRAME, DELTA, REPEAT = 0, 1, 2
+
+class FrameLog:
+    """`Display` frame tap that appends every presented frame to a compressed frame log.\n
+    The tap only copies the frame into a bounded queue. A background worker diffs, compresses and writes it,
+    so a slow SD card never stalls rendering. Frames are dropped (and counted) if the worker falls behind.\n
+    Example use: `display.add_tap(FrameLog("display.pxfl", 64, 64).start())`
+    """
+    END_OF_LOG = None
+
+    def __init__(self, path: str | Path, width: int, height: int, keyframe_interval: int = 300, compression_level: int = 1, queue_size: int = 64):
+        """
+        Args:
+            path (str | Path): Log path. An existing log is appended to if it has the same frame size.
+            width (int): Frame width
+            height (int): Frame height
+            keyframe_interval (int, optional): Frames between keyframes. Defaults to 300.
+            compression_level (int, optional): zlib level, 1 (fastest) to 9 (smallest). Defaults to 1.
+            queue_size (int, optional): Frames waiting to be written before new frames are dropped. Defaults to 64.
+        """
+        self.path = Path(path)
+        self.index_path = index_path(self.path)
+        self.width = width
+        self.height = height
+        self.keyframe_interval = keyframe_interval
+        self.compression_level = compression_level
+        self.queue: Queue[tuple[np.ndarray, float] | None] = Queue(maxsize=queue_size)
+        self.worker = Thread(name="frame_log", target=self._write, daemon=True)
+        self.lock = Lock()
+        self.frames_logged = 0
+        self.frames_dropped = 0
+        self.keyframes = 0
+        self.bytes_written = 0
+        self.tap_time = 0.0 # seconds spent on the render thread
+        self.tap_calls = 0
+        self.write_time = 0.0 # seconds spent diffing, compressing and writing
+        self.write_time_max = 0.0
+        self.error: Exception = None
+
+    def start(self) -> "FrameLog":
+        """Open the log and start the writer.
+
+        Returns:
+            FrameLog: self
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.worker.start()
+        return self
+
+    def __call__(self, frame: np.ndarray, timestamp: float):
+        """Queue a copy of a presented frame. Never blocks.
+
+        Args:
+            frame (np.ndarray): `(H, W, 3) uint8` frame
+            timestamp (float): `perf_counter()` time the frame was presented
+        """
+        start = perf_counter()
+        if self.error is None:
+            try:
+                self.queue.put_nowait((frame.copy(), timestamp))
+            except Full:
+                self.frames_dropped += 1
+        self.tap_calls += 1
+        self.tap_time += perf_counter() - start
+
+    def close(self) -> dict:
+        """Write queued frames and close the log.
+
+        Returns:
+            dict: Log stats (see `stats()`)
+        """
+        if self.worker.is_alive():
+            self.queue.put(self.END_OF_LOG)
+            self.worker.join()
+        stats = self.stats()
+        print(f"> Closed frame log {self.path}: {stats}")
+        return stats
+
+    def stats(self) -> dict:
+        """Write cost per frame.
+
+        Returns:
+            dict: Logged, dropped and keyframe counts, bytes written, mean bytes per frame, mean time on the render thread in microseconds, and mean/max write time in microseconds
+        """
+        with self.lock:
+            return {
+                "frames": self.frames_logged,
+                "dropped": self.frames_dropped,
+                "keyframes": self.keyframes,
+                "bytes": self.bytes_written,
+                "bytes_per_frame": self.bytes_written / self.frames_logged if self.frames_logged else 0.0,
+                "tap_us": self.tap_time / self.tap_calls * 1_000_000 if self.tap_calls else 0.0,
+                "write_us": self.write_time / self.frames_logged * 1_000_000 if self.frames_logged else 0.0,
+                "max_write_us": self.write_time_max * 1_000_000
+            }
+
+    def _open(self):
+        """Open the log for appending, starting a new log if there is none or its frame size differs."""
+        if self.path.exists() and self.path.stat().st_size >= HEADER.size:
+            with open(self.path, "rb") as f:
+                magic, version, width, height, _, _ = HEADER.unpack(f.read(HEADER.size))
+            if (magic, version, width, height) == (MAGIC, VERSION, self.width, self.height):
+                return open(self.path, "ab"), open(self.index_path, "ab")
+            print(f"> Replacing frame log with a different format or frame size: {self.path}")
+        log, index = open(self.path, "wb"), open(self.index_path, "wb")
+        log.write(HEADER.pack(MAGIC, VERSION, self.width, self.height, self.keyframe_interval, time()))
+        return log, index
+
+    def _write(self):
+        """Worker: append frames until the log is closed."""
+        try:
+            log, index = self._open()
+        except OSError as e:
+            self.error = e
+            print(f"> Failed to open frame log {self.path}: {e}")
+            return
+        wall_origin = time() - perf_counter() # presented frames are timestamped with perf_counter()
+        previous = None
+        since_keyframe = 0
+        with log, index:
+            while (item := self.queue.get()) is not self.END_OF_LOG:
+                frame, timestamp = item
+                start = perf_counter()
+                timestamp += wall_origin
+                offset = log.tell()
+                if previous is None or since_keyframe >= self.keyframe_interval:
+                    kind, payload = KEYFRAME, zlib.compress(frame.data, self.compression_level)
+                    since_keyframe = 0
+                elif np.array_equal(frame, previous):
+                    kind, payload = REPEAT, b""
+                else:
+                    kind, payload = DELTA, zlib.compress(np.bitwise_xor(frame, previous).data, self.compression_level)
+                try:
+                    log.write(RECORD.pack(kind, timestamp, len(payload)))
+                    log.write(payload)
+                    if kind == KEYFRAME:
+                        # everything up to a keyframe is on disk if the device loses power
+                        log.flush()
+                        index.write(INDEX_ENTRY.pack(timestamp, offset))
+                        index.flush()
+                except OSError as e:
+                    self.error = e
+                    print(f"> Failed to write frame log {self.path}: {e}")
+                    break
+                previous = frame
+                since_keyframe += 1
+                elapsed = perf_counter() - start
+                with self.lock:
+                    self.frames_logged += 1
+                    self.keyframes += kind == KEYFRAME
+                    self.bytes_written += RECORD.size + len(payload)
+                    self.write_time += elapsed
+                    self.write_time_max = max(self.write_time_max, elapsed)
+
+class FrameLogReader:
+    """Reads a frame log written by `FrameLog`.\n
+    Example use: `for timestamp, frame in FrameLogReader(path).frames(start, end):`
+    """
+    def __init__(self, path: str | Path):
+        """
+        Args:
+            path (str | Path): Log path
+
+        Raises:
+            ValueError: Not a frame log
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size or header[:4] != MAGIC:
+            raise ValueError(f"Not a frame log: {self.path}")
+        _, self.version, self.width, self.height, self.keyframe_interval, self.created = HEADER.unpack(header)
+        self.frame_size = self.width * self.height * 3
+        self.index = self._load_index()
+
+    def _load_index(self) -> list[tuple[float, int]]:
+        """Keyframe (timestamp, offset) pairs, from the index file or by scanning the log if the index is missing or stale."""
+        path = index_path(self.path)
+        if path.exists():
+            data = path.read_bytes()
+            entries = [INDEX_ENTRY.unpack_from(data, i) for i in range(0, len(data) - len(data) % INDEX_ENTRY.size, INDEX_ENTRY.size)]
+            if entries and entries[-1][1] + RECORD.size <= self.path.stat().st_size:
+                return entries
+        return [(timestamp, offset) for kind, timestamp, offset, _ in self._records(HEADER.size, payloads=False) if kind == KEYFRAME]
+
+    def _records(self, offset: int, payloads: bool = True) -> Iterator[tuple[int, float, int, bytes]]:
+        """(kind, timestamp, offset, payload) of every complete record from `offset` on. Payloads are empty if not read."""
+        size = self.path.stat().st_size
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while len(header := f.read(RECORD.size)) == RECORD.size:
+                kind, timestamp, length = RECORD.unpack(header)
+                if offset + RECORD.size + length > size:
+                    return # partially written record
+                if payloads:
+                    yield kind, timestamp, offset, f.read(length)
+                else:
+                    f.seek(length, 1)
+                    yield kind, timestamp, offset, b""
+                offset += RECORD.size + length
+
+    @property
+    def start_time(self) -> float:
+        return self.index[0][0] if self.index else 0.0
+
+    def frames(self, start: float = None, end: float = None) -> Iterator[tuple[float, np.ndarray]]:
+        """Decode frames in a time range, seeking to the last keyframe at or before `start`.
+
+        Args:
+            start (float, optional): Wall clock time (seconds since epoch) of the first frame. Defaults to the start of the log.
+            end (float, optional): Wall clock time of the last frame. Defaults to the end of the log.
+
+        Yields:
+            tuple[float, np.ndarray]: Frame wall clock time and `(H, W, 3) uint8` frame. The frame is reused by the next frame.
+        """
+        if not self.index:
+            return
+        i = max(bisect_right(self.index, (start, float("inf"))) - 1, 0) if start is not None else 0
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        for kind, timestamp, _, payload in self._records(self.index[i][1]):
+            if end is not None and timestamp > end:
+                return
+            if kind == KEYFRAME:
+                frame[...] = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(frame.shape)
+            elif kind == DELTA:
+                np.bitwise_xor(frame, np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(frame.shape), out=frame)
+            if start is None or timestamp >= start:
+                yield timestamp, frame
+
+    def info(self) -> dict:
+        """Summary of the log. Only record headers are read.
+
+        Returns:
+            dict: Frame size, keyframe/delta/repeat frame counts, first/last frame time and log size in bytes
+        """
+        counts, last = [0, 0, 0], self.start_time
+        for kind, last, _, _ in self._records(HEADER.size, payloads=False):
+            counts[kind] += 1
+        return {
+            "size": (self.width, self.height),
+            "keyframes": counts[KEYFRAME],
+            "deltas": counts[DELTA],
+            "repeats": counts[REPEAT],
+            "start": self.start_time,
+            "end": last,
+            "bytes": self.path.stat().st_size
+        }
+
+    def export(self, path: str | Path, start: float = None, end: float = None) -> dict:
+        """Export a segment as a GIF or MP4, with each frame shown for as long as it was on screen.
+
+        Args:
+            path (str | Path): Output path (`.gif` or `.mp4`)
+            start (float, optional): Wall clock time of the first frame. Defaults to the start of the log.
+            end (float, optional): Wall clock time of the last frame. Defaults to the end of the log.
+
+        Returns:
+            dict: Recording stats
+        """
+        with FrameRecorder(path) as recorder:
+            previous = None
+            for timestamp, frame in self.frames(start, end):
+                if previous is not None:
+                    recorder.add_frame(previous[1], block=True, duration_ms=max((timestamp - previous[0]) * 1_000, 10))
+                previous = (timestamp, frame.copy())
+            if previous is not None:
+                recorder.add_frame(previous[1], block=True)
+        return recorder.stats()
+
+    def replay(self, matrix, start: float = None, end: float = None, speed: float = 1.0):
+        """Replay a segment on a matrix (e.g., `EmulatorMatrix`) with its original timing.
+
+        Args:
+            matrix (EmulatorMatrix | RGBMatrix): Matrix to draw on
+            start (float, optional): Wall clock time of the first frame. Defaults to the start of the log.
+            end (float, optional): Wall clock time of the last frame. Defaults to the end of the log.
+            speed (float, optional): Playback speed. Defaults to 1.0.
+        """
+        from PIL import Image
+        origin = None
+        for timestamp, frame in self.frames(start, end):
+            if origin is None:
+                origin = (timestamp, perf_counter())
+            delay = (timestamp - origin[0]) / speed - (perf_counter() - origin[1])
+            if delay > 0:
+                sleep(delay)
+            if hasattr(matrix, "SetArray"):
+                matrix.SetArray(frame)
+            else:
+                matrix.SetImage(Image.fromarray(frame))
+
+def index_path(path: Path) -> Path:
+    return path.with_suffix(path.suffix + ".idx")
+
+def parse_time(reader: FrameLogReader, value: str | None) -> float | None:
+    """Seconds from the start of the log. Values above 1e9 are taken as unix timestamps."""
+    if value is None:
+        return None
+    seconds = float(value)
+    return seconds if seconds > 1e9 else reader.start_time + seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, export or replay a Pixel Art frame log")
+    parser.add_argument("command", choices=["info", "export", "replay"])
+    parser.add_argument("log", help="frame log path")
+    parser.add_argument("out", nargs="?", help="export output path (.gif or .mp4)")
+    parser.add_argument("--start", help="seconds from the start of the log, or a unix timestamp")
+    parser.add_argument("--end", help="seconds from the start of the log, or a unix timestamp")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed")
+    args = parser.parse_args()
+
+    reader = FrameLogReader(args.log)
+    start, end = parse_time(reader, args.start), parse_time(reader, args.end)
+    if args.command == "info":
+        print(f"> {reader.info()}")
+    elif args.command == "export":
+        if not args.out:
+            parser.error("export needs an output path")
+        reader.export(args.out, start, end)
+    else:
+        from util.rgb_emulator import EmulatorMatrix
+        matrix = EmulatorMatrix(reader.width, reader.height)
+        reader.replay(matrix, start, end, args.speed)
+        print(f"> Emulator frame stats: {matrix.get_frame_stats()}")
+
+if __name__ == "__main__":
+    main()
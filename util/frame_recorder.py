@@ -0,0 +1,193 @@
+from pathlib import Path
+from threading import Thread, Lock
+from queue import Queue, Full
+from time import perf_counter
+
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+class FrameRecorder:
+    """Records frames to a GIF or MP4 file without blocking the render loop.\n
+    `add_frame()` copies the frame into a bounded queue and returns immediately. A background worker
+    encodes and writes frames as they arrive, so memory stays at most `queue_size` frames no matter how
+    long the recording is. Frames are dropped (and counted) rather than stalling the caller if the encoder falls behind.\n
+    Example use:
+    ```
+    recorder = FrameRecorder(path / "out.gif", duration_ms=100, max_frames=50).start()
+    while running:
+        draw(framebuffer)
+        recorder.add_frame(framebuffer)
+    recorder.close()
+    ```
+    """
+    FORMATS = {".gif", ".mp4"}
+    END_OF_RECORDING = None
+
+    def __init__(self, path: str | Path, duration_ms: float = 100, max_frames: int = 0, queue_size: int = 32):
+        """
+        Args:
+            path (str | Path): Output path. The format is chosen by suffix (`.gif` or `.mp4`).
+            duration_ms (float, optional): Time between frames in milliseconds. Defaults to 100.
+            max_frames (int, optional): Frames to record before ignoring new frames. 0 records until closed. Defaults to 0.
+            queue_size (int, optional): Frames waiting to be encoded before new frames are dropped. Defaults to 32.
+
+        Raises:
+            ValueError: Unsupported file type
+        """
+        self.path = Path(path)
+        if self.path.suffix not in self.FORMATS:
+            raise ValueError(f"Unsupported recording file type: {self.path}")
+        self.duration_ms = duration_ms
+        self.max_frames = max_frames
+        self.queue: Queue[tuple[np.ndarray, float] | None] = Queue(maxsize=queue_size)
+        self.worker = Thread(name=f"record {self.path.name}", target=self._encode, daemon=True)
+        self.lock = Lock()
+        self.closed = False
+        self.frames_added = 0
+        self.frames_dropped = 0
+        self.frames_encoded = 0
+        self.max_queue_depth = 0
+        self.encode_time = 0.0 # seconds spent encoding and writing
+        self.error: Exception = None
+
+    def __enter__(self) -> "FrameRecorder":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self) -> "FrameRecorder":
+        """Start the encoder worker.
+
+        Returns:
+            FrameRecorder: self
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.worker.start()
+        return self
+
+    @property
+    def full(self) -> bool:
+        """True once `max_frames` frames have been recorded."""
+        return self.max_frames > 0 and self.frames_added >= self.max_frames
+
+    def add_frame(self, frame: np.ndarray | Image.Image, block: bool = False, duration_ms: float = None) -> bool:
+        """Queue a copy of a frame for encoding.
+
+        Args:
+            frame (np.ndarray | Image.Image): `(H, W, 3) uint8` frame (e.g., a framebuffer) or image
+            block (bool, optional): Wait for queue space instead of dropping the frame. Only for callers off the render loop. Defaults to False.
+            duration_ms (float, optional): Time this frame stays on screen in milliseconds. Defaults to the recorder's `duration_ms`.
+
+        Returns:
+            bool: False if the frame was not recorded (recorder full or closed, or encoder queue full)
+        """
+        if self.closed or self.full or self.error:
+            return False
+        if isinstance(frame, Image.Image):
+            frame = np.asarray(frame.convert("RGB"))
+        try:
+            self.queue.put((np.array(frame, dtype=np.uint8, copy=True), duration_ms or self.duration_ms), block=block)
+        except Full:
+            with self.lock:
+                self.frames_dropped += 1
+            return False
+        self.frames_added += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return True
+
+    def close(self) -> dict:
+        """Finish encoding queued frames and close the file.
+
+        Returns:
+            dict: Recording stats (see `stats()`)
+        """
+        if not self.closed:
+            self.closed = True
+            if self.worker.is_alive():
+                self.queue.put(self.END_OF_RECORDING)
+                self.worker.join()
+            stats = self.stats()
+            if self.error:
+                print(f"> Failed to record {self.path}: {self.error}")
+            else:
+                print(f"> Saved recording {self.path}: {stats}")
+        return self.stats()
+
+    def stats(self) -> dict:
+        """Recording throughput.
+
+        Returns:
+            dict: Encoded and dropped frame counts, current and max queue depth, total encode time in milliseconds and encoded frames per second of encode time
+        """
+        with self.lock:
+            return {
+                "frames_encoded": self.frames_encoded,
+                "frames_dropped": self.frames_dropped,
+                "queue_depth": self.queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "encode_ms": self.encode_time * 1_000,
+                "encode_fps": self.frames_encoded / self.encode_time if self.encode_time else 0.0
+            }
+
+    def _encode(self):
+        """Worker: encode frames until the end of the recording."""
+        writer = self._write_gif() if self.path.suffix == ".gif" else self._write_mp4()
+        try:
+            next(writer) # open file
+        except Exception as e:
+            self.error = e
+        while (item := self.queue.get()) is not self.END_OF_RECORDING:
+            if self.error:
+                continue # keep draining so close() doesn't wait on a dead encoder
+            start = perf_counter()
+            try:
+                writer.send(item)
+            except Exception as e:
+                self.error = e
+                continue
+            with self.lock:
+                self.frames_encoded += 1
+                self.encode_time += perf_counter() - start
+        writer.close() # finish file
+        if not self.frames_encoded:
+            self.path.unlink(missing_ok=True)
+
+    def _write_gif(self):
+        """GIF writer coroutine. Writes the header with the first frame, then each frame with its own color table."""
+        with open(self.path, "wb") as f:
+            first = True
+            try:
+                while True:
+                    frame, duration_ms = yield
+                    image = Image.fromarray(frame).convert("P", palette=Image.Palette.ADAPTIVE)
+                    if first:
+                        # first frame's palette is the global color table
+                        header, _ = GifImagePlugin.getheader(image, info={"loop": 0, "duration": duration_ms})
+                        f.writelines(header)
+                        f.writelines(GifImagePlugin.getdata(image, duration=duration_ms))
+                        first = False
+                    else:
+                        f.writelines(GifImagePlugin.getdata(image, duration=duration_ms, include_color_table=True))
+            finally:
+                if not first:
+                    f.write(b";") # trailer
+
+    def _write_mp4(self):
+        """MP4 writer coroutine. The video is sized by the first frame and runs at a constant `1000 / duration_ms` FPS,
+        so longer frames are repeated."""
+        import cv2 # deferred so RGB-only setups don't pay for opencv at startup
+
+        video = None
+        try:
+            while True:
+                frame, duration_ms = yield
+                if video is None:
+                    fourcc = cv2.VideoWriter_fourcc(*'mp4v') # mp4 codec
+                    video = cv2.VideoWriter(str(self.path), fourcc, 1_000 / self.duration_ms, (frame.shape[1], frame.shape[0]))
+                bgr = np.ascontiguousarray(frame[..., ::-1])
+                for _ in range(max(round(duration_ms / self.duration_ms), 1)):
+                    video.write(bgr)
+        finally:
+            if video is not None:
+                video.release()
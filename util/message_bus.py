@@ -0,0 +1,279 @@
+from pathlib import Path
+from threading import Event, Condition
+from queue import Empty
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+from PIL import Image
+
+from config.config import PluginConfig
+from util.sync_util import ResultQueue, wait_for, summarize_ms
+
+class Channel(ResultQueue):
+    """Named, typed and bounded result queue between a producer (AI/game plugin) and an RGB plugin.\n
+    When full, `put()` follows the channel's overflow policy:
+    - `block`: wait for the consumer (backpressure)
+    - `drop_oldest`: drop the oldest queued item
+    - `latest_wins`: drop every queued item, only the newest is kept
+    """
+    OVERFLOW = ("block", "drop_oldest", "latest_wins")
+
+    def __init__(self, name: str, item_type: type | tuple[type] = object, capacity: int = 0, overflow: str = "block"):
+        """
+        Args:
+            name (str): Channel name
+            item_type (type | tuple[type], optional): Type of items put on the channel. Defaults to object (any).
+            capacity (int, optional): Max queued items. Defaults to 0 (unbounded). `latest_wins` always holds 1.
+            overflow (str, optional): Policy when full (block, drop_oldest, latest_wins). Defaults to "block".
+        """
+        if overflow not in self.OVERFLOW:
+            raise ValueError(f"Unknown overflow policy for channel {name}: {overflow}. Expected one of {self.OVERFLOW}")
+        super().__init__(1 if overflow == "latest_wins" else capacity)
+        self.name = name
+        self.item_type = item_type
+        self.overflow = overflow
+        self.puts = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def _put(self, item):
+        super()._put(item)
+        self.puts += 1
+        self.max_depth = max(self.max_depth, self._qsize())
+
+    def put(self, item, block: bool = True, timeout: float = None):
+        """Put an item on the channel, following the overflow policy if full.
+
+        Args:
+            item (any): Item of the channel's type
+            block (bool, optional): `block` policy only: wait for space. Defaults to True.
+            timeout (float, optional): `block` policy only: max wait in seconds. Defaults to None (no limit).
+
+        Raises:
+            TypeError: Item isn't the channel's type
+            Full: `block` policy only: no space before `timeout`
+        """
+        if not isinstance(item, self.item_type):
+            raise TypeError(f"Channel {self.name} expects {self.item_type}, got {type(item)}")
+        if self.overflow == "block":
+            return super().put(item, block, timeout)
+        with self.not_full:
+            if self.maxsize > 0 and self._qsize() >= self.maxsize:
+                # full, make room for the new item
+                dropped = self._qsize() if self.overflow == "latest_wins" else 1
+                for _ in range(dropped):
+                    self.queue.popleft()
+                self.dropped += dropped
+                self.unfinished_tasks -= dropped
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def stats(self) -> dict:
+        """Channel counters and handoff latency.
+
+        Returns:
+            dict: Capacity, overflow policy, current/max depth, put and dropped counts, and `latency_stats()`
+        """
+        return {
+            "capacity": self.maxsize,
+            "overflow": self.overflow,
+            "depth": self.qsize(),
+            "max_depth": self.max_depth,
+            "puts": self.puts,
+            "dropped": self.dropped,
+            **self.latency_stats()
+        }
+
+class FrameMailbox():
+    """Single-slot, double-buffered mailbox for game frames. The game overwrites the newest frame and the RGB plugin
+    always shows the newest frame, so a display that falls behind skips frames instead of showing them late.\n
+    Frames are copied into one of two preallocated buffers: the one the RGB plugin isn't showing. Records the latency from
+    `put()` and from the player input behind a frame to the first pixel, and how many frames were overwritten unseen.\n
+    Example use: `mailbox.put(frame, input_time)` in a game plugin, `frame = mailbox.get_until(ai_end_event)` in an RGB plugin
+    """
+    POLL = ResultQueue.POLL
+    LATENCY_HISTORY = ResultQueue.LATENCY_HISTORY
+
+    def __init__(self, width: int, height: int):
+        """
+        Args:
+            width (int): Frame width in pixels
+            height (int): Frame height in pixels
+        """
+        self.name = "frame"
+        self.width = width
+        self.height = height
+        self.buffers = np.zeros((2, height, width, 3), dtype=np.uint8)
+        self.ready = Condition()
+        self.latest: int = None # buffer holding the newest frame not taken yet
+        self.reading: int = None # buffer the RGB plugin is showing
+        self.latest_put_time: float = None
+        self.latest_input_time: float = None
+        self.got_put_time: float = None # put() time of the last frame taken, until it is presented
+        self.got_input_time: float = None
+        self.puts = 0
+        self.taken = 0
+        self.overwritten = 0
+        self.latency_ms: deque[float] = deque(maxlen=self.LATENCY_HISTORY) # put() -> first presented frame
+        self.input_latency_ms: deque[float] = deque(maxlen=self.LATENCY_HISTORY) # input -> first presented frame
+
+    def put(self, frame: np.ndarray | Image.Image, input_time: float = None):
+        """Copy in a new frame, overwriting the previous one if it wasn't taken yet. Never blocks.
+
+        Args:
+            frame (np.ndarray | Image.Image): `(H, W, 3) uint8` frame (any strides, e.g., a transposed pygame surface view) or RGB image
+            input_time (float, optional): `perf_counter()` time of the player input this frame reacts to. Defaults to None.
+
+        Raises:
+            ValueError: Frame isn't the mailbox's size
+        """
+        if isinstance(frame, Image.Image):
+            frame = np.asarray(frame.convert("RGB"))
+        if frame.shape != self.buffers.shape[1:]:
+            raise ValueError(f"Frame mailbox expects {self.buffers.shape[1:]} frames, got {frame.shape}")
+        with self.ready:
+            if self.latest is not None:
+                # newest frame was never taken, the input behind it now shows in this frame
+                self.overwritten += 1
+                if self.latest_input_time is not None:
+                    input_time = self.latest_input_time if input_time is None else min(input_time, self.latest_input_time)
+            i = 1 - self.reading if self.reading is not None else (0 if self.latest is None else self.latest)
+            np.copyto(self.buffers[i], frame)
+            self.latest = i
+            self.latest_put_time = perf_counter()
+            self.latest_input_time = input_time
+            self.puts += 1
+            self.ready.notify_all()
+
+    def _has_frame(self) -> bool:
+        return self.latest is not None
+
+    def wait_until(self, end_event: Event, timeout: float = None) -> bool:
+        """Sleep until a new frame is put, `end_event` is set, or `timeout` passes.
+
+        Args:
+            end_event (Event): End event (e.g., `ai_end_event`)
+            timeout (float, optional): Max wait in seconds. Defaults to None (no limit).
+
+        Returns:
+            bool: True if a new frame is waiting
+        """
+        with self.ready:
+            return wait_for(self.ready, self._has_frame, end_event, timeout, self.POLL)
+
+    def get_until(self, end_event: Event, timeout: float = None) -> np.ndarray:
+        """Take the newest frame, sleeping until one is put, `end_event` is set, or `timeout` passes.
+        The returned frame is the mailbox's buffer: it's valid until the next call, and must not be modified.
+
+        Args:
+            end_event (Event): End event (e.g., `ai_end_event`)
+            timeout (float, optional): Max wait in seconds. Defaults to None (no limit).
+
+        Raises:
+            Empty: No new frame before `end_event` was set or `timeout` passed
+
+        Returns:
+            np.ndarray: `(H, W, 3) uint8` frame
+        """
+        with self.ready:
+            # the previous frame is released, the game may now write into its buffer
+            self.reading = None
+            if not wait_for(self.ready, self._has_frame, end_event, timeout, self.POLL):
+                raise Empty
+            self.reading, self.latest = self.latest, None
+            # a frame taken but never presented was identical to the screen (skipped by `Display`), so it's replaced
+            self.got_put_time, self.got_input_time = self.latest_put_time, self.latest_input_time
+            self.taken += 1
+            return self.buffers[self.reading]
+
+    def on_frame(self, frame: np.ndarray, timestamp: float):
+        """`Display` frame tap. Records the latency from `put()` and from player input of the last taken frame to this frame.
+
+        Args:
+            frame (np.ndarray): Presented frame
+            timestamp (float): `perf_counter()` time the frame was presented
+        """
+        if self.got_put_time is not None:
+            self.latency_ms.append((timestamp - self.got_put_time) * 1_000)
+            self.got_put_time = None
+        if self.got_input_time is not None:
+            self.input_latency_ms.append((timestamp - self.got_input_time) * 1_000)
+            self.got_input_time = None
+
+    def stats(self) -> dict:
+        """Mailbox counters and latency.
+
+        Returns:
+            dict: Put, taken and overwritten frame counts, and put -> pixel and input -> pixel latency
+        """
+        return {
+            "puts": self.puts,
+            "taken": self.taken,
+            "overwritten": self.overwritten,
+            **summarize_ms("latency", self.latency_ms),
+            **summarize_ms("input_latency", self.input_latency_ms)
+        }
+
+class MessageBus():
+    """Named channels between AI/game plugins and RGB plugins, passed to plugins as `ai_result_queue`.
+    Capacity and overflow policy of each channel are set with the `[bus]` table in config.toml. Game frames go through
+    the `frame` channel, a `FrameMailbox` that always holds only the newest frame.\n
+    Example use: `self.ai_result_queue["image"].put(path)` in an AI plugin, `path = self.get_result("image")` in an RGB plugin
+    """
+    # name: (item type, default capacity, default overflow policy)
+    CHANNELS = {
+        "image": ((str, Path), 4, "block"), # image/GIF paths (e.g., Retro Diffusion)
+        "emotion": (tuple, 4, "drop_oldest") # (emotion, duration_ms) (e.g., OpenAI assistant)
+    }
+
+    def __init__(self, config: dict = None, frame_size: tuple[int, int] = (64, 64)):
+        """
+        Args:
+            config (dict, optional): Channel settings by name (e.g., `{"image": {"capacity": 1, "overflow": "block"}}`). Defaults to None (`CHANNELS` defaults).
+            frame_size (tuple[int, int], optional): Game frame (width, height), the screen size. Defaults to (64, 64).
+        """
+        config = config or {}
+        unknown = set(config) - set(self.CHANNELS)
+        if unknown:
+            raise ValueError(f"Unknown message bus channels: {sorted(unknown)}. Expected {list(self.CHANNELS)}")
+        self.channels: dict[str, Channel | FrameMailbox] = {}
+        for name, (item_type, capacity, overflow) in self.CHANNELS.items():
+            settings = config.get(name, {})
+            self.channels[name] = Channel(name, item_type, settings.get("capacity", capacity), settings.get("overflow", overflow))
+        self.channels["frame"] = FrameMailbox(*frame_size)
+
+    @classmethod
+    def from_config(cls, path: Path, frame_size: tuple[int, int] = (64, 64)) -> "MessageBus":
+        """Create the message bus from the `[bus]` table of a config file.
+
+        Args:
+            path (Path): Root config path
+            frame_size (tuple[int, int], optional): Game frame (width, height), the screen size. Defaults to (64, 64).
+
+        Returns:
+            MessageBus: Message bus
+        """
+        return cls(PluginConfig(path, section="bus").items, frame_size)
+
+    def __getitem__(self, name: str) -> Channel | FrameMailbox:
+        return self.channels[name]
+
+    def on_frame(self, frame: np.ndarray, timestamp: float):
+        """`Display` frame tap. Records the put() -> first pixel latency of each channel (and input -> first pixel for game frames).
+
+        Args:
+            frame (np.ndarray): Presented frame
+            timestamp (float): `perf_counter()` time the frame was presented
+        """
+        for channel in self.channels.values():
+            channel.on_frame(frame, timestamp)
+
+    def stats(self) -> dict:
+        """Counters of every channel used so far.
+
+        Returns:
+            dict: `Channel.stats()` (or `FrameMailbox.stats()`) by channel name
+        """
+        return {name: channel.stats() for name, channel in self.channels.items() if channel.puts}
@@ -0,0 +1,136 @@
+import os
+import json
+import threading
+from time import perf_counter, thread_time
+from contextlib import contextmanager
+
+class StartupProfiler():
+    """Records a timeline of startup phases and saves it as a Chrome trace
+    (open in `chrome://tracing` or https://ui.perfetto.dev).\n
+    Disabled by default so phases cost nothing unless profiling is enabled.\n
+    Example use: `with profiler.phase("import_plugins"):`
+    """
+    def __init__(self):
+        self.enabled = False
+        self.events: list[dict] = []
+        self._origin = perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        """Enable profiling. Timestamps are relative to when profiling is enabled."""
+        self.enabled = True
+        self._origin = perf_counter()
+        self.events.clear()
+
+    def _timestamp_us(self, t: float) -> float:
+        return (t - self._origin) * 1_000_000
+
+    def _add_event(self, event: dict):
+        thread = threading.current_thread()
+        event.update({"pid": os.getpid(), "tid": thread.ident, "args": {"thread": thread.name, **event.get("args", {})}})
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def phase(self, name: str, category: str = "startup", **args):
+        """Time a block of code as a named phase.
+
+        Args:
+            name (str): Phase name
+            category (str, optional): Trace category. Defaults to "startup".
+        """
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            end = perf_counter()
+            self._add_event({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": self._timestamp_us(start),
+                "dur": (end - start) * 1_000_000,
+                "args": args
+            })
+
+    def instant(self, name: str, category: str = "startup", **args):
+        """Mark a point in time (e.g., first frame presented).
+
+        Args:
+            name (str): Event name
+            category (str, optional): Trace category. Defaults to "startup".
+        """
+        if not self.enabled:
+            return
+        self._add_event({
+            "name": name,
+            "cat": category,
+            "ph": "i",
+            "s": "p",
+            "ts": self._timestamp_us(perf_counter()),
+            "args": args
+        })
+
+    def summary(self, top: int = 10) -> list[tuple[str, float]]:
+        """Slowest recorded phases.
+
+        Args:
+            top (int, optional): Number of phases to return. Defaults to 10.
+
+        Returns:
+            list[tuple[str, float]]: (phase name, duration in milliseconds)
+        """
+        with self._lock:
+            phases = [(e["name"], e["dur"] / 1_000) for e in self.events if e["ph"] == "X"]
+        return sorted(phases, key=lambda p: p[1], reverse=True)[:top]
+
+    def save(self, path: str):
+        """Write recorded events as a Chrome trace JSON file.
+
+        Args:
+            path (str): Output file path
+        """
+        with self._lock:
+            trace = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        with open(path, "w") as f:
+            json.dump(trace, f, indent=1)
+        print(f"> Saved startup profile: {path}")
+        for name, duration_ms in self.summary():
+            print(f">   {duration_ms:9.1f} ms  {name}")
+
+class FirstFrameProbe():
+    """`Display` frame tap that calls `on_first_frame` the first time anything is drawn to the screen, then removes itself.\n
+    Example use: `display.add_tap(FirstFrameProbe(display, on_first_frame))`
+    """
+    def __init__(self, display, on_first_frame):
+        self._display = display
+        self._on_first_frame = on_first_frame
+
+    def __call__(self, frame, timestamp: float):
+        self._display.remove_tap(self)
+        self._on_first_frame()
+
+def thread_cpu_times() -> dict[str, float]:
+    """CPU time (user + system) used so far by every running thread, e.g. to compare the render and AI threads.
+    Read from `/proc` on Linux. Elsewhere only the calling thread is measured.
+
+    Returns:
+        dict[str, float]: Thread name -> CPU time in seconds
+    """
+    ticks_per_second = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    times = {}
+    for thread in threading.enumerate():
+        try:
+            with open(f"/proc/self/task/{thread.native_id}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split() # thread name may contain spaces
+            times[thread.name] = (int(fields[11]) + int(fields[12])) / ticks_per_second # utime + stime
+        except (OSError, ValueError, IndexError):
+            if thread is threading.current_thread():
+                times[thread.name] = thread_time()
+    return times
+
+# process-wide profiler shared by main and the plugin manager
+profiler = StartupProfiler()
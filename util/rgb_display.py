@@ -0,0 +1,403 @@
+from pathlib import Path
+from threading import Thread
+from datetime import datetime
+from time import perf_counter, thread_time
+from typing import Callable
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+from util.frame_recorder import FrameRecorder
+
+# called with every presented frame and its perf_counter() timestamp. The frame is only valid during the call
+FrameTap = Callable[[np.ndarray, float], None]
+
+class PushStats():
+    """Pixels pushed to the matrix by one owner (e.g., an RGB plugin), for comparing against full frame pushes."""
+    def __init__(self, frame_pixels: int):
+        self.frame_pixels = frame_pixels
+        self.frames = 0
+        self.skipped = 0
+        self.pixels = 0
+        self.elapsed = 0.0 # seconds the owner was drawing
+        self.cpu_time = 0.0 # render thread CPU seconds while the owner was drawing
+
+    def as_dict(self) -> dict:
+        """
+        Returns:
+            dict: Presented and skipped (identical) frames, pixels and bytes pushed, per second rates, pushed pixels as a fraction of pushing every frame in full, and render thread CPU time and utilization
+        """
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "pixels": self.pixels,
+            "bytes": self.pixels * 3,
+            "pixels_per_second": self.pixels / self.elapsed if self.elapsed else 0.0,
+            "bytes_per_second": self.pixels * 3 / self.elapsed if self.elapsed else 0.0,
+            "full_frame_fraction": self.pixels / ((self.frames + self.skipped) * self.frame_pixels) if self.frames + self.skipped else 0.0,
+            "cpu_ms": self.cpu_time * 1_000,
+            "cpu_percent": self.cpu_time / self.elapsed * 100 if self.elapsed else 0.0
+        }
+
+def dirty_rects(new: np.ndarray, old: np.ndarray, max_rects: int = 8, max_fraction: float = .75) -> list[tuple[int, int, int, int]]:
+    """Rectangles covering every pixel that differs between two frames. Each run of consecutive changed rows
+    is one rectangle spanning its changed columns. Falls back to one bounding rectangle if there are more than
+    `max_rects` runs, and to the full frame if the rectangles cover more than `max_fraction` of it.
+
+    Args:
+        new (np.ndarray): `(H, W, 3) uint8` frame
+        old (np.ndarray): `(H, W, 3) uint8` frame
+        max_rects (int, optional): Max rectangles. Defaults to 8.
+        max_fraction (float, optional): Covered fraction of the frame above which the full frame is returned. Defaults to .75.
+
+    Returns:
+        list[tuple[int, int, int, int]]: (y0, y1, x0, x1) rectangles. Empty if the frames are identical.
+    """
+    height, width = new.shape[:2]
+    # compare as (H, W * 3) bytes, reducing over a size 3 color axis is much slower
+    changed = (new != old).reshape(height, -1)
+    rows = np.flatnonzero(changed.any(axis=1))
+    if rows.size == 0:
+        return []
+    starts = [0, *(np.flatnonzero(np.diff(rows) > 1) + 1).tolist()]
+    if len(starts) > max_rects:
+        starts = [0]
+    ends = [*starts[1:], len(rows)]
+    rects = []
+    for start, end in zip(starts, ends):
+        y0, y1 = int(rows[start]), int(rows[end - 1]) + 1
+        cols = np.flatnonzero(changed[y0:y1].any(axis=0))
+        rects.append((y0, y1, int(cols[0]) // 3, int(cols[-1]) // 3 + 1))
+    if sum((y1 - y0) * (x1 - x0) for y0, y1, x0, x1 in rects) > max_fraction * height * width:
+        return [(0, height, 0, width)]
+    return rects
+
+class DisplayCanvas():
+    """Canvas proxy that mirrors everything drawn on a wrapped `rgbmatrix.FrameCanvas` into a numpy
+    shadow buffer, since hardware canvases can't be read back. Created by `Display`, not by plugins.\n
+    Full frames (`SetArray()`, or `SetImage()` of a screen sized image) are diffed against the shadow,
+    and only the changed rectangles are pushed to the canvas.
+    """
+    def __init__(self, canvas, display: "Display"):
+        self._canvas = canvas
+        self._display = display
+        self.shadow = np.zeros((display.height, display.width, 3), dtype=np.uint8)
+        self._staging_image = Image.new("RGB", (display.width, display.height))
+
+    def __getattr__(self, name: str):
+        return getattr(self._canvas, name)
+
+    def SetImage(self, image: Image.Image, offset_x: int = 0, offset_y: int = 0, unsafe: bool = True):
+        if image.mode == "RGB" and image.size == self._staging_image.size and offset_x == 0 and offset_y == 0:
+            self.SetArray(np.asarray(image))
+            return
+        self._canvas.SetImage(image, offset_x, offset_y, unsafe)
+        self._draw(np.asarray(image), offset_x, offset_y)
+
+    def SetArray(self, array: np.ndarray, offset_x: int = 0, offset_y: int = 0):
+        """Draw a `(H, W, 3) uint8` array. Hardware canvases get it through one persistent staging image.
+
+        Args:
+            array (np.ndarray): RGB pixel array
+            offset_x (int, optional): Left offset in pixels. Defaults to 0.
+            offset_y (int, optional): Top offset in pixels. Defaults to 0.
+        """
+        if array.shape == self.shadow.shape and offset_x == 0 and offset_y == 0:
+            self._push(self._canvas, array, max_rects=8)
+            return
+        set_array(self._canvas, array, offset_x, offset_y, self._staging_image)
+        self._draw(array, offset_x, offset_y)
+        self._display.push_stats.pixels += array.shape[0] * array.shape[1]
+
+    def SetPixel(self, x: int, y: int, red: int, green: int, blue: int):
+        self._canvas.SetPixel(x, y, red, green, blue)
+        self._set_pixel(x, y, red, green, blue)
+        self._display.push_stats.pixels += 1
+
+    def Fill(self, red: int, green: int, blue: int):
+        self._canvas.Fill(red, green, blue)
+        self.shadow[:] = (red, green, blue)
+        self._display.push_stats.pixels += self.shadow.shape[0] * self.shadow.shape[1]
+
+    def Clear(self):
+        self._canvas.Clear()
+        self.shadow.fill(0)
+        self._display.push_stats.pixels += self.shadow.shape[0] * self.shadow.shape[1]
+
+    def _push(self, target, frame: np.ndarray, max_rects: int):
+        """Push only the pixels of a full frame that differ from the shadow to `target` (this canvas, or the matrix when drawing on screen)."""
+        rects = dirty_rects(frame, self.shadow, max_rects)
+        for y0, y1, x0, x1 in rects:
+            set_array(target, frame[y0:y1, x0:x1], x0, y0, self._staging_image)
+            self.shadow[y0:y1, x0:x1] = frame[y0:y1, x0:x1]
+            self._display.push_stats.pixels += (y1 - y0) * (x1 - x0)
+
+    def _draw(self, array: np.ndarray, offset_x: int, offset_y: int):
+        """Copy pixels into the shadow buffer, clipped to the canvas."""
+        height, width = self.shadow.shape[:2]
+        h, w = array.shape[:2]
+        x0, y0 = max(offset_x, 0), max(offset_y, 0)
+        x1, y1 = min(offset_x + w, width), min(offset_y + h, height)
+        if x0 < x1 and y0 < y1:
+            self.shadow[y0:y1, x0:x1] = array[y0 - offset_y:y1 - offset_y, x0 - offset_x:x1 - offset_x, :3]
+
+    def _set_pixel(self, x: int, y: int, red: int, green: int, blue: int):
+        if 0 <= x < self.shadow.shape[1] and 0 <= y < self.shadow.shape[0]:
+            self.shadow[y, x] = (red, green, blue)
+
+SET_PIXEL_MAX = 64 # arrays up to this many pixels are drawn with SetPixel() on rgbmatrix, cheaper than building an image
+
+def set_array(canvas, array: np.ndarray, offset_x: int, offset_y: int, staging_image: Image.Image):
+    """Draw a `(H, W, 3) uint8` array on a canvas or matrix, through `staging_image` if it only takes PIL images (rgbmatrix)."""
+    if hasattr(canvas, "SetArray"):
+        canvas.SetArray(array, offset_x, offset_y)
+    elif array.shape[0] * array.shape[1] <= SET_PIXEL_MAX:
+        width = array.shape[1]
+        for i, (red, green, blue) in enumerate(array[..., :3].reshape(-1, 3).tolist()):
+            canvas.SetPixel(offset_x + i % width, offset_y + i // width, red, green, blue)
+    elif array.shape[:2] == (staging_image.height, staging_image.width) and array.shape[2] == 3 and array.flags.c_contiguous:
+        staging_image.frombytes(array.data)
+        canvas.SetImage(staging_image, offset_x, offset_y)
+    else:
+        canvas.SetImage(Image.fromarray(np.ascontiguousarray(array[..., :3])), offset_x, offset_y)
+
+class Display():
+    """Matrix proxy that knows what is on screen. Every canvas is wrapped in a `DisplayCanvas`, and each
+    presented frame (a swap, or drawing on the matrix directly) is passed to the registered frame taps.
+    Only changed pixels are pushed to the matrix, and swapping in a canvas identical to the screen is skipped.
+    Pushed pixels are counted per owner (see `owner()`). All other attribute access is forwarded to the wrapped matrix.\n
+    Example use: `matrix = Display(RGBMatrix(options=options)); matrix.add_tap(ReplayBuffer(64, 64))`
+    """
+    def __init__(self, matrix):
+        self._matrix = matrix
+        self.width = matrix.width
+        self.height = matrix.height
+        self.taps: list[FrameTap] = []
+        self.stats: dict[str, PushStats] = {}
+        self.push_stats = self._owner_stats("startup")
+        self._staging_image = Image.new("RGB", (self.width, self.height))
+        # the matrix draws into whichever canvas is on screen. The initial canvas is internal to the matrix
+        # until the first swap hands it back
+        self._active = DisplayCanvas(None, self)
+
+    def __getattr__(self, name: str):
+        return getattr(self._matrix, name)
+
+    def _owner_stats(self, name: str) -> PushStats:
+        if name not in self.stats:
+            self.stats[name] = PushStats(self.width * self.height)
+        return self.stats[name]
+
+    @contextmanager
+    def owner(self, name: str):
+        """Count pushed pixels and render thread CPU time for `name` (e.g., an RGB plugin) while drawing in this block (see `get_push_stats()`).
+
+        Args:
+            name (str): Owner name
+        """
+        previous = self.push_stats
+        self.push_stats = self._owner_stats(name)
+        start, cpu_start = perf_counter(), thread_time()
+        try:
+            yield self.push_stats
+        finally:
+            self.push_stats.elapsed += perf_counter() - start
+            self.push_stats.cpu_time += thread_time() - cpu_start
+            self.push_stats = previous
+
+    def get_push_stats(self) -> dict:
+        """Pushed pixels and render time of every owner so far.
+
+        Returns:
+            dict: `PushStats.as_dict()` by owner name
+        """
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def add_tap(self, tap: FrameTap):
+        """Call `tap(frame, timestamp)` for every presented frame, on the thread presenting it. Taps must be fast.
+
+        Args:
+            tap (FrameTap): Frame tap
+        """
+        self.taps = [*self.taps, tap]
+
+    def remove_tap(self, tap: FrameTap):
+        """Stop calling a frame tap.
+
+        Args:
+            tap (FrameTap): Frame tap
+        """
+        self.taps = [t for t in self.taps if t is not tap]
+
+    def screen(self) -> np.ndarray:
+        """Frame currently on screen. Only valid until the next frame is presented.
+
+        Returns:
+            np.ndarray: `(H, W, 3) uint8` frame
+        """
+        return self._active.shadow
+
+    def _present(self):
+        self.push_stats.frames += 1
+        frame = self._active.shadow
+        timestamp = perf_counter()
+        for tap in self.taps:
+            tap(frame, timestamp)
+
+    def CreateFrameCanvas(self) -> DisplayCanvas:
+        return DisplayCanvas(self._matrix.CreateFrameCanvas(), self)
+
+    def SwapOnVSync(self, canvas: DisplayCanvas, framerate_fraction: int = 1) -> DisplayCanvas:
+        """Put a canvas on screen. The previously displayed canvas is returned so it can be reused as the next offscreen canvas.
+        If the canvas is identical to the screen, nothing is swapped and the canvas itself is returned.
+
+        Args:
+            canvas (DisplayCanvas): Canvas from `CreateFrameCanvas()`
+            framerate_fraction (int, optional): Display the canvas for this many refreshes. Defaults to 1.
+
+        Returns:
+            DisplayCanvas: Previously displayed canvas
+        """
+        if canvas is not self._active and np.array_equal(canvas.shadow, self._active.shadow):
+            self.push_stats.skipped += 1
+            return canvas
+        previous = self._active
+        previous_canvas = self._matrix.SwapOnVSync(canvas._canvas, framerate_fraction)
+        if previous._canvas is None:
+            previous._canvas = previous_canvas
+        self._active = canvas
+        self._present()
+        return previous
+
+    # drawing on the matrix draws on the canvas on screen
+    def SetImage(self, image: Image.Image, offset_x: int = 0, offset_y: int = 0, unsafe: bool = True):
+        if image.mode == "RGB" and image.size == (self.width, self.height) and offset_x == 0 and offset_y == 0:
+            self.SetArray(np.asarray(image))
+            return
+        self._matrix.SetImage(image, offset_x, offset_y, unsafe)
+        self._active._draw(np.asarray(image), offset_x, offset_y)
+        self.push_stats.pixels += image.width * image.height
+        self._present()
+
+    def SetArray(self, array: np.ndarray, offset_x: int = 0, offset_y: int = 0):
+        if array.shape == self._active.shadow.shape and offset_x == 0 and offset_y == 0:
+            if np.array_equal(array, self._active.shadow):
+                self.push_stats.skipped += 1
+                return
+            # one rectangle, since each draw on the matrix shows on screen right away
+            self._active._push(self._matrix, array, max_rects=1)
+        else:
+            set_array(self._matrix, array, offset_x, offset_y, self._staging_image)
+            self._active._draw(array, offset_x, offset_y)
+            self.push_stats.pixels += array.shape[0] * array.shape[1]
+        self._present()
+
+    def SetPixel(self, x: int, y: int, red: int, green: int, blue: int):
+        self._matrix.SetPixel(x, y, red, green, blue)
+        self._active._set_pixel(x, y, red, green, blue)
+        self.push_stats.pixels += 1
+        self._present()
+
+    def Fill(self, red: int, green: int, blue: int):
+        self._matrix.Fill(red, green, blue)
+        self._active.shadow[:] = (red, green, blue)
+        self.push_stats.pixels += self.width * self.height
+        self._present()
+
+    def Clear(self):
+        self._matrix.Clear()
+        self._active.shadow.fill(0)
+        self.push_stats.pixels += self.width * self.height
+        self._present()
+
+class ReplayBuffer():
+    """Instant replay of the last `seconds` of presented frames. A `Display` frame tap.\n
+    All memory is allocated up front as a ring of `seconds * fps` frames, and recording a frame is one copy
+    into the next slot. Frames presented faster than `fps` overwrite the newest slot instead of advancing,
+    so the ring always spans `seconds`. `save()` copies the ring without locking, so rendering never waits on it.\n
+    Example use: `display.add_tap(replay := ReplayBuffer(64, 64)); replay.save(path / "replay.gif")`
+    """
+    def __init__(self, width: int, height: int, seconds: float = 10, fps: float = 30):
+        """
+        Args:
+            width (int): Frame width
+            height (int): Frame height
+            seconds (float, optional): Replay length in seconds. Defaults to 10.
+            fps (float, optional): Max recorded frames per second. Defaults to 30.
+        """
+        self.capacity = max(int(seconds * fps), 1)
+        self.interval = 1 / fps
+        self.frames = np.zeros((self.capacity, height, width, 3), dtype=np.uint8)
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        # write sequence number per slot (0 = empty). A slot is stable while its number doesn't change
+        self.sequence = np.zeros(self.capacity, dtype=np.int64)
+        self.writes = 0
+        self.slot = -1
+        self.last_advance = float("-inf")
+
+    @property
+    def size_bytes(self) -> int:
+        return self.frames.nbytes + self.timestamps.nbytes + self.sequence.nbytes
+
+    def __call__(self, frame: np.ndarray, timestamp: float):
+        """Record a presented frame.
+
+        Args:
+            frame (np.ndarray): `(H, W, 3) uint8` frame
+            timestamp (float): `perf_counter()` time the frame was presented
+        """
+        if timestamp - self.last_advance >= self.interval:
+            self.slot = (self.slot + 1) % self.capacity
+            self.last_advance = timestamp
+        self.writes += 1
+        self.sequence[self.slot] = 0 # mark slot as being written
+        np.copyto(self.frames[self.slot], frame)
+        self.timestamps[self.slot] = timestamp
+        self.sequence[self.slot] = self.writes
+
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        """Copy the recorded frames, oldest first. Frames overwritten during the copy are left out.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: `(N, H, W, 3) uint8` frames and their `(N,)` timestamps
+        """
+        sequence = self.sequence.copy()
+        frames = self.frames.copy()
+        timestamps = self.timestamps.copy()
+        stable = (sequence > 0) & (sequence == self.sequence)
+        order = np.argsort(sequence[stable])
+        return frames[stable][order], timestamps[stable][order]
+
+    def save(self, path: str | Path) -> Thread:
+        """Save the replay as a GIF or MP4 in a background thread, with each frame shown for as long as it was on screen.
+
+        Args:
+            path (str | Path): Output path (`.gif` or `.mp4`)
+
+        Returns:
+            Thread: Thread writing the file
+        """
+        def write():
+            frames, timestamps = self.snapshot()
+            durations_ms = np.diff(timestamps, append=perf_counter()) * 1_000
+            with FrameRecorder(path, duration_ms=self.interval * 1_000) as recorder:
+                for frame, duration_ms in zip(frames, durations_ms):
+                    recorder.add_frame(frame, block=True, duration_ms=max(duration_ms, 10))
+        thread = Thread(name="save_replay", target=write, daemon=True)
+        thread.start()
+        return thread
+
+    def save_to(self, base_path: Path, filename: str = "replay", suffix: str = ".gif") -> Thread:
+        """Save the replay under `base_path/response/<date>/`, same as plugin recordings.
+
+        Args:
+            base_path (Path): Replay output base path
+            filename (str, optional): Replay output filename. Defaults to "replay".
+            suffix (str, optional): Replay format, ".gif" or ".mp4". Defaults to ".gif".
+
+        Returns:
+            Thread: Thread writing the file
+        """
+        d = datetime.now()
+        return self.save(base_path / f"response/{d.strftime('%Y-%m-%d')}/{filename}_{d.strftime('%I-%M-%S%p')}{suffix}")
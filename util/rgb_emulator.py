@@ -0,0 +1,141 @@
+from time import perf_counter
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+class EmulatorCanvas():
+    """In-memory stand-in for `rgbmatrix.FrameCanvas` backed by a numpy framebuffer.
+    Implements the subset of the canvas API used by RGB plugins.
+    """
+    def __init__(self, width: int = 64, height: int = 64):
+        self.width = width
+        self.height = height
+        self.brightness = 100
+        self.framebuffer = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def SetImage(self, image: Image.Image, offset_x: int = 0, offset_y: int = 0, unsafe: bool = True):
+        """Draw an RGB image onto the canvas at the given offset. Pixels outside the canvas are clipped.
+
+        Args:
+            image (Image.Image): RGB image
+            offset_x (int, optional): Left offset in pixels. Defaults to 0.
+            offset_y (int, optional): Top offset in pixels. Defaults to 0.
+            unsafe (bool, optional): Unused, kept for API compatibility. Defaults to True.
+
+        Raises:
+            Exception: Image is not in RGB mode (same as rgbmatrix)
+        """
+        if image.mode != "RGB":
+            raise Exception("Currently, only RGB mode is supported for SetImage(). Please create images with mode 'RGB' or convert first with image = image.convert('RGB').")
+        self.SetArray(np.asarray(image), offset_x, offset_y)
+
+    def SetArray(self, array: np.ndarray, offset_x: int = 0, offset_y: int = 0):
+        """Draw a `(H, W, 3) uint8` array onto the canvas at the given offset. Emulator-only fast path.
+
+        Args:
+            array (np.ndarray): RGB pixel array
+            offset_x (int, optional): Left offset in pixels. Defaults to 0.
+            offset_y (int, optional): Top offset in pixels. Defaults to 0.
+        """
+        h, w = array.shape[:2]
+        x0, y0 = max(offset_x, 0), max(offset_y, 0)
+        x1, y1 = min(offset_x + w, self.width), min(offset_y + h, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        self.framebuffer[y0:y1, x0:x1] = array[y0 - offset_y:y1 - offset_y, x0 - offset_x:x1 - offset_x, :3]
+
+    def SetPixel(self, x: int, y: int, red: int, green: int, blue: int):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.framebuffer[y, x] = (red, green, blue)
+
+    def Fill(self, red: int, green: int, blue: int):
+        self.framebuffer[:] = (red, green, blue)
+
+    def Clear(self):
+        self.framebuffer.fill(0)
+
+class EmulatorMatrix(EmulatorCanvas):
+    """Headless stand-in for `rgbmatrix.RGBMatrix`. Drawing on the matrix directly or swapping in a
+    canvas with `SwapOnVSync()` counts as a presented frame and is timestamped with `perf_counter()`.\n
+    Example use: `matrix = EmulatorMatrix(64, 64)`
+    """
+    def __init__(self, width: int = 64, height: int = 64, max_frame_history: int = 10_000):
+        super().__init__(width, height)
+        self.frames_presented = 0
+        self.frame_times: deque[float] = deque(maxlen=max_frame_history)
+        # the matrix draws into whichever canvas is currently on screen
+        self._active_canvas = EmulatorCanvas(width, height)
+        self.framebuffer = self._active_canvas.framebuffer
+
+    def _present(self):
+        self.frames_presented += 1
+        self.frame_times.append(perf_counter())
+
+    def SetImage(self, image: Image.Image, offset_x: int = 0, offset_y: int = 0, unsafe: bool = True):
+        self._active_canvas.SetImage(image, offset_x, offset_y, unsafe)
+        self._present()
+
+    def SetArray(self, array: np.ndarray, offset_x: int = 0, offset_y: int = 0):
+        self._active_canvas.SetArray(array, offset_x, offset_y)
+        self._present()
+
+    def SetPixel(self, x: int, y: int, red: int, green: int, blue: int):
+        self._active_canvas.SetPixel(x, y, red, green, blue)
+        self._present()
+
+    def Fill(self, red: int, green: int, blue: int):
+        self._active_canvas.Fill(red, green, blue)
+        self._present()
+
+    def Clear(self):
+        self._active_canvas.Clear()
+        self._present()
+
+    def CreateFrameCanvas(self) -> EmulatorCanvas:
+        """Create an offscreen canvas to draw on before swapping it onto the screen.
+
+        Returns:
+            EmulatorCanvas: Offscreen canvas
+        """
+        return EmulatorCanvas(self.width, self.height)
+
+    def SwapOnVSync(self, canvas: EmulatorCanvas, framerate_fraction: int = 1) -> EmulatorCanvas:
+        """Put a canvas on screen. Same as rgbmatrix, the previously displayed canvas is returned
+        so it can be reused as the next offscreen canvas.
+
+        Args:
+            canvas (EmulatorCanvas): Canvas to display
+            framerate_fraction (int, optional): Unused, kept for API compatibility. Defaults to 1.
+
+        Returns:
+            EmulatorCanvas: Previously displayed canvas
+        """
+        previous = self._active_canvas
+        self._active_canvas = canvas
+        self.framebuffer = canvas.framebuffer
+        self._present()
+        return previous
+
+    def snapshot(self) -> np.ndarray:
+        """Copy of the frame currently on screen.
+
+        Returns:
+            np.ndarray: `(H, W, 3) uint8` frame
+        """
+        return self.framebuffer.copy()
+
+    def get_frame_stats(self) -> dict:
+        """Summarize presented frame timing over the recorded frame history.
+
+        Returns:
+            dict: Frame count, average fps, and mean/max frame interval in milliseconds
+        """
+        stats = {"frames": self.frames_presented, "fps": 0.0, "mean_interval_ms": 0.0, "max_interval_ms": 0.0}
+        if len(self.frame_times) > 1:
+            intervals = np.diff(np.fromiter(self.frame_times, dtype=np.float64))
+            mean_interval = float(intervals.mean())
+            stats["fps"] = 1 / mean_interval if mean_interval else 0.0
+            stats["mean_interval_ms"] = mean_interval * 1_000
+            stats["max_interval_ms"] = float(intervals.max()) * 1_000
+        return stats
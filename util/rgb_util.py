@@ -1,42 +1,223 @@
+import re
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+PALETTES_PATH = Path(__file__).parents[1] / "assets/palettes"
+
+class Palette():
+    """Color palette backed by a `(N, 3) uint8` numpy array.\n
+    Renders indexed frames (index array -> RGB) with a single `take`, and quantizes images to the
+    nearest palette color through a precomputed 3D lookup table.\n
+    Example use: `get_palette("pico-8").render(indices, out=framebuffer)`
+    """
+    LUT_BITS = 5 # bits per channel in the quantization LUT (32x32x32 entries)
+
+    def __init__(self, name: str, colors: list[tuple[int, int, int]] | np.ndarray):
+        """
+        Args:
+            name (str): Palette name (e.g., Lospec palette slug)
+            colors (list[tuple[int, int, int]] | np.ndarray): RGB colors
+        """
+        self.name = name
+        self.colors = np.array(colors, dtype=np.uint8).reshape(-1, 3)
+        self.colors.flags.writeable = False
+        self._color_tuples = [tuple(int(c) for c in color) for color in self.colors]
+        self._lut: np.ndarray = None
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    def color(self, select_color: int = 0) -> tuple[int, int, int]:
+        """Get one palette color. Indexes past the end return the last color.
+
+        Args:
+            select_color (int, optional): Color index. Defaults to 0.
+
+        Returns:
+            tuple[int, int, int]: RGB color
+        """
+        return self._color_tuples[min(select_color, len(self._color_tuples) - 1)]
+
+    def render(self, indices: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Convert an indexed frame to RGB. Indexes past the end use the last color.
+
+        Args:
+            indices (np.ndarray): `(H, W)` color indexes
+            out (np.ndarray, optional): `(H, W, 3) uint8` array to write into (e.g., a framebuffer). Defaults to None.
+
+        Returns:
+            np.ndarray: `(H, W, 3) uint8` frame
+        """
+        return np.take(self.colors, indices, axis=0, out=out, mode="clip")
+
+    def _build_lut(self) -> np.ndarray:
+        """Nearest palette color index for the center of every LUT cell."""
+        levels = 1 << self.LUT_BITS
+        step = 256 // levels
+        centers = np.arange(levels, dtype=np.int32) * step + step // 2
+        grid = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1).reshape(-1, 1, 3)
+        colors = self.colors.astype(np.int32)[None]
+        lut = np.empty(len(grid), dtype=np.uint8 if len(self.colors) <= 256 else np.uint16)
+        # chunked so large palettes don't need a (cells, colors, 3) array all at once
+        for start in range(0, len(grid), 4096):
+            distances = ((grid[start:start + 4096] - colors) ** 2).sum(axis=-1)
+            lut[start:start + 4096] = distances.argmin(axis=-1)
+        return lut.reshape(levels, levels, levels)
+
+    def quantize_indices(self, frame: np.ndarray) -> np.ndarray:
+        """Nearest palette color index for every pixel.
+
+        Args:
+            frame (np.ndarray): `(H, W, 3) uint8` RGB frame
+
+        Returns:
+            np.ndarray: `(H, W)` color indexes
+        """
+        if self._lut is None:
+            self._lut = self._build_lut()
+        shift = 8 - self.LUT_BITS
+        return self._lut[frame[..., 0] >> shift, frame[..., 1] >> shift, frame[..., 2] >> shift]
+
+    def quantize(self, image: Image.Image | np.ndarray) -> Image.Image | np.ndarray:
+        """Replace every pixel with its nearest palette color.
+
+        Args:
+            image (Image.Image | np.ndarray): Image or `(H, W, 3) uint8` RGB frame
+
+        Returns:
+            Image.Image | np.ndarray: Quantized image, same type as input
+        """
+        if isinstance(image, Image.Image):
+            rgb = np.asarray(image.convert("RGB"))
+            quantized = Image.fromarray(self.render(self.quantize_indices(rgb)))
+            if "A" in image.getbands():
+                quantized.putalpha(image.getchannel("A"))
+            return quantized
+        return self.render(self.quantize_indices(image))
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "Palette":
+        """Load a palette file in a Lospec download format: `.hex`, `.gpl` (GIMP), or `.txt` (Paint.NET).
+        The palette is named after the file (e.g., `pico-8.hex` -> "pico-8").
+
+        Args:
+            path (str | Path): Palette file path
+
+        Raises:
+            ValueError: Unsupported file type or no colors found
+
+        Returns:
+            Palette: Loaded palette
+        """
+        path = Path(path)
+        colors = []
+        with open(path, "r") as f:
+            lines = [line.strip() for line in f.readlines()]
+        if path.suffix == ".hex":
+            # RRGGBB per line
+            colors = [bytes.fromhex(line[-6:]) for line in lines if re.fullmatch(r"#?[0-9a-fA-F]{6}", line)]
+        elif path.suffix == ".gpl":
+            # header lines, then "R G B name" per line
+            for line in lines:
+                match = re.match(r"(\d+)\s+(\d+)\s+(\d+)", line)
+                if match:
+                    colors.append(tuple(int(c) for c in match.groups()))
+        elif path.suffix == ".txt":
+            # ";" comments, then AARRGGBB per line
+            colors = [bytes.fromhex(line[-6:]) for line in lines if re.fullmatch(r"[0-9a-fA-F]{8}", line)]
+        else:
+            raise ValueError(f"Unsupported palette file type: {path}")
+        if not colors:
+            raise ValueError(f"No colors found in palette file: {path}")
+        return cls(path.stem.lower(), [tuple(c) for c in colors])
+
+####################
+# PALETTE REGISTRY #
+####################
+
+PALETTES: dict[str, Palette] = {}
+
+def register_palette(palette: Palette) -> Palette:
+    """Add a palette to the registry, replacing any palette with the same name.
+
+    Args:
+        palette (Palette): Palette
+
+    Returns:
+        Palette: Registered palette
+    """
+    PALETTES[palette.name] = palette
+    return palette
+
+def load_palettes(path: str | Path = PALETTES_PATH) -> list[Palette]:
+    """Register every Lospec palette file (`.hex`, `.gpl`, `.txt`) in a directory.
+
+    Args:
+        path (str | Path, optional): Palette directory. Defaults to `assets/palettes`.
+
+    Returns:
+        list[Palette]: Registered palettes
+    """
+    palettes = []
+    for file in sorted(Path(path).glob("*")):
+        if file.suffix in {".hex", ".gpl", ".txt"}:
+            try:
+                palettes.append(register_palette(Palette.from_file(file)))
+            except (OSError, ValueError) as e:
+                print(f"> Failed to load palette {file}: {e}")
+    return palettes
+
+def get_palette(name: str) -> Palette:
+    """Get a registered palette by name. Palette files in `assets/palettes` are registered on first use.
+
+    Args:
+        name (str): Palette name (e.g., "pico-8")
+
+    Raises:
+        KeyError: Palette not found
+
+    Returns:
+        Palette: Palette
+    """
+    if name not in PALETTES:
+        load_palettes()
+    return PALETTES[name]
+
+# LOSPEC: FUNKYFUTURE 8 PALETTE
+FUNKYFUTURE_8 = register_palette(Palette("funkyfuture-8", [
+    (43, 15, 84),
+    (171, 31, 101),
+    (255, 79, 105),
+    (255, 247, 248),
+    (255, 129, 66),
+    (255, 218, 69),
+    (51, 104, 220),
+    (73, 231, 236),
+]))
+
+# LOSPEC: SODA-CAP PALETTE
+SODA_CAP = register_palette(Palette("soda-cap", [
+    (33, 118, 204),
+    (255, 125, 110),
+    (252, 166, 172),
+    (232, 231, 203),
+]))
+
+# LOSPEC: MOONLIGHT GB PALETTE
+MOONLIGHT_GB = register_palette(Palette("moonlight-gb", [
+    (15, 5, 45),
+    (32, 54, 113),
+    (54, 134, 143),
+    (95, 199, 93),
+]))
+
 def get_color_from_funkyfuture_palette(select_color: int = 0) -> tuple[int, int, int]:
-    # LOSPEC: FUNKYFUTURE 8 PALETTE
-    color = [
-        (43, 15, 84),
-        (171, 31, 101),
-        (255, 79, 105),
-        (255, 247, 248),
-        (255, 129, 66),
-        (255, 218, 69),
-        (51, 104, 220),
-        (73, 231, 236),
-    ]
-    if select_color >= len(color):
-        return color[len(color) - 1]
-    else:
-        return color[select_color]
+    return FUNKYFUTURE_8.color(select_color)
 
 def get_color_from_sodacap_palette(select_color: int = 0) -> tuple[int, int, int]:
-    # LOSPEC: SODA-CAP PALETTE
-    color = [
-        (33, 118, 204),
-        (255, 125, 110),
-        (252, 166, 172),
-        (232, 231, 203),
-    ]
-    if select_color >= len(color):
-        return color[len(color) - 1]
-    else:
-        return color[select_color]
-    
+    return SODA_CAP.color(select_color)
+
 def get_color_from_moonlightgb_palette(select_color: int = 0) -> tuple[int, int, int]:
-    # LOSPEC: MOONLIGHT GB PALETTE
-    color = [
-        (15, 5, 45),
-        (32, 54, 113),
-        (54, 134, 143),
-        (95, 199, 93),
-    ]
-    if select_color >= len(color):
-        return color[len(color) - 1]
-    else:
-        return color[select_color]
\ No newline at end of file
+    return MOONLIGHT_GB.color(select_color)
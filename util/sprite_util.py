@@ -0,0 +1,110 @@
+import numpy as np
+
+class Sprite():
+    """Sprite compiled once into an RGBA stamp, then drawn many times per frame with `blit()`.\n
+    Only opaque pixels (alpha > 0) are drawn. Their offsets and colors are precomputed so placing
+    N sprites is a handful of array operations instead of a per-pixel loop.\n
+    Example use: `Sprite.from_mask(7, 6, transparent_pixels).blit(framebuffer, positions, colors)`
+    """
+    PACKED_MIN_PIXELS = 2048 # batches with at least this many pixels are drawn as packed 32bit pixels
+    def __init__(self, rgba: np.ndarray):
+        """
+        Args:
+            rgba (np.ndarray): `(H, W, 4) uint8` stamp
+        """
+        self.rgba = rgba
+        self.height, self.width = rgba.shape[:2]
+        ys, xs = np.nonzero(rgba[..., 3])
+        self.offset_y = ys.astype(np.intp)
+        self.offset_x = xs.astype(np.intp)
+        self.rgb = rgba[ys, xs, :3]
+        self.packed_rgb = pack_rgb(self.rgb)
+
+    @classmethod
+    def from_mask(cls, width: int, height: int, transparent_pixels: list[tuple[int, int]], color: tuple[int, int, int] = (255, 255, 255)) -> "Sprite":
+        """Compile a single color sprite. Meant to be drawn with per-sprite `colors`.
+
+        Args:
+            width (int): Sprite width
+            height (int): Sprite height
+            transparent_pixels (list[tuple[int, int]]): (x, y) pixels that aren't drawn
+            color (tuple[int, int, int], optional): Sprite color. Defaults to (255, 255, 255).
+
+        Returns:
+            Sprite: Compiled sprite
+        """
+        rgba = np.zeros((height, width, 4), dtype=np.uint8)
+        rgba[...] = (*color, 255)
+        for x, y in transparent_pixels:
+            rgba[y, x, 3] = 0
+        return cls(rgba)
+
+    @classmethod
+    def from_features(cls, width: int, height: int, features: list[tuple[tuple[int, int, int] | None, list[tuple[int, int]]]], fill_color: tuple[int, int, int]) -> "Sprite":
+        """Compile a multi-color sprite from colored pixel lists. Pixels not in any list use `fill_color`.
+
+        Args:
+            width (int): Sprite width
+            height (int): Sprite height
+            features (list[tuple[tuple[int, int, int] | None, list[tuple[int, int]]]]): (color, (x, y) pixels). A color of None is transparent.
+            fill_color (tuple[int, int, int]): Color of remaining pixels
+
+        Returns:
+            Sprite: Compiled sprite
+        """
+        rgba = np.zeros((height, width, 4), dtype=np.uint8)
+        rgba[...] = (*fill_color, 255)
+        # first listed feature wins if pixels overlap
+        for color, pixels in reversed(features):
+            for x, y in pixels:
+                rgba[y, x] = (0, 0, 0, 0) if color is None else (*color, 255)
+        return cls(rgba)
+
+    def blit(self, framebuffer: np.ndarray, positions: np.ndarray, colors: np.ndarray = None):
+        """Draw the sprite at every position in one batch. Pixels outside the framebuffer are clipped,
+        and where sprites overlap the later position is drawn on top.
+
+        Args:
+            framebuffer (np.ndarray): Contiguous `(H, W, 3) uint8` frame to draw on
+            positions (np.ndarray): `(N, 2)` top left (x, y) of each sprite
+            colors (np.ndarray, optional): `(N, 3)` color per sprite, replacing the sprite's own colors. Defaults to None.
+        """
+        positions = np.asarray(positions, dtype=np.intp).reshape(-1, 2)
+        height, width = framebuffer.shape[:2]
+        pixels = positions[:, 1, None] * width + positions[:, 0, None] + (self.offset_y * width + self.offset_x) # (N, pixels) flat pixel index
+        # only pay for clipping if a sprite crosses the framebuffer edge
+        in_bounds = positions.size == 0 or (
+            positions[:, 0].min() >= 0 and positions[:, 1].min() >= 0 and
+            positions[:, 0].max() + self.width <= width and positions[:, 1].max() + self.height <= height
+        )
+        visible = ... # every pixel
+        if not in_bounds:
+            ys = positions[:, 1, None] + self.offset_y
+            xs = positions[:, 0, None] + self.offset_x
+            visible = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+        if pixels.size < self.PACKED_MIN_PIXELS:
+            # small batch: assign (pixels, 3) rows directly
+            rgb = self.rgb if colors is None else np.asarray(colors, dtype=np.uint8).reshape(-1, 1, 3)
+            framebuffer.reshape(-1, 3)[pixels[visible]] = np.broadcast_to(rgb, (*pixels.shape, 3))[visible]
+            return
+        # large batch: scatter whole pixels as packed 32bit values, much faster than assigning (pixels, 3) rows
+        packed_colors = self.packed_rgb if colors is None else pack_rgb(colors)[:, None]
+        packed = np.empty((height, width), dtype=np.uint32)
+        packed_view = packed.view(np.uint8).reshape(height, width, 4)
+        packed_view[..., :3] = framebuffer
+        packed.reshape(-1)[pixels[visible]] = np.broadcast_to(packed_colors, pixels.shape)[visible]
+        framebuffer[...] = packed_view[..., :3]
+
+def pack_rgb(colors: np.ndarray) -> np.ndarray:
+    """Pack RGB colors into native byte order 32bit values, so a whole pixel is one array element.
+
+    Args:
+        colors (np.ndarray): `(..., 3) uint8` colors
+
+    Returns:
+        np.ndarray: `(...) uint32` packed colors
+    """
+    colors = np.asarray(colors, dtype=np.uint8)
+    rgbx = np.zeros((*colors.shape[:-1], 4), dtype=np.uint8)
+    rgbx[..., :3] = colors
+    return rgbx.view(np.uint32)[..., 0]
@@ -0,0 +1,165 @@
+from threading import Event, Lock, Condition
+from queue import Queue, Empty
+from collections import deque
+from time import perf_counter, monotonic
+from typing import Callable
+
+import numpy as np
+
+def summarize_ms(name: str, samples: deque[float]) -> dict:
+    """Median, 95th percentile and max of millisecond samples.
+
+    Args:
+        name (str): Stat name prefix (e.g., "latency")
+        samples (deque[float]): Samples in milliseconds
+
+    Returns:
+        dict: `{name}_p50_ms`, `{name}_p95_ms` and `{name}_max_ms`. 0 if there are no samples.
+    """
+    values = np.fromiter(samples, dtype=np.float64) if samples else np.zeros(1)
+    return {
+        f"{name}_p50_ms": float(np.percentile(values, 50)),
+        f"{name}_p95_ms": float(np.percentile(values, 95)),
+        f"{name}_max_ms": float(values.max())
+    }
+
+class WakeEvent(Event):
+    """`threading.Event` that also wakes threads waiting on a subscribed condition when set,
+    so a consumer can sleep on "new result OR end event" with no polling.\n
+    Example use: `ai_end_event = WakeEvent()`
+    """
+    def __init__(self):
+        super().__init__()
+        self._subscribers_lock = Lock()
+        self._subscribers: list[Condition] = []
+
+    def subscribe(self, condition: Condition):
+        """Notify `condition` whenever the event is set.
+
+        Args:
+            condition (Condition): Condition to notify
+        """
+        with self._subscribers_lock:
+            self._subscribers.append(condition)
+
+    def unsubscribe(self, condition: Condition):
+        """Stop notifying `condition`.
+
+        Args:
+            condition (Condition): Subscribed condition
+        """
+        with self._subscribers_lock:
+            self._subscribers.remove(condition)
+
+    def set(self):
+        super().set()
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for condition in subscribers:
+            with condition:
+                condition.notify_all()
+
+def wait_for(condition: Condition, ready: Callable[[], bool], end_event: Event, timeout: float = None, poll: float = .25) -> bool:
+    """Wait on `condition` (held by the caller) until `ready()`, `end_event` is set, or `timeout` passes.
+
+    Args:
+        condition (Condition): Condition notified when `ready()` may have changed. Must be held by the caller.
+        ready (Callable[[], bool]): Checked with the condition held
+        end_event (Event): End event. A `WakeEvent` wakes the wait immediately, a plain `Event` is checked every `poll` seconds.
+        timeout (float, optional): Max wait in seconds. Defaults to None (no limit).
+        poll (float, optional): Seconds between end event checks for a plain `Event`. Defaults to .25.
+
+    Returns:
+        bool: `ready()`
+    """
+    deadline = None if timeout is None else monotonic() + timeout
+    wakes = isinstance(end_event, WakeEvent)
+    if wakes:
+        end_event.subscribe(condition)
+    try:
+        while not ready() and not end_event.is_set():
+            remaining = None if deadline is None else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            if not wakes:
+                remaining = poll if remaining is None else min(remaining, poll)
+            condition.wait(remaining)
+        return bool(ready())
+    finally:
+        if wakes:
+            end_event.unsubscribe(condition)
+
+class ResultQueue(Queue):
+    """Queue of AI/game results for RGB plugins. `get_until()` sleeps until a result is put or an end event is set,
+    instead of polling `empty()`. Every item is timestamped on `put()`, so the time from `put()` to the first
+    pixel showing the result can be measured (see `on_frame()`).\n
+    Example use: `path = ai_result_queue.get_until(ai_end_event)`
+    """
+    POLL = .25 # seconds between end event checks, only for plain `threading.Event`s
+    LATENCY_HISTORY = 1_000
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self.got_put_time: float = None # put() time of the last result taken, until it is presented
+        self.wait_ms: deque[float] = deque(maxlen=self.LATENCY_HISTORY) # put() -> get()
+        self.latency_ms: deque[float] = deque(maxlen=self.LATENCY_HISTORY) # put() -> first presented frame
+
+    # Queue extension points, called with the queue's mutex held
+    def _put(self, item):
+        self.queue.append((perf_counter(), item))
+
+    def _get(self):
+        put_time, item = self.queue.popleft()
+        self.got_put_time = put_time
+        self.wait_ms.append((perf_counter() - put_time) * 1_000)
+        return item
+
+    def wait_until(self, end_event: Event, timeout: float = None) -> bool:
+        """Sleep until a result is waiting, `end_event` is set, or `timeout` passes.
+
+        Args:
+            end_event (Event): End event (e.g., `ai_end_event`). A `WakeEvent` wakes the wait immediately, a plain `Event` is checked every `POLL` seconds.
+            timeout (float, optional): Max wait in seconds. Defaults to None (no limit).
+
+        Returns:
+            bool: True if a result is waiting
+        """
+        with self.not_empty:
+            return wait_for(self.not_empty, self._qsize, end_event, timeout, self.POLL)
+
+    def get_until(self, end_event: Event, timeout: float = None):
+        """Take the next result, sleeping until one is put, `end_event` is set, or `timeout` passes.
+
+        Args:
+            end_event (Event): End event (e.g., `ai_end_event`)
+            timeout (float, optional): Max wait in seconds. Defaults to None (no limit).
+
+        Raises:
+            Empty: No result before `end_event` was set or `timeout` passed
+
+        Returns:
+            any: Result
+        """
+        # results are only taken by the RGB thread, so the result can't disappear between the wait and the get
+        if not self.wait_until(end_event, timeout):
+            raise Empty
+        return self.get_nowait()
+
+    def on_frame(self, frame: np.ndarray, timestamp: float):
+        """`Display` frame tap. Records the latency from `put()` of the last taken result to this frame.
+
+        Args:
+            frame (np.ndarray): Presented frame
+            timestamp (float): `perf_counter()` time the frame was presented
+        """
+        if self.got_put_time is not None:
+            self.latency_ms.append((timestamp - self.got_put_time) * 1_000)
+            self.got_put_time = None
+
+    def latency_stats(self) -> dict:
+        """Handoff latency over the last `LATENCY_HISTORY` results.
+
+        Returns:
+            dict: Result count, and median/95th percentile/max milliseconds from `put()` to `get()` and from `put()` to the first presented frame
+        """
+        return {"results": len(self.wait_ms), **summarize_ms("wait", self.wait_ms), **summarize_ms("latency", self.latency_ms)}